@@ -10,9 +10,15 @@
 5) 课程教学教案-模板.docx       （周次表格模板，首张表作为原型）
 
 生成：
-- {科目}-教案头.docx（中间产物）
-- {科目}-教师授课教案信息表集合.docx（中间产物）
 - 教案-{科目}.docx（最终产物，生成在本目录）
+教案头与周次集合均在内存中生成并直接合并，不再写出中间产物；
+其它程序可调用 build_lesson_plan(...) 直接取得 docx 字节（或写入任意二进制流），
+或调用 build_course(...) 由标记值 MD 与周次 JSON 直接生成到指定目录（UI 常驻服务即如此调用）。
+
+批量模式：
+- python build_word_from_templates.py --batch <目录>      （目录内按 教案模板标记值-{科目}.md 与 {科目}-*-data.json 配对）
+- python build_word_from_templates.py --manifest <清单.json>（[{"md": "...", "json": "..."}, ...]，相对路径以清单所在目录为准）
+多门课程在进程池中并行生成（默认按 CPU 核数），逐门报告成功/失败与耗时，并写出 batch-report.json。
 
 依赖：python-docx（以及其依赖 lxml），其它仅用标准库。
 """
@@ -21,17 +27,65 @@ from __future__ import annotations
 import os
 import re
 import sys
+import io
 import json
-import shutil
+import glob
+import zipfile
+import time
+import threading
+import hashlib
+import argparse
 from copy import deepcopy
+from dataclasses import dataclass, field, asdict
+from functools import lru_cache
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, Any, List, Optional, Iterable
+from typing import Dict, Any, List, Optional, Iterable, Callable, BinaryIO
+
+# python-docx / lxml 的导入约占启动耗时的一半，改为在首次处理文档时加载（见 _require_docx），
+# --help、--profile-startup 与输入文件缺失等早退路径不承担该成本
+Document = Pt = WD_BREAK = qn = Table = _Row = _Cell = Run = etree = None
 
-from docx import Document
-from docx.shared import Pt
-from docx.enum.text import WD_BREAK
-from docx.oxml.ns import qn
+
+def _require_docx() -> None:
+    global Document, Pt, WD_BREAK, qn, Table, _Row, _Cell, Run, etree
+    if etree is not None:
+        return
+    from docx import Document
+    from docx.shared import Pt
+    from docx.enum.text import WD_BREAK
+    from docx.oxml.ns import qn
+    from docx.table import Table, _Row, _Cell
+    from docx.text.run import Run
+    from lxml import etree
+
+
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+W_T = W_NS + "t"
+A_T = "{http://schemas.openxmlformats.org/drawingml/2006/main}t"
+W_BODY = W_NS + "body"
+W_TBL = W_NS + "tbl"
+W_TR = W_NS + "tr"
+W_TC = W_NS + "tc"
+W_P = W_NS + "p"
+W_R = W_NS + "r"
+W_PPR = W_NS + "pPr"
+W_RPR = W_NS + "rPr"
+W_RFONTS = W_NS + "rFonts"
+W_SZ = W_NS + "sz"
+W_STYLE = W_NS + "style"
+W_BASED_ON = W_NS + "basedOn"
+W_PSTYLE = W_NS + "pStyle"
+W_VAL = W_NS + "val"
+W_STYLE_ID = W_NS + "styleId"
+
+# 统一字体的方式：styles（默认）在 styles.xml 层面设置字体字号，只清理 run 上覆盖样式的显式设置；
+# runs 为旧方式，逐个 run 写入字体与字号
+FONT_MODE = (os.getenv("DOCX_FONT_MODE") or "styles").strip().lower()
+# 周次表格段落的专用样式（承载周表格字体）与排除标题的专用样式（保留原字体）
+WEEK_TEXT_STYLE = "WeekTableText"
+KEEP_FONT_STYLE = "KeepTitleFont"
+_FONT_ATTRS = ("ascii", "hAnsi", "eastAsia", "asciiTheme", "hAnsiTheme", "eastAsiaTheme")
 
 
 # ---------- 工具与解析 ----------
@@ -83,30 +137,72 @@ def build_patterns_for_name(name: str) -> List[re.Pattern]:
     ]
 
 
+@lru_cache(maxsize=64)
+def _compile_placeholder_regex(names: tuple[str, ...]) -> Optional[re.Pattern]:
+    """将 build_patterns_for_name 的 7 种形式合并为一条交替正则，覆盖 names 中的全部名称。
+
+    名称按长度降序排列，保证“周学时”优先于“周”匹配；各分支分别捕获名称，便于回查取值。
+    """
+    if not names:
+        return None
+    alt = "|".join(re.escape(n) for n in sorted(names, key=len, reverse=True))
+    return re.compile(
+        r"(?:[#＃]\s*)?\{\s*(?P<k1>" + alt + r")\s*(?:[:：][^}]+)?\s*\}"
+        r"|[#＃]?\s*｛\s*(?P<k2>" + alt + r")\s*(?:[:：][^｝]+)?\s*｝"
+        r"|(?:[#＃]\s*)?\(\s*(?P<k3>" + alt + r")\s*(?:[:：][^)]+)?\s*\)"
+        r"|[#＃]?\s*（\s*(?P<k4>" + alt + r")\s*(?:[:：][^）]+)?\s*）",
+        re.UNICODE,
+    )
+
+
+_PLACEHOLDER_OPENERS = frozenset("{｛(（")
+
+
+class PlaceholderMatcher:
+    """按映射一次性编译的占位符替换器：对每段文本只扫描一遍即可替换全部键。
+
+    编译后的正则按键集合缓存，周次映射键相同、仅值不同，因此每周只需构造取值表。
+    """
+
+    __slots__ = ("values", "_regex")
+
+    def __init__(self, mapping: Dict[str, Any]):
+        self.values: Dict[str, str] = {str(k).strip(): str(v) for k, v in mapping.items()}
+        self._regex = _compile_placeholder_regex(tuple(sorted(self.values)))
+
+    def _repl(self, m: re.Match) -> str:
+        return self.values[m.group("k1") or m.group("k2") or m.group("k3") or m.group("k4")]
+
+    def sub(self, text: str) -> str:
+        if not text or self._regex is None or _PLACEHOLDER_OPENERS.isdisjoint(text):
+            return text
+        return self._regex.sub(self._repl, text)
+
+
+def as_matcher(mapping: Dict[str, Any] | PlaceholderMatcher) -> PlaceholderMatcher:
+    return mapping if isinstance(mapping, PlaceholderMatcher) else PlaceholderMatcher(mapping)
+
+
 def _norm_label(s: str) -> str:
     s = (s or "").strip()
     s = (s.replace('\u00A0', ' ').replace('\u3000', ' ').replace('\u202F', ' ').replace('\u2007', ' ')
            .replace('\u200B', '').replace('\u200C', '').replace('\u200D', ''))
     return re.sub(r"[\s:：]", "", s)
 
-def xml_replace_in_element(element, mapping: Dict[str, str]) -> None:
+def xml_replace_in_element(element, mapping: Dict[str, str] | PlaceholderMatcher) -> None:
     """在给定 element 下替换所有 w:t 与 a:t 节点文本。"""
     if element is None:
         return
-    W_T = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}t"
-    A_T = "{http://schemas.openxmlformats.org/drawingml/2006/main}t"
-    for node in element.iter():
-        if node.tag == W_T or node.tag == A_T:
-            text = node.text or ""
-            new_text = text
-            for key, val in mapping.items():
-                for pat in build_patterns_for_name(key):
-                    new_text = pat.sub(str(val), new_text)
-            if new_text != text:
-                node.text = new_text
-
-
-def xml_replace_in_doc(doc: Document, mapping: Dict[str, str]) -> None:
+    matcher = as_matcher(mapping)
+    for node in element.iter(W_T, A_T):
+        text = node.text or ""
+        new_text = matcher.sub(text)
+        if new_text != text:
+            node.text = new_text
+
+
+def xml_replace_in_doc(doc: Document, mapping: Dict[str, str] | PlaceholderMatcher) -> None:
+    mapping = as_matcher(mapping)
     xml_replace_in_element(doc.element.body, mapping)
     for sect in doc.sections:
         if sect.header and getattr(sect.header, "_element", None) is not None:
@@ -139,31 +235,36 @@ def write_cell_text_preserve_style(cell, val: str) -> None:
     r.text = val if val is not None else ""
 
 
-def replace_placeholders_in_all_cells(doc: Document, mapping: Dict[str, str]) -> None:
+def replace_placeholders_in_all_cells(doc: Document, mapping: Dict[str, str] | PlaceholderMatcher) -> None:
+    matcher = as_matcher(mapping)
     for tbl in doc.tables:
         for row in tbl.rows:
             for cell in row.cells:
                 original = cell.text or ""
-                new_text = original
-                for key, val in mapping.items():
-                    for pat in build_patterns_for_name(key):
-                        new_text = pat.sub(str(val), new_text)
+                new_text = matcher.sub(original)
                 if new_text != original:
                     write_cell_text_preserve_style(cell, new_text)
 
 
+LABEL_FILL_KEYS = ["授课科目", "授课老师", "授课班级", "授课起止时间", "周学时", "考核方式"]
+
+
+def fill_row_by_label(row, mapping: Dict[str, str]) -> None:
+    cells = row.cells
+    if len(cells) < 2:
+        return
+    norm_keys = {_norm_label(k): k for k in LABEL_FILL_KEYS}
+    label_norm = _norm_label(cells[0].text)
+    if label_norm in norm_keys:
+        k = norm_keys[label_norm]
+        v = str(mapping.get(k, "") or "")
+        write_cell_text_preserve_style(cells[1], v)
+
+
 def fill_tables_by_labels(doc: Document, mapping: Dict[str, str]) -> None:
-    keys = ["授课科目", "授课老师", "授课班级", "授课起止时间", "周学时", "考核方式"]
-    norm_keys = {_norm_label(k): k for k in keys}
     for tbl in doc.tables:
         for row in tbl.rows:
-            if len(row.cells) < 2:
-                continue
-            label_norm = _norm_label(row.cells[0].text)
-            if label_norm in norm_keys:
-                k = norm_keys[label_norm]
-                v = str(mapping.get(k, "") or "")
-                write_cell_text_preserve_style(row.cells[1], v)
+            fill_row_by_label(row, mapping)
 
 
 def limit_text(s: str, max_len: int) -> str:
@@ -199,16 +300,20 @@ def ensure_week_word_in_time(s: str) -> str:
     return txt_norm
 
 
+def fix_time_cell_for_row(row) -> None:
+    cells = list(row.cells)
+    for i, c in enumerate(cells):
+        if _norm_label(c.text) == _norm_label("授课时间") and i + 1 < len(cells):
+            data_cell = cells[i+1]
+            original = data_cell.text or ""
+            new_text = ensure_week_word_in_time(cleanup_midline_spaces(original))
+            if new_text != original.strip():
+                write_cell_text_preserve_style(data_cell, new_text)
+
+
 def fix_time_cell_for_table(tbl) -> None:
     for row in tbl.rows:
-        cells = list(row.cells)
-        for i, c in enumerate(cells):
-            if _norm_label(c.text) == _norm_label("授课时间") and i + 1 < len(cells):
-                data_cell = cells[i+1]
-                original = data_cell.text or ""
-                new_text = ensure_week_word_in_time(cleanup_midline_spaces(original))
-                if new_text != original.strip():
-                    write_cell_text_preserve_style(data_cell, new_text)
+        fix_time_cell_for_row(row)
 
 
 def derive_week_hours(section_value: str) -> str:
@@ -237,6 +342,23 @@ def parse_font_size_pt(s: str | None) -> float | None:
     return zh_map.get(str(s).strip(), None)
 
 
+def set_run_font(run, font_name: Optional[str], font_size_pt: Optional[float]) -> None:
+    _require_docx()
+    try:
+        if font_name:
+            run.font.name = font_name
+            r = run._element
+            rPr = r.get_or_add_rPr()
+            rFonts = rPr.get_or_add_rFonts()
+            rFonts.set(qn('w:eastAsia'), font_name)
+            rFonts.set(qn('w:ascii'), font_name)
+            rFonts.set(qn('w:hAnsi'), font_name)
+        if font_size_pt:
+            run.font.size = Pt(font_size_pt)
+    except Exception:
+        pass
+
+
 def unify_document_font(doc: Document, font_name: Optional[str] = None, font_size_pt: Optional[float] = None) -> None:
     # 选择字体名
     if not font_name:
@@ -250,30 +372,15 @@ def unify_document_font(doc: Document, font_name: Optional[str] = None, font_siz
         if not font_name:
             font_name = "宋体"
 
-    def _set_run_font(run):
-        try:
-            if font_name:
-                run.font.name = font_name
-                r = run._element
-                rPr = r.get_or_add_rPr()
-                rFonts = rPr.get_or_add_rFonts()
-                rFonts.set(qn('w:eastAsia'), font_name)
-                rFonts.set(qn('w:ascii'), font_name)
-                rFonts.set(qn('w:hAnsi'), font_name)
-            if font_size_pt:
-                run.font.size = Pt(font_size_pt)
-        except Exception:
-            pass
-
     for p in doc.paragraphs:
         for run in p.runs:
-            _set_run_font(run)
+            set_run_font(run, font_name, font_size_pt)
     for tbl in doc.tables:
         for row in tbl.rows:
             for cell in row.cells:
                 for p in cell.paragraphs:
                     for run in p.runs:
-                        _set_run_font(run)
+                        set_run_font(run, font_name, font_size_pt)
 
 
 def unify_document_font_excluding(doc: Document, font_name: Optional[str], font_size_pt: Optional[float],
@@ -291,26 +398,11 @@ def unify_document_font_excluding(doc: Document, font_name: Optional[str], font_
         txt = ''.join(run.text for run in paragraph.runs) if paragraph.runs else paragraph.text
         return _norm_text(txt) in exclude_norm
 
-    def _set_run_font(run):
-        try:
-            if font_name:
-                run.font.name = font_name
-                r = run._element
-                rPr = r.get_or_add_rPr()
-                rFonts = rPr.get_or_add_rFonts()
-                rFonts.set(qn('w:eastAsia'), font_name)
-                rFonts.set(qn('w:ascii'), font_name)
-                rFonts.set(qn('w:hAnsi'), font_name)
-            if font_size_pt:
-                run.font.size = Pt(font_size_pt)
-        except Exception:
-            pass
-
     for p in doc.paragraphs:
         if _should_exclude(p):
             continue
         for run in p.runs:
-            _set_run_font(run)
+            set_run_font(run, font_name, font_size_pt)
     for tbl in doc.tables:
         for row in tbl.rows:
             for cell in row.cells:
@@ -318,7 +410,557 @@ def unify_document_font_excluding(doc: Document, font_name: Optional[str], font_
                     if _should_exclude(p):
                         continue
                     for run in p.runs:
-                        _set_run_font(run)
+                        set_run_font(run, font_name, font_size_pt)
+
+
+# ---------- 样式层字体统一 ----------
+
+def _norm_title_text(s: str) -> str:
+    s = (s or "").replace('\u00A0', '').replace('\u3000', '')
+    return ''.join(ch for ch in s if not ch.isspace()).strip().lower()
+
+
+def _table_paragraphs(tbl):
+    for tr in tbl.iterchildren(W_TR):
+        for tc in tr.iterchildren(W_TC):
+            yield from tc.iterchildren(W_P)
+
+
+def _font_scope_paragraphs(body):
+    """与 unify_document_font 覆盖范围一致：正文的直接段落，以及顶层表格各单元格中的直接段落。"""
+    for child in body:
+        if child.tag == W_P:
+            yield child
+        elif child.tag == W_TBL:
+            yield from _table_paragraphs(child)
+
+
+def _paragraph_text(p) -> str:
+    return ''.join(t.text or '' for r in p.iterchildren(W_R) for t in r.iterchildren(W_T))
+
+
+def _set_rpr_font(rPr, font_name: Optional[str], font_size_pt: Optional[float]) -> None:
+    if font_name:
+        rFonts = rPr.get_or_add_rFonts()
+        # 主题字体属性优先于具体字体名，需一并去掉
+        for attr in ("asciiTheme", "hAnsiTheme", "eastAsiaTheme"):
+            rFonts.attrib.pop(qn(f"w:{attr}"), None)
+        for attr in ("ascii", "hAnsi", "eastAsia"):
+            rFonts.set(qn(f"w:{attr}"), font_name)
+    if font_size_pt:
+        rPr.get_or_add_sz().set(W_VAL, str(int(round(font_size_pt * 2))))
+
+
+def _strip_run_font(r, font_name: Optional[str], font_size_pt: Optional[float]) -> None:
+    """去掉 run 上会覆盖样式的字体/字号；rPr 元素本身保留，run 的子节点下标不变（预编译槽位路径仍有效）。"""
+    rPr = r.find(W_RPR)
+    if rPr is None:
+        return
+    if font_name:
+        rFonts = rPr.find(W_RFONTS)
+        if rFonts is not None:
+            for attr in _FONT_ATTRS:
+                rFonts.attrib.pop(qn(f"w:{attr}"), None)
+            if not len(rFonts.attrib):
+                rPr.remove(rFonts)
+    if font_size_pt:
+        sz = rPr.find(W_SZ)
+        if sz is not None:
+            rPr.remove(sz)
+
+
+def _style_map(styles) -> Dict[str, Any]:
+    return {st.get(W_STYLE_ID): st for st in styles.iterchildren(W_STYLE)}
+
+
+def _default_paragraph_style_id(styles) -> Optional[str]:
+    for st in styles.iterchildren(W_STYLE):
+        if st.get(qn("w:type")) == "paragraph" and st.get(qn("w:default")) in ("1", "true", "on"):
+            return st.get(W_STYLE_ID)
+    return None
+
+
+def _doc_defaults_rpr(styles):
+    from docx.oxml import OxmlElement
+
+    defaults = styles.find(qn("w:docDefaults"))
+    if defaults is None:
+        defaults = OxmlElement("w:docDefaults")
+        styles.insert(0, defaults)
+    rpr_default = defaults.find(qn("w:rPrDefault"))
+    if rpr_default is None:
+        rpr_default = OxmlElement("w:rPrDefault")
+        defaults.insert(0, rpr_default)
+    rPr = rpr_default.find(W_RPR)
+    if rPr is None:
+        rPr = OxmlElement("w:rPr")
+        rpr_default.append(rPr)
+    return rPr
+
+
+def _resolved_font(styles, style_id: Optional[str]) -> tuple[Dict[str, str], Optional[str]]:
+    """按 docDefaults → basedOn 链 → 样式自身的顺序解析字体属性与字号（半磅）。"""
+    by_id = _style_map(styles)
+    chain, seen = [], set()
+    while style_id and style_id in by_id and style_id not in seen:
+        seen.add(style_id)
+        chain.append(by_id[style_id])
+        based = by_id[style_id].find(W_BASED_ON)
+        style_id = based.get(W_VAL) if based is not None else None
+    rprs = [_doc_defaults_rpr(styles)] + [st.find(W_RPR) for st in reversed(chain)]
+    fonts: Dict[str, str] = {}
+    size = None
+    for rPr in rprs:
+        if rPr is None:
+            continue
+        rFonts = rPr.find(W_RFONTS)
+        if rFonts is not None:
+            for attr in _FONT_ATTRS:
+                value = rFonts.get(qn(f"w:{attr}"))
+                if value is not None:
+                    fonts[attr] = value
+        sz = rPr.find(W_SZ)
+        if sz is not None:
+            size = sz.get(W_VAL)
+    return fonts, size
+
+
+def _ensure_paragraph_style(styles, style_id: str, name: str, based_on: Optional[str]):
+    """取得（必要时新建）段落样式 style_id，返回其 rPr。"""
+    from docx.oxml import OxmlElement
+
+    style = _style_map(styles).get(style_id)
+    if style is None:
+        style = OxmlElement("w:style")
+        style.set(qn("w:type"), "paragraph")
+        style.set(W_STYLE_ID, style_id)
+        name_el = OxmlElement("w:name")
+        name_el.set(W_VAL, name)
+        style.append(name_el)
+        if based_on:
+            based = OxmlElement("w:basedOn")
+            based.set(W_VAL, based_on)
+            style.append(based)
+        styles.append(style)
+    return style.get_or_add_rPr()
+
+
+def _set_paragraph_style(p, style_id: str) -> None:
+    p.get_or_add_pPr().get_or_add_pStyle().val = style_id
+
+
+def _paragraph_style_id(p, default_id: Optional[str]) -> Optional[str]:
+    pPr = p.find(W_PPR)
+    pStyle = pPr.find(W_PSTYLE) if pPr is not None else None
+    return pStyle.get(W_VAL) if pStyle is not None else default_id
+
+
+def pin_excluded_paragraphs(styles, paragraphs: Iterable[Any], exclude_texts: Iterable[str]) -> List[Any]:
+    """文本属于 exclude_texts 的段落改挂“保留原字体”专用样式（写入其当前解析出的字体字号），返回其余段落。"""
+    default_id = _default_paragraph_style_id(styles)
+    exclude_norm = {_norm_title_text(t) for t in exclude_texts if t}
+    targets = []
+    for p in paragraphs:
+        if not exclude_norm or _norm_title_text(_paragraph_text(p)) not in exclude_norm:
+            targets.append(p)
+            continue
+        base = _paragraph_style_id(p, default_id)
+        keep_id = KEEP_FONT_STYLE if base == default_id else f"{KEEP_FONT_STYLE}-{base}"
+        if keep_id not in _style_map(styles):
+            fonts, size = _resolved_font(styles, base)
+            rPr = _ensure_paragraph_style(styles, keep_id, f"保留原字体 {base or ''}".strip(), base)
+            rFonts = rPr.get_or_add_rFonts()
+            for attr, value in fonts.items():
+                rFonts.set(qn(f"w:{attr}"), value)
+            # 未设置字号时 Word 按 10 磅显示
+            rPr.get_or_add_sz().set(W_VAL, size or "20")
+        _set_paragraph_style(p, keep_id)
+    return targets
+
+
+def apply_style_fonts(doc: Document, font_name: Optional[str], font_size_pt: Optional[float],
+                      exclude_texts: Iterable[str] = ()) -> None:
+    """在样式层统一字体（与 unify_document_font_excluding 效果一致）：
+
+    - docDefaults 与设置了字体/字号的各样式改为目标字体字号；
+    - 覆盖范围内只有带显式字体/字号的 run 被改写（去掉覆盖，改由样式继承），输出 XML 随之变小；
+    - 文本属于 exclude_texts 的标题段落改挂专用样式，写入其原有（解析后的）字体字号，不受统一影响。
+    字体与字号均未指定时不做任何改动。
+    """
+    if not font_name and not font_size_pt:
+        return
+    _require_docx()
+    styles = doc.styles.element
+    # 先为排除的标题固定原字体（须在修改样式之前解析）
+    targets = pin_excluded_paragraphs(styles, _font_scope_paragraphs(doc.element.body), exclude_texts)
+
+    _set_rpr_font(_doc_defaults_rpr(styles), font_name, font_size_pt)
+    for style in styles.iterchildren(W_STYLE):
+        if (style.get(W_STYLE_ID) or "").startswith(KEEP_FONT_STYLE):
+            continue
+        rPr = style.find(W_RPR)
+        if rPr is None:
+            continue
+        has_fonts = rPr.find(W_RFONTS) is not None and any(
+            rPr.find(W_RFONTS).get(qn(f"w:{attr}")) is not None for attr in _FONT_ATTRS
+        )
+        _set_rpr_font(rPr, font_name if has_fonts else None, font_size_pt if rPr.find(W_SZ) is not None else None)
+
+    for p in targets:
+        for r in p.iterchildren(W_R):
+            _strip_run_font(r, font_name, font_size_pt)
+
+
+def prepare_week_prototype(doc: Document, compiled: CompiledTemplate, font_name: Optional[str],
+                           font_size_pt: Optional[float]) -> CompiledTemplate:
+    """样式模式下的周次原型表格：段落改挂周表格专用样式（写入目标字体字号），run 上的显式字体/字号去掉，
+    之后每周复制出的表格直接继承该样式，不再逐 run 设置字体。
+
+    插入 pStyle 会改变段落内 run 的下标，故返回按修改后原型重新编译的槽位（按模板哈希缓存）。
+    """
+    styles = doc.styles.element
+    default_id = _default_paragraph_style_id(styles)
+    for p in _table_paragraphs(doc.tables[0]._tbl):
+        base = _paragraph_style_id(p, default_id)
+        style_id = WEEK_TEXT_STYLE if base == default_id else f"{WEEK_TEXT_STYLE}-{base}"
+        if style_id not in _style_map(styles):
+            _ensure_paragraph_style(styles, style_id, f"周次表格正文 {base or ''}".strip(), base)
+        _set_paragraph_style(p, style_id)
+        for r in p.iterchildren(W_R):
+            _strip_run_font(r, font_name, font_size_pt)
+    for style in styles.iterchildren(W_STYLE):
+        if (style.get(W_STYLE_ID) or "").startswith(WEEK_TEXT_STYLE):
+            _set_rpr_font(style.get_or_add_rPr(), font_name, font_size_pt)
+
+    key = ("weeks-styles", compiled.sha256)
+    prepared = _COMPILED_TEMPLATES.get(key) or _load_cached_template(*key)
+    if prepared is None:
+        prepared = compile_template(doc, "weeks", compiled.sha256)
+        prepared.kind = "weeks-styles"
+        prepared.time_font_name, prepared.time_font_size = compiled.time_font_name, compiled.time_font_size
+        _store_cached_template(prepared)
+    _COMPILED_TEMPLATES[key] = prepared
+    return prepared
+
+
+def copy_paragraph_styles(src: Document, dst: Document, prefix: str) -> None:
+    """把 src 中 styleId 以 prefix 开头的样式复制（或覆盖）到 dst，供移入的正文继续引用。"""
+    src_styles, dst_styles = src.styles.element, dst.styles.element
+    existing = _style_map(dst_styles)
+    for style in src_styles.iterchildren(W_STYLE):
+        style_id = style.get(W_STYLE_ID) or ""
+        if not style_id.startswith(prefix):
+            continue
+        if style_id in existing:
+            dst_styles.replace(existing[style_id], deepcopy(style))
+        else:
+            dst_styles.append(deepcopy(style))
+
+
+# ---------- 单次遍历引擎 ----------
+
+class DocumentVisitor:
+    """对一个文档部件（正文/页眉/页脚）的 lxml 树只遍历一次，按标签把节点分派给已注册的处理器。
+
+    - on_start：进入节点时调用（早于子节点），适合 w:t 级文本替换；
+    - on_end：离开节点时调用（子节点均已处理），适合依赖整格/整行最终文本的改写。
+    end 处理器可以改写当前节点的子树，但不得移除当前节点本身。
+    同一标签的多个处理器按注册顺序执行。
+    """
+
+    def __init__(self) -> None:
+        self._handlers: Dict[tuple[str, str], List[Callable[[Any], None]]] = {}
+
+    def on_start(self, tag: str, handler: Callable[[Any], None]) -> "DocumentVisitor":
+        self._handlers.setdefault(("start", tag), []).append(handler)
+        return self
+
+    def on_end(self, tag: str, handler: Callable[[Any], None]) -> "DocumentVisitor":
+        self._handlers.setdefault(("end", tag), []).append(handler)
+        return self
+
+    def visit(self, element) -> None:
+        if element is None or not self._handlers:
+            return
+        _require_docx()
+        tags = sorted({tag for _, tag in self._handlers})
+        events = sorted({event for event, _ in self._handlers})
+        for event, node in etree.iterwalk(element, events=events, tag=tags):
+            for handler in self._handlers.get((event, node.tag), ()):
+                handler(node)
+
+
+def _is_top_level_tbl(tbl) -> bool:
+    parent = tbl.getparent()
+    return parent is not None and parent.tag == W_BODY
+
+
+def _row_of(tr) -> Optional[_Row]:
+    _require_docx()
+    tbl = tr.getparent()
+    if tbl is None or not _is_top_level_tbl(tbl):
+        return None
+    return _Row(tr, Table(tbl, None))
+
+
+def register_placeholder_handlers(visitor: DocumentVisitor, matcher: PlaceholderMatcher,
+                                  table_matchers: Optional[Dict[Any, PlaceholderMatcher]] = None,
+                                  cell_level: bool = True) -> None:
+    """注册占位符替换：w:t/a:t 级替换，以及（cell_level）顶层表格的单元格级兜底替换。
+
+    table_matchers 可为指定的顶层 w:tbl 提供专属匹配器（如每周表格的周映射），其余位置使用 matcher。
+    """
+    current = [matcher]
+
+    if table_matchers:
+        def enter_tbl(tbl) -> None:
+            if _is_top_level_tbl(tbl):
+                current[0] = table_matchers.get(tbl, matcher)
+
+        def leave_tbl(tbl) -> None:
+            if _is_top_level_tbl(tbl):
+                current[0] = matcher
+
+        visitor.on_start(W_TBL, enter_tbl).on_end(W_TBL, leave_tbl)
+
+    def replace_text(node) -> None:
+        text = node.text or ""
+        new_text = current[0].sub(text)
+        if new_text != text:
+            node.text = new_text
+
+    visitor.on_start(W_T, replace_text).on_start(A_T, replace_text)
+
+    if cell_level:
+        def replace_cell(tc) -> None:
+            tbl = tc.getparent().getparent() if tc.getparent() is not None else None
+            if tbl is None or not _is_top_level_tbl(tbl):
+                return
+            cell = _Cell(tc, None)
+            original = cell.text or ""
+            new_text = current[0].sub(original)
+            if new_text != original:
+                write_cell_text_preserve_style(cell, new_text)
+
+        visitor.on_end(W_TC, replace_cell)
+
+
+def register_row_handler(visitor: DocumentVisitor, handler: Callable[[_Row], None]) -> None:
+    """以 python-docx 的 _Row 视图（含合并单元格展开）对顶层表格的每一行调用 handler。"""
+    def on_row(tr) -> None:
+        row = _row_of(tr)
+        if row is not None:
+            handler(row)
+
+    visitor.on_end(W_TR, on_row)
+
+
+def register_font_handler(visitor: DocumentVisitor, font_name: Optional[str], font_size_pt: Optional[float]) -> None:
+    """与 unify_document_font 覆盖范围一致：正文段落与顶层表格单元格段落中的直接 run。"""
+    def on_run(r) -> None:
+        p = r.getparent()
+        if p is None or p.tag != W_P:
+            return
+        container = p.getparent()
+        if container is None:
+            return
+        if container.tag != W_BODY:
+            if container.tag != W_TC:
+                return
+            tbl = container.getparent().getparent()
+            if tbl is None or not _is_top_level_tbl(tbl):
+                return
+        set_run_font(Run(r, None), font_name, font_size_pt)
+
+    visitor.on_end(W_R, on_run)
+
+
+def visit_headers_footers(doc: Document, visitor: DocumentVisitor) -> None:
+    for sect in doc.sections:
+        if sect.header and getattr(sect.header, "_element", None) is not None:
+            visitor.visit(sect.header._element)
+        if sect.footer and getattr(sect.footer, "_element", None) is not None:
+            visitor.visit(sect.footer._element)
+
+
+# ---------- 模板预编译与缓存 ----------
+
+TEMPLATE_CACHE_VERSION = 1
+TEMPLATE_CACHE_DIR = Path(os.getenv("TEMPLATE_CACHE_DIR") or (Path(__file__).parent / ".template_cache"))
+
+# 任一 PlaceholderMatcher 可能命中的文本必含“开括号…闭括号”，据此在编译期圈定槽位
+_PLACEHOLDER_CANDIDATE_RE = re.compile(r"[{｛(（].*?[}｝)）]", re.S)
+
+
+@dataclass
+class CompiledTemplate:
+    """模板的预编译形式：记录占位槽位在 XML 树中的下标路径，填充时直接定位赋值而无需扫描。
+
+    - kind="head"：路径相对 w:body；row_slots 为按标签填表的候选行。
+    - kind="weeks"：路径相对首张表格（周次原型表格）；row_slots 为“授课时间”修正的候选行。
+    """
+    kind: str
+    sha256: str
+    text_slots: List[tuple[List[int], str]] = field(default_factory=list)  # (w:t/a:t 路径, 原文)
+    cell_slots: List[List[int]] = field(default_factory=list)              # 需单元格级兜底替换的 w:tc
+    row_slots: List[List[int]] = field(default_factory=list)               # 需行级处理的 w:tr
+    time_font_name: Optional[str] = None
+    time_font_size: Optional[float] = None
+
+
+_COMPILED_TEMPLATES: Dict[tuple[str, str], CompiledTemplate] = {}
+
+
+def _node_path(root, node) -> List[int]:
+    path: List[int] = []
+    while node is not root:
+        parent = node.getparent()
+        path.append(parent.index(node))
+        node = parent
+    path.reverse()
+    return path
+
+
+def _resolve_path(root, path: List[int]):
+    node = root
+    for i in path:
+        node = node[i]
+    return node
+
+
+def _has_candidate(text: str) -> bool:
+    return bool(text) and _PLACEHOLDER_CANDIDATE_RE.search(text) is not None
+
+
+def _is_head_label_row(row: _Row) -> bool:
+    cells = row.cells
+    if len(cells) < 2:
+        return False
+    label = cells[0].text
+    return _norm_label(label) in {_norm_label(k) for k in LABEL_FILL_KEYS} or _has_candidate(label)
+
+
+def _is_time_row(row: _Row) -> bool:
+    cells = list(row.cells)
+    return any(
+        _norm_label(c.text) == _norm_label("授课时间") or _has_candidate(c.text)
+        for c in cells[:-1]
+    )
+
+
+def compile_template(doc: Document, kind: str, sha256: str) -> CompiledTemplate:
+    _require_docx()
+    if kind == "head":
+        root = doc.element.body
+        tables = list(root.iterchildren(W_TBL))
+        row_predicate = _is_head_label_row
+    elif kind == "weeks":
+        if not doc.tables:
+            raise RuntimeError("周表格模板文档中未找到表格")
+        root = doc.tables[0]._tbl
+        tables = [root]
+        row_predicate = _is_time_row
+    else:
+        raise ValueError(f"未知模板类型: {kind}")
+
+    compiled = CompiledTemplate(kind=kind, sha256=sha256)
+    for node in root.iter(W_T, A_T):
+        if _has_candidate(node.text or ""):
+            compiled.text_slots.append((_node_path(root, node), node.text))
+    for tbl in tables:
+        table = Table(tbl, None)
+        for tr in tbl.iterchildren(W_TR):
+            row = _Row(tr, table)
+            for tc in tr.iterchildren(W_TC):
+                if _has_candidate(_Cell(tc, None).text):
+                    compiled.cell_slots.append(_node_path(root, tc))
+            if row_predicate(row):
+                compiled.row_slots.append(_node_path(root, tr))
+    if kind == "weeks":
+        compiled.time_font_name, compiled.time_font_size = get_time_cell_font_from_table(doc.tables[0])
+    return compiled
+
+
+def _template_cache_file(kind: str, sha256: str) -> Path:
+    return TEMPLATE_CACHE_DIR / f"{kind}-{sha256}-v{TEMPLATE_CACHE_VERSION}.json"
+
+
+def _load_cached_template(kind: str, sha256: str) -> Optional[CompiledTemplate]:
+    path = _template_cache_file(kind, sha256)
+    try:
+        raw = json.loads(path.read_text(encoding="utf-8"))
+        raw["text_slots"] = [(list(p), t) for p, t in raw["text_slots"]]
+        return CompiledTemplate(**raw)
+    except Exception:
+        return None
+
+
+def _store_cached_template(compiled: CompiledTemplate) -> None:
+    path = _template_cache_file(compiled.kind, compiled.sha256)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(asdict(compiled), ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
+    except Exception:
+        # 缓存不可写时仅损失加速，不影响生成
+        pass
+
+
+# 常驻进程内的模板原始字节：绝对路径 -> (mtime_ns, size, 字节, sha256)
+_TEMPLATE_SOURCES: Dict[str, tuple[int, int, bytes, str]] = {}
+
+
+def _read_template_source(path: Path) -> tuple[bytes, str]:
+    """读取模板字节及其哈希；按 (mtime, size) 校验后复用，模板文件被替换时自动重读。"""
+    path = Path(path).resolve()
+    st = path.stat()
+    cached = _TEMPLATE_SOURCES.get(str(path))
+    if cached is not None and cached[:2] == (st.st_mtime_ns, st.st_size):
+        return cached[2], cached[3]
+    data = path.read_bytes()
+    sha256 = hashlib.sha256(data).hexdigest()
+    _TEMPLATE_SOURCES[str(path)] = (st.st_mtime_ns, st.st_size, data, sha256)
+    return data, sha256
+
+
+def open_template(path: Path, kind: str) -> tuple[Document, CompiledTemplate]:
+    """读取模板（只解析一次），并取得按内容哈希缓存的预编译形式（进程内 + 磁盘）。"""
+    data, sha256 = _read_template_source(path)
+    _require_docx()
+    doc = Document(io.BytesIO(data))
+    key = (kind, sha256)
+    compiled = _COMPILED_TEMPLATES.get(key) or _load_cached_template(kind, sha256)
+    if compiled is None:
+        compiled = compile_template(doc, kind, sha256)
+        _store_cached_template(compiled)
+    _COMPILED_TEMPLATES[key] = compiled
+    return doc, compiled
+
+
+def fill_compiled_slots(root, compiled: CompiledTemplate, matcher: PlaceholderMatcher,
+                        row_handler: Optional[Callable[[_Row], None]] = None) -> None:
+    """按预编译槽位填充 root（模板正文或原型表格的副本）：w:t 替换 → 单元格兜底替换 → 行级处理。
+
+    先解析全部路径再改写，避免单元格改写删除 run/段落后下标失效。
+    """
+    _require_docx()
+    texts = [(_resolve_path(root, p), t) for p, t in compiled.text_slots]
+    cells = [_resolve_path(root, p) for p in compiled.cell_slots]
+    rows = [_resolve_path(root, p) for p in compiled.row_slots] if row_handler else []
+
+    for node, text in texts:
+        new_text = matcher.sub(text)
+        if new_text != text:
+            node.text = new_text
+    for tc in cells:
+        cell = _Cell(tc, None)
+        original = cell.text or ""
+        new_text = matcher.sub(original)
+        if new_text != original:
+            write_cell_text_preserve_style(cell, new_text)
+    for tr in rows:
+        row_handler(_Row(tr, Table(tr.getparent(), None)))
 
 
 # ---------- 主流程（单文件实现） ----------
@@ -399,8 +1041,9 @@ def find_docx_templates(src_dir: Path) -> tuple[Path, Path]:
     )
 
 
-def build_head_doc(head_tpl: Path, mapping: Dict[str, str], out_dir: Path, subject: str) -> Path:
-    doc = Document(str(head_tpl))
+def render_head_doc(head_tpl: Path, mapping: Dict[str, str]) -> Document:
+    """在内存中生成教案头文档（会就地补全 mapping 的默认字段）。"""
+    doc, compiled = open_template(head_tpl, "head")
     # 默认补全
     try:
         total_weeks = int(str(mapping.get("总周数", "16")).strip())
@@ -413,11 +1056,18 @@ def build_head_doc(head_tpl: Path, mapping: Dict[str, str], out_dir: Path, subje
     if not mapping.get("考核方式"):
         mapping["考核方式"] = "考察"
 
-    # 全局替换与兜底表格填充
-    xml_replace_in_doc(doc, mapping)
-    replace_placeholders_in_all_cells(doc, mapping)
-    fill_tables_by_labels(doc, mapping)
+    # 全局替换与兜底表格填充：正文按预编译槽位完成 w:t 替换、单元格兜底替换与按标签填表
+    matcher = PlaceholderMatcher(mapping)
+    fill_compiled_slots(doc.element.body, compiled, matcher, lambda row: fill_row_by_label(row, mapping))
+
+    hf_visitor = DocumentVisitor()
+    register_placeholder_handlers(hf_visitor, matcher, cell_level=False)
+    visit_headers_footers(doc, hf_visitor)
+    return doc
 
+
+def build_head_doc(head_tpl: Path, mapping: Dict[str, str], out_dir: Path, subject: str) -> Path:
+    doc = render_head_doc(head_tpl, mapping)
     out = out_dir / f"{subject}-教案头.docx"
     out_dir.mkdir(parents=True, exist_ok=True)
     doc.save(str(out))
@@ -454,25 +1104,23 @@ def append_table_from_template(doc: Document, tpl_table):
     return doc.tables[-1]
 
 
-def replace_placeholders_in_table_cells(tbl, mapping: Dict[str, str]) -> None:
+def replace_placeholders_in_table_cells(tbl, mapping: Dict[str, str] | PlaceholderMatcher) -> None:
+    matcher = as_matcher(mapping)
     for row in tbl.rows:
         for cell in row.cells:
             original = cell.text or ""
-            new_text = original
-            for key, val in mapping.items():
-                for pat in build_patterns_for_name(key):
-                    new_text = pat.sub(str(val), new_text)
+            new_text = matcher.sub(original)
             if new_text != original:
                 write_cell_text_preserve_style(cell, new_text)
 
 
-def build_weeks_doc(week_tpl: Path, mapping: Dict[str, str], json_path: Path, out_dir: Path, subject: str) -> Path:
-    if not week_tpl.exists():
-        raise FileNotFoundError(f"未找到周表格模板: {week_tpl}")
-
-    # 加载周数据
+def load_weeks_data(json_path: Path) -> Dict[str, Any]:
     with open(json_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+        return json.load(f)
+
+
+def complete_week_defaults(mapping: Dict[str, str], data: Dict[str, Any]) -> tuple[int, str]:
+    """就地补全周次集合所需的默认字段，返回 (总周数, 节)。"""
     try:
         total_weeks = int(str(mapping.get("总周数", data.get("总周数", "16"))).strip())
     except Exception:
@@ -486,36 +1134,18 @@ def build_weeks_doc(week_tpl: Path, mapping: Dict[str, str], json_path: Path, ou
         mapping["周学时"] = derive_week_hours(sections)
     if not mapping.get("考核方式"):
         mapping["考核方式"] = "平时30%+期末(或大作业)70%"
+    return total_weeks, sections
 
-    # 原型表格来自周模板
-    week_tpl_doc = Document(str(week_tpl))
-    if not week_tpl_doc.tables:
-        raise RuntimeError("周表格模板文档中未找到表格")
-    week_table_tpl = week_tpl_doc.tables[0]
-
-    # 从用户/模板确定目标字体与字号
-    user_font_name = mapping.get("统一字体名称", "").strip() or None
-    user_font_size_pt = parse_font_size_pt(mapping.get("统一字号", None))
-    tpl_font_name, tpl_font_pt = get_time_cell_font_from_table(week_table_tpl)
-    chosen_font_name = user_font_name or tpl_font_name or "宋体"
-    chosen_font_pt = user_font_size_pt or tpl_font_pt
-
-    # 以周模板文档作为基底并清空正文
-    base_doc = Document(str(week_tpl))
-    body = base_doc._body._element
-    for child in list(body):
-        body.remove(child)
-
-    # 若周模板包含页眉/页脚占位，先全局替换
-    xml_replace_in_doc(base_doc, mapping)
 
-    # 准备周数组
+def week_mappings(mapping: Dict[str, str], data: Dict[str, Any], total_weeks: int, sections: str) -> List[Dict[str, str]]:
+    """各周填表用的完整映射（周映射优先于基础映射），周数不足时以空周补齐。"""
     weeks: List[Dict[str, Any]] = list(data.get("周次", []))
     if len(weeks) < total_weeks:
         weeks = weeks + [{} for _ in range(total_weeks - len(weeks))]
     else:
         weeks = weeks[:total_weeks]
 
+    result = []
     for idx, wk in enumerate(weeks, start=1):
         wk_mapping: Dict[str, str] = {}
         # 复制基础字段
@@ -543,26 +1173,68 @@ def build_weeks_doc(week_tpl: Path, mapping: Dict[str, str], json_path: Path, ou
         wk_mapping["课后小结"] = ""
         wk_mapping["作业"] = str(wk.get("作业", ""))
 
-        # 插入一份周表格
-        new_tbl = append_table_from_template(base_doc, week_table_tpl)
-        # 先尝试 XML 级替换
-        xml_replace_in_element(new_tbl._tbl, wk_mapping)
-        xml_replace_in_element(new_tbl._tbl, mapping)
-        # 再做逐表格 cell 级兜底替换（处理占位符被拆分到多 w:t 的情况）
         merged_map = dict(mapping)
         merged_map.update(wk_mapping)
-        replace_placeholders_in_table_cells(new_tbl, merged_map)
-        # 兜底修正
-        fix_time_cell_for_table(new_tbl)
+        result.append(merged_map)
+    return result
+
+
+def chosen_week_font(mapping: Dict[str, str], compiled: CompiledTemplate) -> tuple[str, Optional[float]]:
+    """周表格的目标字体与字号：用户指定优先，其次为模板“授课时间”格的字体，缺省宋体。"""
+    user_font_name = mapping.get("统一字体名称", "").strip() or None
+    user_font_size_pt = parse_font_size_pt(mapping.get("统一字号", None))
+    return user_font_name or compiled.time_font_name or "宋体", user_font_size_pt or compiled.time_font_size
+
+
+def render_weeks_doc(week_tpl: Path, mapping: Dict[str, str], data: Dict[str, Any]) -> Document:
+    """在内存中生成周次表格集合文档（会就地补全 mapping 的默认字段）。"""
+    if not week_tpl.exists():
+        raise FileNotFoundError(f"未找到周表格模板: {week_tpl}")
+    total_weeks, sections = complete_week_defaults(mapping, data)
+
+    # 周模板只解析一次：首张表格作为原型，文档本身作为基底
+    base_doc, compiled = open_template(week_tpl, "weeks")
+    week_table_tpl = base_doc.tables[0]._tbl
+
+    # 从用户/模板确定目标字体与字号
+    chosen_font_name, chosen_font_pt = chosen_week_font(mapping, compiled)
+    if FONT_MODE != "runs":
+        compiled = prepare_week_prototype(base_doc, compiled, chosen_font_name, chosen_font_pt)
+
+    # 清空正文（原型表格已单独持有引用）
+    body = base_doc._body._element
+    for child in list(body):
+        body.remove(child)
+
+    # 若周模板包含页眉/页脚占位，先全局替换
+    base_matcher = PlaceholderMatcher(mapping)
+    hf_visitor = DocumentVisitor()
+    register_placeholder_handlers(hf_visitor, base_matcher, cell_level=False)
+    visit_headers_footers(base_doc, hf_visitor)
+
+    maps = week_mappings(mapping, data, total_weeks, sections)
+    for idx, merged_map in enumerate(maps, start=1):
+        # 插入一份周表格并按预编译槽位填充
+        new_tbl = deepcopy(week_table_tpl)
+        body.append(new_tbl)
+        fill_compiled_slots(new_tbl, compiled, PlaceholderMatcher(merged_map), fix_time_cell_for_row)
 
         # 分页
-        if idx < len(weeks):
+        if idx < len(maps):
             p = base_doc.add_paragraph("")
             run = p.add_run("")
             run.add_break(WD_BREAK.PAGE)
 
-    # 统一字体（按用户/模板选择）
-    unify_document_font(base_doc, chosen_font_name, chosen_font_pt)
+    # 统一字体（按用户/模板选择）：样式模式下已由原型表格的专用样式承载
+    if FONT_MODE == "runs":
+        body_visitor = DocumentVisitor()
+        register_font_handler(body_visitor, chosen_font_name, chosen_font_pt)
+        body_visitor.visit(body)
+    return base_doc
+
+
+def build_weeks_doc(week_tpl: Path, mapping: Dict[str, str], json_path: Path, out_dir: Path, subject: str) -> Path:
+    base_doc = render_weeks_doc(week_tpl, mapping, load_weeks_data(json_path))
 
     # 保存
     out = out_dir / f"{subject}-教师授课教案信息表集合.docx"
@@ -576,61 +1248,564 @@ def build_weeks_doc(week_tpl: Path, mapping: Dict[str, str], json_path: Path, ou
     return out
 
 
+EXCLUDE_TITLES = [
+    "广 州 现 代 信 息 工 程 职 业 技 术 学 院",
+    "广州现代信息工程职业技术学院",
+    "教 师 授 课 教 案",
+    "教师授课教案",
+    "教师授课教案信息表",
+]
+
+
+def merge_documents(head_doc: Document, append_doc: Document, font_name: Optional[str],
+                    font_size_pt: Optional[float]) -> Document:
+    """将 append_doc 正文直接移入 head_doc 并统一字体；append_doc 随后不应再使用。
+
+    样式模式下一并带上周次表格的专用样式，统一字体在 styles.xml 层面完成（见 apply_style_fonts）。
+    """
+    head_body = head_doc.element.body
+    for element in list(append_doc.element.body):
+        head_body.append(element)
+
+    if FONT_MODE == "runs":
+        unify_document_font_excluding(head_doc, font_name, font_size_pt, EXCLUDE_TITLES)
+    else:
+        copy_paragraph_styles(append_doc, head_doc, WEEK_TEXT_STYLE)
+        apply_style_fonts(head_doc, font_name, font_size_pt, EXCLUDE_TITLES)
+    return head_doc
+
+
 def merge_docs(head_doc_path: Path, append_doc_path: Path, out_path: Path, font_name: Optional[str], font_size_pt: Optional[float]) -> None:
+    _require_docx()
     head_doc = Document(str(head_doc_path))
     append_doc = Document(str(append_doc_path))
-
-    for element in append_doc.element.body:
-        head_doc.element.body.append(deepcopy(element))
-
-    exclude_titles = [
-        "广 州 现 代 信 息 工 程 职 业 技 术 学 院",
-        "广州现代信息工程职业技术学院",
-        "教 师 授 课 教 案",
-        "教师授课教案",
-        "教师授课教案信息表",
-    ]
-    unify_document_font_excluding(head_doc, font_name, font_size_pt, exclude_titles)
+    merge_documents(head_doc, append_doc, font_name, font_size_pt)
     out_path.parent.mkdir(parents=True, exist_ok=True)
     head_doc.save(str(out_path))
 
 
-def main() -> None:
-    src_dir = Path(__file__).parent.resolve()
+# ---------- 周次表格的 OOXML 直出引擎 ----------
 
-    # 1) 输入与模板
-    md_path, json_path, _syllabus = find_input_files(src_dir)
-    head_tpl, week_tpl = find_docx_templates(src_dir)
+# 周次表格的生成方式：xml（默认）把原型表格编译为 XML 字符串模板，逐周插值后直接写入 document.xml；
+# docx 为逐周复制表格、经 python-docx 填充后再合并的旧方式。模板无法编译时自动回落到 docx 方式
+WEEKS_ENGINE = (os.getenv("DOCX_WEEKS_ENGINE") or "xml").strip().lower()
 
-    # 2) 映射与关键字段
-    base_mapping = parse_placeholder_md(str(md_path))
-    subject = (base_mapping.get("授课科目") or "").strip()
+# 编译时嵌入原型的标记：文本槽位与整格改写的取值用私用区字符（模板正文中不会出现），整格计算的单元格用处理指令占位
+_SLOT_OPEN, _SLOT_CLOSE, _CELL_VALUE = "\ue000", "\ue001", "\ue002"
+_CELL_PI = "fastcell"
+_SEGMENT_RE = re.compile(_SLOT_OPEN + r"(\d+)" + _SLOT_CLOSE + r"|<\?" + _CELL_PI + r" (\d+)\?>")
+_XML_INVALID_RE = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+_XMLNS_RE = re.compile(r' xmlns:(\w+)="([^"]*)"')
+# 与 render_weeks_doc 中 add_paragraph("") + add_break(WD_BREAK.PAGE) 序列化的结果一致
+PAGE_BREAK_XML = '<w:p><w:r><w:br w:type="page"/></w:r></w:p>'
+
+
+@dataclass
+class FastCell:
+    """需要整格计算的单元格：单元格级兜底替换的槽位、“授课时间”后的数据格，或所在行中随周变化的单元格。
+
+    片段列表中 str 为原样输出的 XML/文本，int 为文本槽位编号。
+    """
+    text: List[Any]                     # 单元格文本（python-docx 的 cell.text 口径）
+    original: List[Any] = field(default_factory=list)   # 无需改写时输出的 XML
+    rewrite: tuple[str, str] = ("", "")  # 整格改写（同 write_cell_text_preserve_style）时 run 内容前后的 XML
+    substitute: bool = False            # 单元格级兜底替换
+    time_fix: bool = False              # “授课时间”数据格
+    label_check: bool = False           # 位于“授课时间”行：逐周复核不会变成该标签
+    pinned: bool = False                # 首段已按排除标题改挂保留原字体的样式
+
+
+@dataclass
+class FastWeekTemplate:
+    segments: List[Any]                 # 表格 XML；("cell", k) 为第 k 个整格计算的单元格
+    texts: List[str]                    # 各文本槽位的原文
+    cells: List[FastCell]
+    titles: List[List[Any]]             # 含文本槽位的段落文本：填充后成为排除标题时须回落
+    exclude_norm: set
+
+
+def _xml_escape(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace("\r", "&#13;")
+
+
+def _run_content_xml(text: str) -> str:
+    """与 python-docx 的 run.text 赋值一致：制表符为 w:tab、换行为 w:br，其余连续字符合为一个 w:t。"""
+    parts, buf = [], []
+
+    def flush():
+        if buf:
+            chunk = "".join(buf)
+            space = ' xml:space="preserve"' if len(chunk.strip()) < len(chunk) else ""
+            parts.append(f"<w:t{space}>{_xml_escape(chunk)}</w:t>")
+            buf.clear()
+
+    for ch in text:
+        if ch == "\t":
+            flush()
+            parts.append("<w:tab/>")
+        elif ch in "\r\n":
+            flush()
+            parts.append("<w:br/>")
+        else:
+            buf.append(ch)
+    flush()
+    return "".join(parts)
+
+
+def _serialize(element, outer_nsmap: Dict[Optional[str], str]) -> str:
+    """序列化元素，去掉目标文档根节点已声明的同名命名空间声明（与移入后由 lxml 序列化的结果一致）。"""
+    xml = etree.tostring(element, encoding="unicode")
+    end = xml.index(">")
+    start_tag = _XMLNS_RE.sub(
+        lambda m: "" if outer_nsmap.get(m.group(1)) == m.group(2) else m.group(0), xml[:end]
+    )
+    return start_tag + xml[end:]
+
+
+def _split_segments(xml: str) -> List[Any]:
+    segments: List[Any] = []
+    pos = 0
+    for m in _SEGMENT_RE.finditer(xml):
+        if m.start() > pos:
+            segments.append(xml[pos:m.start()])
+        segments.append(int(m.group(1)) if m.group(1) is not None else ("cell", int(m.group(2))))
+        pos = m.end()
+    if pos < len(xml):
+        segments.append(xml[pos:])
+    return segments
+
+
+def _fill_segments(segments: List[Any], values: List[str], escape: bool) -> str:
+    return "".join(
+        seg if isinstance(seg, str) else (_xml_escape(values[seg]) if escape else values[seg])
+        for seg in segments
+    )
+
+
+def _mark_week_cells(tbl, compiled: CompiledTemplate) -> Optional[Dict[Any, FastCell]]:
+    """找出需要整格计算的单元格（保持 fill_compiled_slots 的处理顺序）；
+    “授课时间”行的结构不适合直出（标签出现多次、数据格与标签同格或跨行合并）时返回 None。
+    """
+    cells: Dict[Any, FastCell] = {}
+
+    def want(tc, **flags):
+        if tc not in cells:
+            cells[tc] = FastCell(text=_split_segments(_Cell(tc, None).text))
+        for key in flags:
+            setattr(cells[tc], key, True)
+
+    cell_nodes = [_resolve_path(tbl, p) for p in compiled.cell_slots]
+    for tc in cell_nodes:
+        want(tc, substitute=True)
+    label = _norm_label("授课时间")
+    table = Table(tbl, None)
+    for path in compiled.row_slots:
+        tr = _resolve_path(tbl, path)
+        row_cells = list(_Row(tr, table).cells)
+        matches = []
+        for i, c in enumerate(row_cells[:-1]):
+            if c._tc in cell_nodes or _SLOT_OPEN in c.text:
+                # 随周变化的单元格：逐周复核不会成为标签
+                if c._tc.getparent() is not tr:
+                    return None
+                want(c._tc, label_check=True)
+            elif _norm_label(c.text) == label:
+                matches.append(i)
+        if len(matches) > 1:
+            return None
+        if matches:
+            data_tc = row_cells[matches[0] + 1]._tc
+            if data_tc is row_cells[matches[0]]._tc or data_tc.getparent() is not tr:
+                return None
+            want(data_tc, time_fix=True)
+    return cells
+
+
+def compile_fast_week_table(tbl, compiled: CompiledTemplate, styles, exclude_texts: Iterable[str],
+                            outer_nsmap: Dict[Optional[str], str]) -> Optional[FastWeekTemplate]:
+    """把（样式模式下已准备好的）原型表格就地编译为 XML 字符串模板；无法编译时返回 None。
+
+    styles 非空时，表格中属于 exclude_texts 的标题段落先按 pin_excluded_paragraphs 改挂保留原字体的样式。
+    """
+    texts = [t for _, t in compiled.text_slots]
+    if tbl.prefix != "w" or any(_SLOT_OPEN in t or _SLOT_CLOSE in t or _CELL_VALUE in t for t in texts):
+        return None
+    nodes = [_resolve_path(tbl, p) for p, _ in compiled.text_slots]
+    for i, node in enumerate(nodes):
+        node.text = f"{_SLOT_OPEN}{i}{_SLOT_CLOSE}"
+    cells = _mark_week_cells(tbl, compiled)
+    if cells is None:
+        return None
+
+    exclude_norm = set()
+    titles: List[List[Any]] = []
+    if styles is not None:
+        exclude_norm = {_norm_title_text(t) for t in exclude_texts if t}
+        static, dynamic = [], []
+        for p in _table_paragraphs(tbl):
+            (dynamic if _SLOT_OPEN in _paragraph_text(p) else static).append(p)
+        pin_excluded_paragraphs(styles, static, exclude_texts)
+        titles = [_split_segments(_paragraph_text(p)) for p in dynamic]
+        for tc, cell in cells.items():
+            first = tc.find(W_P)
+            cell.pinned = first is not None and (_paragraph_style_id(first, None) or "").startswith(KEEP_FONT_STYLE)
+
+    fast_cells = []
+    for k, (tc, cell) in enumerate(cells.items()):
+        cell.original = _split_segments(_serialize(tc, outer_nsmap))
+        probe = deepcopy(tc)
+        write_cell_text_preserve_style(_Cell(probe, None), _CELL_VALUE)
+        before, sep, after = _serialize(probe, outer_nsmap).partition(f"<w:t>{_CELL_VALUE}</w:t>")
+        if not sep:
+            return None
+        cell.rewrite = (before, after)
+        fast_cells.append(cell)
+        tc.getparent().replace(tc, etree.ProcessingInstruction(_CELL_PI, str(k)))
+    return FastWeekTemplate(segments=_split_segments(_serialize(tbl, outer_nsmap)), texts=texts,
+                            cells=fast_cells, titles=titles, exclude_norm=exclude_norm)
+
+
+def render_fast_week_table(fast: FastWeekTemplate, matcher: PlaceholderMatcher) -> Optional[str]:
+    """按 fill_compiled_slots + fix_time_cell_for_row 的顺序与规则生成一周表格的 XML；
+    结果会偏离 python-docx 路径时（值含 XML 不允许的字符、填充后出现新的标签或排除标题）返回 None。
+    """
+    values = [matcher.sub(t) for t in fast.texts]
+    if any(_XML_INVALID_RE.search(v) for v in values):
+        return None
+    if any(_norm_title_text(_fill_segments(t, values, escape=False)) in fast.exclude_norm for t in fast.titles):
+        return None
+    label = _norm_label("授课时间")
+    cells_xml = []
+    for cell in fast.cells:
+        current = _fill_segments(cell.text, values, escape=False)
+        rewrite = False
+        if cell.substitute:
+            new_text = matcher.sub(current)
+            if new_text != current:
+                current, rewrite = new_text, True
+        if cell.label_check and _norm_label(current) == label:
+            return None
+        if cell.time_fix:
+            new_text = ensure_week_word_in_time(cleanup_midline_spaces(current))
+            if new_text != current.strip():
+                current, rewrite = new_text, True
+        if not rewrite:
+            cells_xml.append(_fill_segments(cell.original, values, escape=True))
+            continue
+        if _XML_INVALID_RE.search(current):
+            return None
+        if fast.exclude_norm and (_norm_title_text(current) in fast.exclude_norm) != cell.pinned:
+            return None
+        cells_xml.append(cell.rewrite[0] + _run_content_xml(current) + cell.rewrite[1])
+    out = []
+    for seg in fast.segments:
+        if isinstance(seg, str):
+            out.append(seg)
+        elif isinstance(seg, int):
+            out.append(_xml_escape(values[seg]))
+        else:
+            out.append(cells_xml[seg[1]])
+    return "".join(out)
+
+
+def render_weeks_xml(week_tpl: Path, mapping: Dict[str, str], data: Dict[str, Any],
+                     target: Document) -> Optional[List[str]]:
+    """直出引擎：原型表格只编译一次为字符串模板，各周插入转义后的值，不再逐周复制与遍历 XML 树。
+
+    target 为周次表格将并入的文档（教案头）：周表格专用样式复制到其中，片段按其根节点的命名空间序列化。
+    返回依次追加到正文末尾的 XML 片段（各周表格与分页段落）；需要回落到 python-docx 路径时返回 None，
+    此时 target 的样式可能已被修改。仅用于样式模式（字体由周表格专用样式承载）。
+    """
+    if WEEKS_ENGINE != "xml" or FONT_MODE == "runs":
+        return None
+    if not week_tpl.exists():
+        raise FileNotFoundError(f"未找到周表格模板: {week_tpl}")
+    total_weeks, sections = complete_week_defaults(mapping, data)
+    base_doc, compiled = open_template(week_tpl, "weeks")
+    chosen_font_name, chosen_font_pt = chosen_week_font(mapping, compiled)
+    compiled = prepare_week_prototype(base_doc, compiled, chosen_font_name, chosen_font_pt)
+
+    # 与 merge_documents 相同：先带上周表格样式，排除标题按合并后的样式解析原字体
+    copy_paragraph_styles(base_doc, target, WEEK_TEXT_STYLE)
+    user_font_name = (mapping.get("统一字体名称") or "").strip() or None
+    pin = user_font_name or parse_font_size_pt(mapping.get("统一字号"))
+    fast = compile_fast_week_table(base_doc.tables[0]._tbl, compiled, target.styles.element if pin else None,
+                                   EXCLUDE_TITLES, target.element.nsmap)
+    if fast is None:
+        return None
+
+    maps = week_mappings(mapping, data, total_weeks, sections)
+    body: List[str] = []
+    for idx, merged_map in enumerate(maps, start=1):
+        xml = render_fast_week_table(fast, PlaceholderMatcher(merged_map))
+        if xml is None:
+            return None
+        body.append(xml)
+        if idx < len(maps):
+            body.append(PAGE_BREAK_XML)
+    return body
+
+
+def write_docx_with_body(doc: Document, body: Iterable[str]) -> bytes:
+    """保存 doc，并把 body 的 XML 片段依次写入 document.xml 正文末尾（与移入正文的元素位置相同），返回 docx 字节。"""
+    shell = io.BytesIO()
+    doc.save(shell)
+    out = io.BytesIO()
+    with zipfile.ZipFile(shell) as src, zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as dst:
+        for info in src.infolist():
+            data = src.read(info)
+            if info.filename != "word/document.xml":
+                dst.writestr(info, data)
+                continue
+            pos = data.rfind(b"</w:body>")
+            if pos >= 0:
+                head, tail = data[:pos], data[pos:]
+            else:
+                pos = data.rfind(b"<w:body/>")
+                if pos < 0:
+                    raise RuntimeError("document.xml 中未找到 w:body")
+                head, tail = data[:pos] + b"<w:body>", b"</w:body>" + data[pos + len(b"<w:body/>"):]
+            entry = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+            entry.compress_type = zipfile.ZIP_DEFLATED
+            with dst.open(entry, "w") as f:
+                f.write(head)
+                for chunk in body:
+                    f.write(chunk.encode("utf-8"))
+                f.write(tail)
+    return out.getvalue()
+
+
+def build_lesson_plan(mapping: Dict[str, str], data: Dict[str, Any], head_tpl: Path, week_tpl: Path,
+                      out: str | Path | BinaryIO | None = None,
+                      timings: Optional[Dict[str, float]] = None) -> bytes:
+    """全内存生成最终教案：教案头与周次集合不落盘，合并后只序列化一次。
+
+    mapping 为标记值映射（不会被修改），data 为周次 JSON 对象；
+    out 可为文件路径或可写二进制流，缺省时仅返回 docx 字节；
+    传入 timings 字典时写入各阶段耗时（秒）：docx_head / docx_weeks / docx_merge / docx_save。
+    """
+    if timings is None:
+        timings = {}
+    t0 = time.perf_counter()
+    head_doc = render_head_doc(head_tpl, dict(mapping))
+    t1 = time.perf_counter()
+    user_font_name = (mapping.get("统一字体名称") or "").strip() or None
+    user_font_size_pt = parse_font_size_pt(mapping.get("统一字号"))
+
+    # 直出引擎：周次表格以 XML 片段在保存时写入正文，合并只剩样式层统一字体
+    weeks_xml = render_weeks_xml(week_tpl, dict(mapping), data, head_doc)
+    if weeks_xml is not None:
+        t2 = time.perf_counter()
+        apply_style_fonts(head_doc, user_font_name, user_font_size_pt, EXCLUDE_TITLES)
+        t3 = time.perf_counter()
+        payload = write_docx_with_body(head_doc, weeks_xml)
+    else:
+        if WEEKS_ENGINE == "xml" and FONT_MODE != "runs":
+            # 回落时教案头的样式可能已被直出引擎修改，重新生成
+            head_doc = render_head_doc(head_tpl, dict(mapping))
+        weeks_doc = render_weeks_doc(week_tpl, dict(mapping), data)
+        t2 = time.perf_counter()
+        final_doc = merge_documents(head_doc, weeks_doc, user_font_name, user_font_size_pt)
+        t3 = time.perf_counter()
+        buf = io.BytesIO()
+        final_doc.save(buf)
+        payload = buf.getvalue()
+    if isinstance(out, (str, Path)):
+        out_path = Path(out)
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        # 先写临时文件再原子替换：并发生成同一课程时不会留下半截的 docx
+        tmp = out_path.with_name(f".{out_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            tmp.write_bytes(payload)
+            os.replace(tmp, out_path)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+    elif out is not None:
+        out.write(payload)
+    timings.update(docx_head=t1 - t0, docx_weeks=t2 - t1, docx_merge=t3 - t2, docx_save=time.perf_counter() - t3)
+    return payload
+
+
+def resolve_subject(mapping: Dict[str, str], data: Dict[str, Any]) -> str:
+    subject = (mapping.get("授课科目") or "").strip()
     if not subject:
         # 若 MD 未给，尝试从 JSON 内容推断
-        with open(json_path, 'r', encoding='utf-8') as f:
-            jd = json.load(f)
-        subject = (jd.get("授课科目") or "").strip()
+        subject = (data.get("授课科目") or "").strip()
     if not subject:
         raise RuntimeError("未在标记值MD或JSON中找到 ‘授课科目’")
+    return subject
+
+
+def build_course(md_path: Path, json_path: Path, head_tpl: Path, week_tpl: Path, out_dir: Path,
+                 timings: Optional[Dict[str, float]] = None) -> Path:
+    base_mapping = parse_placeholder_md(str(md_path))
+    data = load_weeks_data(json_path)
+    subject = resolve_subject(base_mapping, data)
+    final_doc = out_dir / f"教案-{subject}.docx"
+    build_lesson_plan(base_mapping, data, head_tpl, week_tpl, final_doc, timings)
+    return final_doc
+
+
+# ---------- 批量生成（进程池） ----------
+
+MARKS_PREFIX = "教案模板标记值-"
+
+
+def discover_course_pairs(data_dir: Path) -> List[tuple[Path, Optional[Path]]]:
+    """按 教案模板标记值-{科目}.md ↔ {科目}-*-data.json / {科目}-data.json 配对；缺 JSON 的记为 None。"""
+    pairs: List[tuple[Path, Optional[Path]]] = []
+    for md in sorted(data_dir.glob(f"{MARKS_PREFIX}*.md")):
+        name = glob.escape(md.stem[len(MARKS_PREFIX):])
+        candidates = sorted(data_dir.glob(f"{name}-*-data.json")) + sorted(data_dir.glob(f"{name}-data.json"))
+        pairs.append((md, candidates[0] if candidates else None))
+    return pairs
+
+
+def load_manifest(manifest_path: Path) -> List[tuple[Path, Optional[Path]]]:
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    base = manifest_path.parent
+    pairs: List[tuple[Path, Optional[Path]]] = []
+    for item in entries:
+        md = (base / item["md"]).resolve()
+        js = (base / item["json"]).resolve() if item.get("json") else None
+        pairs.append((md, js))
+    return pairs
+
 
-    # 3) 生成教案头
-    tmp_dir = src_dir / "_tmp_build"
-    head_doc = build_head_doc(head_tpl, dict(base_mapping), tmp_dir, subject)
+def preload_templates(head_tpl: Path, week_tpl: Path) -> None:
+    """预载两份模板的字节与预编译形式；批量工作进程与 UI 常驻服务启动时调用一次。"""
+    open_template(head_tpl, "head")
+    open_template(week_tpl, "weeks")
 
-    # 4) 生成周次集合
-    weeks_doc = build_weeks_doc(week_tpl, dict(base_mapping), json_path, tmp_dir, subject)
 
-    # 5) 合并并统一字体（可从映射读取用户配置）
-    user_font_name = (base_mapping.get("统一字体名称") or "").strip() or None
-    user_font_size_pt = parse_font_size_pt(base_mapping.get("统一字号"))
-    final_doc = src_dir / f"教案-{subject}.docx"
-    merge_docs(head_doc, weeks_doc, final_doc, user_font_name, user_font_size_pt)
+def _init_batch_worker(head_tpl: Path, week_tpl: Path) -> None:
+    # 每个工作进程启动时预载模板的预编译形式（父进程已写入磁盘缓存），之后的课程直接复用
+    preload_templates(head_tpl, week_tpl)
 
-    # 6) 清理临时产物
+
+def _build_course_job(md_path: Path, json_path: Optional[Path], head_tpl: Path, week_tpl: Path,
+                      out_dir: Path) -> Dict[str, Any]:
+    started = time.perf_counter()
+    result: Dict[str, Any] = {"md": str(md_path), "json": str(json_path) if json_path else None}
     try:
-        shutil.rmtree(tmp_dir)
-    except Exception:
-        pass
+        if json_path is None or not json_path.exists():
+            raise FileNotFoundError(f"未找到与 {md_path.name} 配对的周次JSON")
+        result["output"] = str(build_course(md_path, json_path, head_tpl, week_tpl, out_dir))
+        result["ok"] = True
+    except Exception as e:
+        result["ok"] = False
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def run_batch(pairs: List[tuple[Path, Optional[Path]]], head_tpl: Path, week_tpl: Path, out_dir: Path,
+              workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """在进程池中并行生成多门课程的教案，返回逐门结果（按输入顺序）。"""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    # 父进程先编译模板并写入磁盘缓存，工作进程初始化时直接命中
+    open_template(head_tpl, "head")
+    open_template(week_tpl, "weeks")
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(pairs) or 1))
+    results: List[Optional[Dict[str, Any]]] = [None] * len(pairs)
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker,
+                             initargs=(head_tpl, week_tpl)) as pool:
+        futures = {
+            pool.submit(_build_course_job, md, js, head_tpl, week_tpl, out_dir): i
+            for i, (md, js) in enumerate(pairs)
+        }
+        for fut in as_completed(futures):
+            res = fut.result()
+            results[futures[fut]] = res
+            if res["ok"]:
+                print(f"[完成] {res['seconds']:.2f}s  {res['output']}")
+            else:
+                print(f"[失败] {res['seconds']:.2f}s  {res['md']}：{res['error']}")
+    return [r for r in results if r is not None]
+
+
+# ---------- 启动耗时分析 ----------
+
+# (阶段名, 在干净解释器中依次执行的语句)；独立运行包不依赖上层目录，故在此自带精简实现
+STARTUP_PHASES = [
+    ("启动（--help / 参数校验）", "import build_word_from_templates"),
+    ("处理文档（python-docx / lxml）", "build_word_from_templates._require_docx()"),
+    ("批量模式（进程池）", "import concurrent.futures.process"),
+]
+
+
+def profile_startup(top: int = 8) -> None:
+    """以 python -X importtime 在子进程中依次执行各阶段，打印每阶段新增的导入耗时（按顶层包汇总）。"""
+    import subprocess
+    from collections import defaultdict
+
+    mark = "--startup-profile-phase--"
+    code = "\n".join(["import sys"] + [f"{stmt}\nsys.stderr.write({mark!r} + '\\n')" for _, stmt in STARTUP_PHASES])
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=str(Path(__file__).parent),
+                          capture_output=True, text=True, encoding="utf-8")
+    if proc.returncode != 0:
+        raise RuntimeError(f"启动耗时分析失败：\n{proc.stderr[-2000:]}")
+
+    line_re = re.compile(r"^import time:\s+(\d+) \|\s+\d+ \|\s*(\S+)")
+    phase, packages, total = 0, defaultdict(float), 0.0
+    print("启动耗时分析（python -X importtime，单位 ms，按阶段增量统计）：")
+    for line in proc.stderr.splitlines():
+        m = line_re.match(line)
+        if m:
+            ms = int(m.group(1)) / 1000
+            packages[m.group(2).split(".")[0]] += ms
+            total += ms
+        elif line.strip() == mark:
+            print(f"\n[{STARTUP_PHASES[phase][0]}] 合计 {sum(packages.values()):.1f} ms")
+            for name, ms in sorted(packages.items(), key=lambda x: -x[1])[:top]:
+                print(f"    {name:<32}{ms:>9.1f}")
+            phase, packages = phase + 1, defaultdict(float)
+    print(f"\n合计：{total:.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="根据标记值MD与周次JSON，套用 docx 模板生成《教案-{科目}.docx》。")
+    parser.add_argument("--batch", default="", help="批量模式：含多组 教案模板标记值-*.md 与 *-data.json 的目录")
+    parser.add_argument("--manifest", default="", help="批量模式：JSON 清单，形如 [{\"md\": ..., \"json\": ...}]")
+    parser.add_argument("--out-dir", default="", help="批量模式输出目录，缺省为脚本所在目录")
+    parser.add_argument("--workers", type=int, default=0, help="批量模式并行进程数，缺省为 CPU 核数")
+    parser.add_argument("--profile-startup", action="store_true", help="分析启动与按需加载依赖的导入耗时后退出")
+    args = parser.parse_args()
+    if args.profile_startup:
+        profile_startup()
+        return
+
+    src_dir = Path(__file__).parent.resolve()
+    head_tpl, week_tpl = find_docx_templates(src_dir)
+
+    if args.batch or args.manifest:
+        pairs = load_manifest(Path(args.manifest)) if args.manifest else discover_course_pairs(Path(args.batch))
+        if not pairs:
+            raise FileNotFoundError("批量模式未找到任何 ‘教案模板标记值-*.md’")
+        out_dir = Path(args.out_dir).resolve() if args.out_dir else src_dir
+        started = time.perf_counter()
+        results = run_batch(pairs, head_tpl, week_tpl, out_dir, args.workers or None)
+        elapsed = round(time.perf_counter() - started, 3)
+        failed = [r for r in results if not r["ok"]]
+        report = {"total": len(results), "succeeded": len(results) - len(failed), "failed": len(failed),
+                  "seconds": elapsed, "courses": results}
+        report_path = out_dir / "batch-report.json"
+        report_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"[汇总] 共 {len(results)} 门，成功 {report['succeeded']}，失败 {len(failed)}，耗时 {elapsed:.2f}s；报告：{report_path}")
+        if failed:
+            sys.exit(1)
+        return
+
+    # 1) 输入
+    md_path, json_path, _syllabus = find_input_files(src_dir)
+
+    # 2) 内存中生成教案头与周次集合，合并并统一字体（可从映射读取用户配置）后一次写出
+    final_doc = build_course(md_path, json_path, head_tpl, week_tpl, src_dir)
 
     print(f"[完成] 生成成功：{final_doc}")
 
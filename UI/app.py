@@ -1,18 +1,234 @@
 import os
 import sys
-import subprocess
-import shutil
+import json
+import time
+import uuid
+import hashlib
+import threading
 from pathlib import Path
-from flask import Flask, render_template, request, redirect, url_for, send_from_directory, flash
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, render_template, request, redirect, url_for, send_file, flash, Response, abort, jsonify
+from werkzeug.security import safe_join
 
-app = Flask(__name__)
-# 简单随机密钥用于Flash消息（不会用于持久化会话）
-app.secret_key = os.urandom(16)
+from job_store import JobStore
 
 # 定位项目与输出目录
 BASE_DIR = Path(__file__).resolve().parents[1]
+IRP_DIR = BASE_DIR / 'IndependentRunningPackage'
 OUTPUT_DIR = BASE_DIR / 'output'
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+DOCS_DIR = BASE_DIR / 'docs'
+
+# 生成流程在本进程内直接调用（不再为每次请求启动子进程），模块只在启动时导入一次
+sys.path[:0] = [str(BASE_DIR), str(IRP_DIR)]
+from build_course_docs import load_templates, generate_course_files, render_marks  # noqa: E402
+from generate_syllabus import use_credentials  # noqa: E402
+from build_word_from_templates import build_course, find_docx_templates, preload_templates  # noqa: E402
+from artifact_store import ArtifactStore  # noqa: E402
+from metrics import RUNS, RUN_SECONDS, observe_stage, record_run, render_prometheus, stage_timer  # noqa: E402
+
+# 启动时预载大纲/教案 JSON 模板文本与 Word 模板（含预编译槽位），各任务共享
+SYLLABUS_TEMPLATE_TEXT, DATA_TEMPLATE_TEXT = load_templates(
+    BASE_DIR / 'templates' / 'syllabus_template.md', BASE_DIR / 'templates' / 'data_template.json'
+)
+HEAD_TEMPLATE, WEEK_TEMPLATE = find_docx_templates(IRP_DIR)
+preload_templates(HEAD_TEMPLATE, WEEK_TEMPLATE)
+
+app = Flask(__name__)
+# 简单随机密钥用于Flash消息（不会用于持久化会话）
+app.secret_key = os.urandom(16)
+
+# 生成任务：持久任务表记录状态与阶段时间；有界线程池执行，提交请求立即返回任务号
+JOB_DB_PATH = Path(os.environ.get('JOB_DB_PATH') or BASE_DIR / '.cache' / 'jobs.sqlite')
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS') or 2)
+JOB_QUEUE_LIMIT = int(os.environ.get('JOB_QUEUE_LIMIT') or 20)
+JOB_EVENTS_TTL_SECONDS = 600
+
+JOBS = JobStore(JOB_DB_PATH)
+JOBS.fail_interrupted()
+JOB_EXECUTOR = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='job')
+SUBMIT_LOCK = threading.Lock()
+
+# 任务产物：在私有工作目录中生成，按内容哈希收录进产物库（以任务号为运行号），再原子发布到 output / docs；
+# 同名课程的并发任务互不覆盖，各自的下载链接始终指向本任务的产物
+ARTIFACTS = ArtifactStore()
+ARTIFACT_GC_INTERVAL_SECONDS = 3600
+_last_gc = [0.0]
+# 按任务下载的地址内容不变，允许浏览器与校园代理缓存；output / docs 下的同名文件会被覆盖，每次需带 ETag 重新验证
+RUN_FILE_MAX_AGE = 86400
+BUNDLE_ORDER = ('syllabus', 'plan', 'marks', 'word')
+
+# output / docs 文件的内容哈希（强 ETag），按 (路径, 修改时间, 大小) 缓存，文件被替换后自动重新计算
+_ETAGS = {}
+_ETAGS_LOCK = threading.Lock()
+
+# 运行中/刚结束任务的实时事件（token 与阶段切换），仅驻留内存，供结果页 SSE 预览
+JOB_EVENTS = {}
+JOB_EVENTS_LOCK = threading.Lock()
+
+
+class JobEvents:
+    """单个任务的事件缓冲：工作线程追加，SSE 连接可从任意位置回放并等待新事件。"""
+
+    def __init__(self):
+        self.items = []
+        self.finished_at = None
+        self.cond = threading.Condition()
+
+    def append(self, event, payload):
+        with self.cond:
+            self.items.append((event, payload))
+            self.cond.notify_all()
+
+    def finish(self):
+        with self.cond:
+            self.finished_at = time.time()
+            self.cond.notify_all()
+
+    def wait_from(self, index, timeout):
+        with self.cond:
+            if index >= len(self.items) and self.finished_at is None:
+                self.cond.wait(timeout)
+            return self.items[index:], self.finished_at is not None
+
+
+def resolve_base_url(model):
+    # 凭据只在任务上下文内生效（不写入进程环境变量，避免并发任务互相覆盖）
+    if model.startswith('deepseek'):
+        return 'https://api.deepseek.com'
+    if model.startswith('gpt') or model.startswith('o'):
+        # 使用 OpenAI 官方地址
+        return 'https://api.openai.com/v1'
+    return os.environ.get('OPENAI_BASE_URL') or os.environ.get('LLM_BASE_URL')
+
+
+def split_list(text):
+    return [s.strip() for s in text.split(',') if s.strip()] if text else None
+
+
+def write_marks_file(job, out_dir):
+    """基于模板在 out_dir 生成“教案模板标记值-课程名称.md”，返回提示信息列表（不阻断主流程）。"""
+    notices = []
+    try:
+        tpl_path = BASE_DIR / 'templates' / '教案模板标记值.md'
+        if tpl_path.exists():
+            out_text = render_marks(tpl_path.read_text(encoding='utf-8'), job)
+            out_name = f"教案模板标记值-{job['course']}.md"
+            out_path = out_dir / out_name
+            out_path.write_text(out_text, encoding='utf-8')
+    except Exception as e:
+        notices.append(f'提示：标记值文件生成时出现问题：{e}')
+    return notices
+
+
+def artifact_names(course, weeks):
+    # 生成的文件路径（根据命名规则）
+    return {
+        'syllabus': f"{course}-教学大纲.md",
+        'plan': f"{course}-{weeks}-data.json",
+        'marks': f"教案模板标记值-{course}.md",
+    }
+
+
+def collect_artifacts(course, weeks, out_dir):
+    return {key: name for key, name in artifact_names(course, weeks).items() if (out_dir / name).exists()}
+
+
+def artifact_links(job_id, artifacts):
+    # 产物库中有本任务的运行记录时按任务下载；更早的任务仍从 output / docs 下载（Word 教案位于 docs）
+    if ARTIFACTS.load_run(job_id) is not None:
+        return {key: url_for('job_file', job_id=job_id, filename=name) for key, name in artifacts.items()}
+    return {
+        key: url_for('download_docs' if key == 'word' else 'download', filename=name)
+        for key, name in artifacts.items()
+    }
+
+
+def build_word_doc(course, weeks, artifacts, work_dir):
+    """由工作目录中的标记值 MD 与教案 JSON 直接生成 Word 教案到同一目录（使用启动时预载的模板）。
+
+    成功时向 artifacts 写入 'word'（文件名），返回提示信息列表；各文档阶段耗时计入运行指标。
+    """
+    notices = []
+    names = artifact_names(course, weeks)
+    try:
+        marks_path = work_dir / names['marks']
+        plan_path = work_dir / names['plan']
+        if not marks_path.exists() or not plan_path.exists():
+            notices.append('缺少标记值文件或教案 JSON，未生成 Word 教案。')
+            return notices
+        timings = {}
+        docx_path = build_course(marks_path, plan_path, HEAD_TEMPLATE, WEEK_TEMPLATE, work_dir, timings)
+        for stage_name, seconds in timings.items():
+            observe_stage(stage_name, seconds)
+        artifacts['word'] = docx_path.name
+    except Exception as e:
+        notices.append(f'教案 Word 生成失败：{e}')
+    return notices
+
+
+def store_artifacts(job_id, course, artifacts, work_dir):
+    """把工作目录中的产物收录进产物库（改名而非复制）并记录本任务的运行，再发布到 output / docs。
+
+    教案输入记录（供命令行 --regen 使用）一并发布，但不作为下载项。
+    """
+    files = {name: ARTIFACTS.put_file(work_dir / name, move=True) for name in artifacts.values()}
+    for path in work_dir.glob('*-inputs.json'):
+        files[path.name] = ARTIFACTS.put_file(path, move=True)
+    ARTIFACTS.record_run(job_id, files, course=course)
+    word_name = artifacts.get('word')
+    for name, digest in files.items():
+        ARTIFACTS.publish(digest, (DOCS_DIR if name == word_name else OUTPUT_DIR) / name)
+
+
+def content_etag(path):
+    st = path.stat()
+    key = (str(path), st.st_mtime_ns, st.st_size)
+    with _ETAGS_LOCK:
+        etag = _ETAGS.get(key)
+    if etag is None:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        etag = digest.hexdigest()
+        with _ETAGS_LOCK:
+            if len(_ETAGS) > 1024:
+                _ETAGS.clear()
+            _ETAGS[key] = etag
+    return etag
+
+
+def send_output_file(directory, filename):
+    """带强 ETag 提供 output / docs 中的文件：If-None-Match 命中返回 304，支持 Range 断点/分段下载。"""
+    path = safe_join(str(directory), filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    return send_file(path, as_attachment=True, etag=content_etag(Path(path)), max_age=0)
+
+
+def collect_garbage():
+    # 按 ARTIFACT_MAX_AGE_DAYS / ARTIFACT_MAX_MB 回收产物库，至多每小时一次
+    now = time.time()
+    if now - _last_gc[0] < ARTIFACT_GC_INTERVAL_SECONDS:
+        return
+    _last_gc[0] = now
+    try:
+        ARTIFACTS.gc()
+    except Exception as e:
+        print(f'产物库回收失败：{e}', file=sys.stderr)
+
+
+def _purge_job_events():
+    now = time.time()
+    for job_id in [j for j, ev in JOB_EVENTS.items() if ev.finished_at and now - ev.finished_at > JOB_EVENTS_TTL_SECONDS]:
+        JOB_EVENTS.pop(job_id, None)
+
+
+def sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
 
 @app.route('/', methods=['GET', 'POST'])
 def index():
@@ -24,7 +240,7 @@ def index():
         features = (request.form.get('features') or '').strip()
         model = (request.form.get('model') or '').strip()
         api_key = (request.form.get('api_key') or '').strip()
-        
+
         # 新增：授课信息字段
         teacher = (request.form.get('teacher') or '').strip()
         class_name = (request.form.get('class_name') or '').strip()
@@ -54,165 +270,197 @@ def index():
             if 1 <= n < 100:
                 class_size = str(n)
 
-        # 设置环境变量（仅进程级，避免落盘）
-        env = os.environ.copy()
-        env['OPENAI_API_KEY'] = api_key
-        env['DEEPSEEK_API_KEY'] = api_key
-        if model.startswith('deepseek'):
-            env['OPENAI_BASE_URL'] = 'https://api.deepseek.com'
-        elif model.startswith('gpt') or model.startswith('o'):
-            # 使用 OpenAI 官方时，可不设置 BASE_URL 或根据实际代理设置
-            env.pop('OPENAI_BASE_URL', None)
-        # 保证 UTF-8 输出
-        env['PYTHONIOENCODING'] = 'utf-8'
-
-        # 构建命令
-        cmd = [
-            sys.executable,
-            str(BASE_DIR / 'build_course_docs.py'),
-            '--course', course,
-            '--weeks', str(weeks),
-            '--model', model or 'deepseek-chat',
-        ]
-        if parts:
-            cmd += ['--parts', parts]
-        if exclude:
-            cmd += ['--exclude', exclude]
-        if features:
-            cmd += ['--features', features]
-
-        # 运行脚本
-        try:
-            proc = subprocess.run(cmd, env=env, cwd=str(BASE_DIR), capture_output=True, text=True, encoding='utf-8')
-        except Exception as e:
-            flash(f'执行出错：{e}')
-            return render_template('index.html')
+        job = {
+            'course': course, 'weeks': weeks, 'parts': parts, 'exclude': exclude, 'features': features,
+            'model': model, 'teacher': teacher, 'class_name': class_name, 'location': location,
+            'assessment': assessment, 'class_size': class_size, 'weekly_hours': weekly_hours,
+            'teaching_time': teaching_time, 'api_key': api_key,
+        }
 
-        if proc.returncode != 0:
-            flash('生成失败：' + (proc.stderr or proc.stdout))
-            return render_template('index.html')
+        # 入队后立即返回，结果页轮询 /jobs/<id> 获取状态，并通过 SSE 预览生成过程
+        job_id = uuid.uuid4().hex
+        with SUBMIT_LOCK:
+            if JOBS.count_active() >= JOB_QUEUE_LIMIT:
+                flash('当前排队的生成任务较多，请稍后再试')
+                return render_template('index.html'), 503
+            JOBS.create(job_id, course, weeks)
+            with JOB_EVENTS_LOCK:
+                _purge_job_events()
+                JOB_EVENTS[job_id] = JobEvents()
+            JOB_EXECUTOR.submit(run_job, job_id, job)
+        return redirect(url_for('job_page', job_id=job_id))
 
-        # 基于模板生成“教案模板标记值-课程名称.md”
-        try:
-            tpl_path = BASE_DIR / 'templates' / '教案模板标记值.md'
-            if tpl_path.exists():
-                tpl_text = tpl_path.read_text(encoding='utf-8')
-                # 替换占位符
-                replacements = {
-                    '{授课科目}': course,
-                    '{总周数}': str(weeks),
-                    '{授课老师}': teacher,
-                    '{授课班级}': class_name,  # 新增：来自表单
-                    '{班级人数}': class_size,
-                    '{授课时间}': teaching_time,
-                    '{周学时}': (f"{weekly_hours} 学时/周" if weekly_hours else ''),
-                    '{考核方式}': assessment,
-                    '{授课地点}': location,
-                }
-                out_text = tpl_text
-                for k, v in replacements.items():
-                    out_text = out_text.replace(k, v)
-                out_name = f"教案模板标记值-{course}.md"
-                out_path = OUTPUT_DIR / out_name
-                out_path.write_text(out_text, encoding='utf-8')
-        except Exception as e:
-            # 不阻断主流程，仅提示
-            flash(f'提示：标记值文件生成时出现问题：{e}')
-
-        # 生成的文件路径（根据命名规则）
-        syllabus_file = f"{course}-教学大纲.md"
-        plan_file = f"{course}-{weeks}-data.json"
-        marks_file = f"教案模板标记值-{course}.md"
-
-        links = {}
-        if (OUTPUT_DIR / syllabus_file).exists():
-            links['syllabus'] = url_for('download', filename=syllabus_file)
-        if (OUTPUT_DIR / plan_file).exists():
-            links['plan'] = url_for('download', filename=plan_file)
-        if (OUTPUT_DIR / marks_file).exists():
-            links['marks'] = url_for('download', filename=marks_file)
-
-        if not links:
-            flash('未找到生成的文件，请检查日志输出。')
-            return render_template('index.html', raw_output=proc.stdout)
-
-        # 新增：将 output 结果拷贝到 IndependentRunningPackage/data 并执行单文件脚本，随后将结果放入 docs
+    return render_template('index.html')
+
+
+def run_job(job_id, job):
+    """在工作线程中执行一个生成任务：大纲/教案 JSON → 标记值文件 → Word 教案，全部在本进程内完成。"""
+    events = JOB_EVENTS.get(job_id) or JobEvents()
+
+    def emit(event, payload):
+        if event == 'stage':
+            JOBS.mark_stage(job_id, payload['stage'], payload['status'])
+        events.append(event, payload)
+
+    def finish_run(outcome):
+        # 进程级累计指标（/metrics）与本任务的运行摘要（结果页展示）
+        summary = run.summary()
+        RUNS.inc(outcome=outcome)
+        RUN_SECONDS.observe(summary['seconds'], outcome=outcome)
+        return summary
+
+    def fail(message):
+        JOBS.update(job_id, status='failed', finished=time.time(), error=message, metrics=finish_run('failed'))
+        events.append('failed', {'message': message})
+
+    JOBS.update(job_id, status='running', started=time.time())
+    with record_run() as run, ARTIFACTS.workspace(prefix=f'{job_id}-') as work_dir:
         try:
-            irp_dir = BASE_DIR / 'IndependentRunningPackage'
-            data_dir = irp_dir / 'data'
-            data_dir.mkdir(parents=True, exist_ok=True)
-
-            # 拷贝三份文件（存在则覆盖）
-            to_copy = [
-                (OUTPUT_DIR / marks_file),
-                (OUTPUT_DIR / plan_file),
-                (OUTPUT_DIR / syllabus_file),
-            ]
-            for src in to_copy:
-                if src.exists():
-                    shutil.copy2(str(src), str(data_dir / src.name))
-
-            # 执行独立运行包脚本
-            script_path = irp_dir / 'build_word_from_templates.py'
-            if script_path.exists():
-                proc2 = subprocess.run(
-                    [sys.executable, str(script_path)],
-                    cwd=str(irp_dir),
-                    capture_output=True,
-                    text=True,
-                    encoding='utf-8'
+            model = job['model'] or 'deepseek-chat'
+            with use_credentials(job['api_key'], resolve_base_url(model)):
+                generate_course_files(
+                    course=job['course'],
+                    weeks=job['weeks'],
+                    template_text=SYLLABUS_TEMPLATE_TEXT,
+                    data_template_text=DATA_TEMPLATE_TEXT,
+                    parts=split_list(job['parts']),
+                    excludes=split_list(job['exclude']),
+                    features=job['features'] or None,
+                    model=model,
+                    out_dir=work_dir,
+                    structured_json=True,
+                    on_event=lambda event_type, **payload: emit(event_type, payload),
                 )
-                if proc2.returncode != 0:
-                    flash('教案 Word 生成脚本执行失败：' + (proc2.stderr or proc2.stdout))
-                else:
-                    # 将生成结果复制到 docs 目录
-                    docs_dir = BASE_DIR / 'docs'
-                    docs_dir.mkdir(parents=True, exist_ok=True)
-                    expected_name = f"教案-{course}.docx"
-                    src_docx = irp_dir / expected_name
-                    target_path = docs_dir / expected_name
-                    found = False
-                    if src_docx.exists():
-                        shutil.copy2(str(src_docx), str(target_path))
-                        found = True
-                    else:
-                        # 兜底：按名称模式查找
-                        for p in irp_dir.glob('教案-*.docx'):
-                            if course in p.stem:
-                                shutil.copy2(str(p), str(target_path))
-                                found = True
-                                break
-                    # 如果已经复制成功，则将下载链接加入返回
-                    if found and target_path.exists():
-                        try:
-                            links['word'] = url_for('download_docs', filename=expected_name)
-                        except Exception:
-                            pass
-                    if not found:
-                        flash('未在独立运行包目录找到生成的教案 Word 文件。')
-            else:
-                flash('未找到独立运行包脚本：IndependentRunningPackage/build_word_from_templates.py')
+
+            with stage_timer('marks_file'):
+                notices = write_marks_file(job, work_dir)
+            artifacts = collect_artifacts(job['course'], job['weeks'], work_dir)
+            if not artifacts:
+                fail('未找到生成的文件，请检查日志输出。')
+                return
+            emit('stage', {'stage': 'word', 'status': 'start'})
+            notices += build_word_doc(job['course'], job['weeks'], artifacts, work_dir)
+            emit('stage', {'stage': 'word', 'status': 'done'})
+            with stage_timer('write_files'):
+                store_artifacts(job_id, job['course'], artifacts, work_dir)
+            JOBS.update(job_id, status='done', stage='done', finished=time.time(), artifacts=artifacts,
+                        notices=notices, metrics=finish_run('done'))
+            events.append('done', {})
         except Exception as e:
-            flash(f'提示：自动汇入独立运行包并生成 Word 失败：{e}')
+            fail(f'生成失败：{e}')
+        finally:
+            events.finish()
+    collect_garbage()
 
-        return render_template('result.html', course=course, links=links, raw_output=proc.stdout)
 
-    return render_template('index.html')
+@app.route('/jobs/<job_id>/view')
+def job_page(job_id):
+    record = JOBS.get(job_id)
+    if record is None:
+        abort(404)
+    return render_template(
+        'result.html', course=record['course'], links={},
+        status_url=url_for('job_status', job_id=job_id),
+        result_url=url_for('job_result', job_id=job_id),
+        events_url=url_for('job_events', job_id=job_id),
+    )
+
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    record = JOBS.get(job_id)
+    if record is None:
+        abort(404)
+    record.pop('artifacts', None)
+    return jsonify(record)
+
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    record = JOBS.get(job_id)
+    if record is None:
+        abort(404)
+    if record['status'] != 'done':
+        return jsonify({'status': record['status'], 'error': record['error'], 'metrics': record['metrics']}), 409
+    return jsonify({
+        'status': 'done', 'links': artifact_links(job_id, record['artifacts']),
+        'bundle': url_for('bundle', run=job_id) if ARTIFACTS.load_run(job_id) is not None else None, 'notices': record['notices'],
+        'metrics': record['metrics'],
+    })
+
+
+@app.route('/metrics')
+def metrics():
+    # Prometheus 文本格式：阶段耗时、大模型请求耗时/次数/token 用量、任务次数与总耗时（自进程启动起累计）
+    return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    with JOB_EVENTS_LOCK:
+        events = JOB_EVENTS.get(job_id)
+    if events is None:
+        abort(404)
+
+    def generate():
+        # 只读回放：浏览器断开不影响任务本身
+        index = 0
+        while True:
+            items, finished = events.wait_from(index, timeout=15)
+            if not items:
+                if finished:
+                    return
+                yield ': keep-alive\n\n'
+                continue
+            index += len(items)
+            for event, payload in items:
+                yield sse(event, payload)
+
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    return Response(generate(), mimetype='text/event-stream', headers=headers)
+
+
+@app.route('/jobs/<job_id>/files/<path:filename>')
+def job_file(job_id, filename):
+    # 从产物库提供某次任务的产物（按运行记录中的文件名 → 内容哈希定位）
+    # 对象以内容哈希命名，直接用作强 ETag；send_file 处理 If-None-Match（304）与 Range（206）
+    path = ARTIFACTS.resolve(job_id, filename)
+    if path is None:
+        abort(404)
+    return send_file(path, as_attachment=True, download_name=filename, etag=path.name, max_age=RUN_FILE_MAX_AGE)
+
+
+@app.route('/bundle/<run>')
+def bundle(run):
+    """把一次任务的大纲、教案 JSON、标记值 Markdown 与 Word 教案打包为 zip，边压缩边发送（不生成临时文件）。"""
+    record = JOBS.get(run)
+    etag = ARTIFACTS.run_digest(run)
+    if record is None or etag is None:
+        abort(404)
+    artifacts = record['artifacts'] or {}
+    names = [artifacts[key] for key in BUNDLE_ORDER if key in artifacts]
+    if not names or any(ARTIFACTS.resolve(run, name) is None for name in names):
+        abort(404)
+    response = Response(ARTIFACTS.iter_run_zip(run, names), mimetype='application/zip', direct_passthrough=True)
+    response.headers['Content-Disposition'] = f"attachment; filename*=UTF-8''{quote(record['course'])}.zip"
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = RUN_FILE_MAX_AGE
+    return response.make_conditional(request)
 
 
 @app.route('/download/<path:filename>')
 def download(filename):
     # 从 output 目录提供下载
-    return send_from_directory(OUTPUT_DIR, filename, as_attachment=True)
+    return send_output_file(OUTPUT_DIR, filename)
 
 
 # 新增：从 docs 目录下载教案 Word 文件
 @app.route('/download-docs/<path:filename>')
 def download_docs(filename):
-    docs_dir = BASE_DIR / 'docs'
-    return send_from_directory(docs_dir, filename, as_attachment=True)
+    return send_output_file(DOCS_DIR, filename)
 
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT') or os.environ.get('FLASK_RUN_PORT') or 89)
-    app.run(host='0.0.0.0', port=port)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=port, threaded=True)
@@ -0,0 +1,98 @@
+"""
+生成任务的持久任务表（SQLite）。
+
+记录每个任务的状态（queued/running/done/failed）、当前阶段、各阶段起止时间、
+产物文件名、提示信息与本次运行统计（阶段耗时、大模型请求与 token 用量）。不保存 API Key 等敏感信息；服务重启时未完成的任务标记为失败。
+仅使用标准库，每次操作独立连接，依赖 SQLite 自身的锁。
+"""
+
+import json
+import time
+import sqlite3
+from pathlib import Path
+from typing import List, Optional
+
+JOB_STATUSES = ("queued", "running", "done", "failed")
+_JSON_FIELDS = ("stages", "artifacts", "notices", "metrics")
+
+
+class JobStore:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, course TEXT, weeks INTEGER, status TEXT, stage TEXT,"
+                " created REAL, started REAL, finished REAL,"
+                " stages TEXT DEFAULT '{}', artifacts TEXT DEFAULT '{}', notices TEXT DEFAULT '[]', error TEXT,"
+                " metrics TEXT DEFAULT '{}')"
+            )
+            # 旧版本创建的任务表没有 metrics 列，补齐
+            columns = {r["name"] for r in conn.execute("PRAGMA table_info(jobs)")}
+            if "metrics" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN metrics TEXT DEFAULT '{}'")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def create(self, job_id: str, course: str, weeks: int) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs(id, course, weeks, status, created) VALUES (?, ?, ?, 'queued', ?)",
+                (job_id, course, weeks, time.time()),
+            )
+
+    def update(self, job_id: str, **fields) -> None:
+        for name in _JSON_FIELDS:
+            if name in fields:
+                fields[name] = json.dumps(fields[name], ensure_ascii=False)
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def mark_stage(self, job_id: str, stage: str, status: str) -> None:
+        """记录阶段时间戳：stages[stage][status] = 当前时间，并更新当前阶段。"""
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT stages FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return
+            stages = json.loads(row["stages"] or "{}")
+            stages.setdefault(stage, {})[status] = now
+            conn.execute(
+                "UPDATE jobs SET stages = ?, stage = ? WHERE id = ?",
+                (json.dumps(stages, ensure_ascii=False), stage, job_id),
+            )
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = dict(row)
+            if job["status"] == "queued":
+                # 排在前面的任务数（含正在等待的）
+                job["queue_position"] = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created < ?", (job["created"],)
+                ).fetchone()[0]
+        for name in _JSON_FIELDS:
+            job[name] = json.loads(job[name] or ("[]" if name == "notices" else "{}"))
+        return job
+
+    def count_active(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')").fetchone()[0]
+
+    def fail_interrupted(self) -> List[str]:
+        """服务启动时调用：上次进程退出时仍在排队/运行的任务已无法继续，标记为失败。"""
+        with self._connect() as conn:
+            ids = [r[0] for r in conn.execute("SELECT id FROM jobs WHERE status IN ('queued', 'running')")]
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', finished = ?, error = ? WHERE status IN ('queued', 'running')",
+                (time.time(), "服务重启，任务已中断，请重新提交。"),
+            )
+        return ids
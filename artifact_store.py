@@ -0,0 +1,290 @@
+"""
+按内容寻址的产物库：生成结果按 sha256 只存一份，每次运行以“文件名 → 哈希”的引用记录访问。
+
+目录结构（ARTIFACT_STORE_PATH，默认 .cache/artifacts）：
+- objects/ab/abcdef...：文件内容，以哈希命名，写入后不再修改；
+- runs/<运行号>.json：{"created": 时间戳, "files": {文件名: 哈希}, ...}；
+- work/：各运行的私有工作目录，与 objects 位于同一文件系统，收录时直接改名而非复制。
+所有写入均先写临时文件再 os.replace，读者只会看到完整的旧文件或新文件；
+发布到 output/、docs/ 时优先硬链接（同样原子替换），不支持时退回复制。
+gc 按运行记录的年龄与对象总大小回收；iter_run_zip 把一次运行的全部文件边读边压缩为 zip 字节流。仅使用标准库。
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import zipfile
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+
+BASE_DIR = Path(__file__).resolve().parent
+STORE_PATH = Path(os.getenv("ARTIFACT_STORE_PATH") or BASE_DIR / ".cache" / "artifacts")
+MAX_AGE_DAYS = float(os.getenv("ARTIFACT_MAX_AGE_DAYS") or 30)
+MAX_MB = float(os.getenv("ARTIFACT_MAX_MB") or 1024)
+# 已压缩的格式在 zip 中直接存储，避免重复压缩的开销
+STORED_SUFFIXES = (".docx", ".zip", ".png", ".jpg")
+# 刚写入、尚未被运行记录引用的对象与工作目录在该时长内不回收，避免与进行中的运行竞争
+GC_GRACE_SECONDS = 3600
+
+
+def _temp_path(path: Path) -> Path:
+    # 同目录下的唯一临时名：同一文件可能被多个线程/进程同时写入
+    return path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+def atomic_write_bytes(path: Union[str, Path], data: bytes) -> Path:
+    """写临时文件后原子替换 path，并发写同名文件时读者不会读到半截内容。"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = _temp_path(path)
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    return path
+
+
+def atomic_write_text(path: Union[str, Path], text: str, encoding: str = "utf-8") -> Path:
+    return atomic_write_bytes(path, text.encode(encoding))
+
+
+class _ChunkSink:
+    """zipfile 的只写目标：收集写入的字节供生成器分块取走；不支持 seek，zipfile 会改用数据描述符。"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+class ArtifactStore:
+    def __init__(self, root: Union[str, Path] = STORE_PATH):
+        self.root = Path(root)
+        self.objects_dir = self.root / "objects"
+        self.runs_dir = self.root / "runs"
+        self.work_dir = self.root / "work"
+
+    def object_path(self, digest: str) -> Path:
+        return self.objects_dir / digest[:2] / digest
+
+    def put_bytes(self, data: bytes) -> str:
+        """保存内容并返回其哈希；相同内容只保留一份。"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.object_path(digest)
+        if path.exists():
+            # 刷新时间：已存在的对象被新运行引用，gc 宽限期内不会回收
+            os.utime(path)
+        else:
+            atomic_write_bytes(path, data)
+        return digest
+
+    def put_file(self, src: Union[str, Path], move: bool = False) -> str:
+        """收录文件并返回哈希；move 时把 src 直接改名为对象文件（src 须在同一文件系统，如 workspace 中的文件）。"""
+        src = Path(src)
+        digest = hashlib.sha256()
+        with open(src, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        digest = digest.hexdigest()
+        path = self.object_path(digest)
+        if path.exists():
+            os.utime(path)
+            if move:
+                src.unlink()
+            return digest
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if move:
+            try:
+                os.replace(src, path)
+                return digest
+            except OSError:
+                pass
+        tmp = _temp_path(path)
+        try:
+            shutil.copyfile(src, tmp)
+            os.replace(tmp, path)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+        if move:
+            src.unlink()
+        return digest
+
+    def record_run(self, run_id: str, files: Dict[str, str], **meta) -> Path:
+        """写入运行记录：files 为 {文件名: 哈希}，meta 为附加信息（如课程名）。"""
+        record = {"created": time.time(), **meta, "files": files}
+        return atomic_write_text(self.runs_dir / f"{run_id}.json", json.dumps(record, ensure_ascii=False, indent=2))
+
+    def load_run(self, run_id: str) -> Optional[dict]:
+        if not run_id or "/" in run_id or "\\" in run_id or run_id.startswith("."):
+            return None
+        try:
+            return json.loads((self.runs_dir / f"{run_id}.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def resolve(self, run_id: str, name: str) -> Optional[Path]:
+        """运行 run_id 中名为 name 的文件所在的对象路径；运行或对象不存在（已回收）时返回 None。"""
+        run = self.load_run(run_id)
+        digest = (run or {}).get("files", {}).get(name)
+        if not digest:
+            return None
+        path = self.object_path(digest)
+        return path if path.exists() else None
+
+    def run_digest(self, run_id: str) -> Optional[str]:
+        """一次运行全部文件的组合哈希（文件名与内容哈希），用作打包下载的强 ETag。"""
+        run = self.load_run(run_id)
+        if run is None:
+            return None
+        files = sorted(run.get("files", {}).items())
+        return hashlib.sha256(json.dumps(files, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def iter_run_zip(self, run_id: str, names: Optional[List[str]] = None, chunk_size: int = 1 << 16) -> Iterator[bytes]:
+        """边读边生成运行 run_id 的 zip 字节流（不落临时文件）；names 限定文件与顺序，缺省为全部。
+
+        条目时间取运行的创建时间，相同的运行每次得到相同的字节。调用前应先用 resolve 确认文件存在。
+        """
+        run = self.load_run(run_id) or {}
+        files = run.get("files", {})
+        # zip 的时间字段最早为 1980 年
+        date_time = time.localtime(max(run.get("created") or 0, 315532800))[:6]
+        sink = _ChunkSink()
+        with zipfile.ZipFile(sink, "w") as zf:
+            for name in names if names is not None else sorted(files):
+                info = zipfile.ZipInfo(name, date_time=date_time)
+                info.compress_type = zipfile.ZIP_STORED if name.lower().endswith(STORED_SUFFIXES) else zipfile.ZIP_DEFLATED
+                with open(self.object_path(files[name]), "rb") as src, zf.open(info, "w") as dest:
+                    for block in iter(lambda: src.read(chunk_size), b""):
+                        dest.write(block)
+                        if sink.chunks:
+                            yield sink.drain()
+                if sink.chunks:
+                    yield sink.drain()
+        # 中央目录在 ZipFile 关闭时写出
+        yield sink.drain()
+
+    def publish(self, digest: str, dest: Union[str, Path]) -> Path:
+        """把对象以 dest 的名字发布出去（原子替换）：同一文件系统上用硬链接，否则复制。
+
+        各写入方都以“临时文件 + 改名”替换目标，替换只会断开链接，不会改写库中的对象。
+        """
+        dest = Path(dest)
+        src = self.object_path(digest)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            if os.path.samefile(src, dest):
+                return dest
+        except OSError:
+            pass
+        tmp = _temp_path(dest)
+        try:
+            try:
+                os.link(src, tmp)
+            except OSError:
+                shutil.copyfile(src, tmp)
+            os.replace(tmp, dest)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+        return dest
+
+    @contextmanager
+    def workspace(self, prefix: str = "run-") -> Iterator[Path]:
+        """运行的私有工作目录，退出时删除（其中的文件应已由 put_file(move=True) 收录）。"""
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        path = Path(tempfile.mkdtemp(prefix=prefix, dir=str(self.work_dir)))
+        try:
+            yield path
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def gc(self, max_age_days: float = MAX_AGE_DAYS, max_mb: float = MAX_MB) -> Dict[str, int]:
+        """删除超龄的运行记录；对象总大小仍超过 max_mb 时从最旧的运行开始继续删除；
+        最后回收不再被任何运行引用的对象与遗留的工作目录。返回各类删除数量与释放字节数。
+        """
+        now = time.time()
+        runs = []
+        for path in self.runs_dir.glob("*.json"):
+            try:
+                record = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                record = {"created": 0, "files": {}}
+            runs.append((float(record.get("created") or 0), path, set(record.get("files", {}).values())))
+        runs.sort(key=lambda r: r[0])
+
+        sizes = {}
+        for path in self.objects_dir.glob("*/*"):
+            if path.name.startswith("."):
+                continue
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            sizes[path.name] = (st.st_size, st.st_mtime, path)
+
+        def referenced_bytes(kept):
+            digests = set().union(*(r[2] for r in kept)) if kept else set()
+            return sum(sizes[d][0] for d in digests if d in sizes)
+
+        kept = [r for r in runs if now - r[0] <= max_age_days * 86400]
+        removed_runs = [r for r in runs if r not in kept]
+        limit = max_mb * 1024 * 1024
+        while len(kept) > 1 and referenced_bytes(kept) > limit:
+            removed_runs.append(kept.pop(0))
+        for _, path, _ in removed_runs:
+            path.unlink(missing_ok=True)
+
+        live = set().union(*(r[2] for r in kept)) if kept else set()
+        removed_objects = freed = 0
+        for digest, (size, mtime, path) in sizes.items():
+            if digest in live or now - mtime < GC_GRACE_SECONDS:
+                continue
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            removed_objects += 1
+            freed += size
+        for path in self.work_dir.glob("*"):
+            try:
+                stale = now - path.stat().st_mtime > GC_GRACE_SECONDS
+            except OSError:
+                continue
+            if stale:
+                shutil.rmtree(path, ignore_errors=True)
+        return {"runs": len(removed_runs), "objects": removed_objects, "bytes": freed}
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="产物库维护：按年龄与总大小回收运行记录与对象文件。")
+    parser.add_argument("--store", default=str(STORE_PATH), help="产物库目录，默认 ARTIFACT_STORE_PATH 或 .cache/artifacts")
+    parser.add_argument("--max-age-days", type=float, default=MAX_AGE_DAYS, help="运行记录保留天数（ARTIFACT_MAX_AGE_DAYS，默认30）")
+    parser.add_argument("--max-mb", type=float, default=MAX_MB, help="对象总大小上限 MB（ARTIFACT_MAX_MB，默认1024）")
+    args = parser.parse_args()
+    result = ArtifactStore(args.store).gc(args.max_age_days, args.max_mb)
+    print(f"已删除运行记录 {result['runs']} 个、对象 {result['objects']} 个，释放 {result['bytes'] / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+生成流程分阶段基准测试（离线）。
+
+默认在进程内启动 bench/stub_llm_server.py 的桩服务（也可用 --base-url 指向已启动的桩服务），
+对 18 / 20 / 52 周的合成课程分别计时：
+- prompt_build：构建大纲与教案 JSON 提示词
+- llm_syllabus：大纲请求往返（流式，与 UI 一致）
+- llm_plan：整体教案 JSON 请求往返
+- llm_plan_chunked：按 3 周分片并发生成教案 JSON
+- json_parse：ensure_pure_json + json.loads + normalize_plan
+- plan_local：大纲按规则转换为教案 JSON（--fast 的第二阶段）
+- docx_head / docx_weeks / docx_merge：build_head_doc / build_weeks_doc / merge_docs（落盘中间产物的旧路径）
+- docx_in_memory：build_lesson_plan（全内存路径）
+
+结果写为 JSON（默认 bench/results/bench-<时间>.json）；--compare 可与上次结果对比中位数并在退步超过阈值时返回非零。
+
+用法：
+    python bench/run_benchmarks.py
+    python bench/run_benchmarks.py --weeks 18,52 --repeat 5 --stub-latency 0.2 --stub-tokens-per-sec 400
+    python bench/run_benchmarks.py --compare bench/results/bench-上一版本.json --threshold 0.2
+"""
+
+import sys
+import json
+import time
+import platform
+import argparse
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List
+
+BENCH_DIR = Path(__file__).resolve().parent
+BASE_DIR = BENCH_DIR.parent
+IRP_DIR = BASE_DIR / "IndependentRunningPackage"
+sys.path[:0] = [str(BASE_DIR), str(IRP_DIR), str(BENCH_DIR)]
+
+from stub_llm_server import StubConfig, start_server, synthetic_syllabus  # noqa: E402
+from build_course_docs import (  # noqa: E402
+    build_plan_messages,
+    build_syllabus_messages,
+    ensure_pure_json,
+    generate_plan_chunked,
+    load_templates,
+    normalize_plan,
+)
+from generate_syllabus import call_llm, run_async, set_cache_mode, use_credentials  # noqa: E402
+from syllabus_parser import plan_from_syllabus  # noqa: E402
+import build_word_from_templates as bwt  # noqa: E402
+
+DEFAULT_WEEKS = "18,20,52"
+MODEL = "stub"
+
+
+def time_stage(fn: Callable[[], object], repeat: int) -> Dict[str, object]:
+    runs: List[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        runs.append((time.perf_counter() - started) * 1000)
+    return {
+        "min_ms": round(min(runs), 2),
+        "median_ms": round(statistics.median(runs), 2),
+        "mean_ms": round(statistics.fmean(runs), 2),
+        "runs_ms": [round(r, 2) for r in runs],
+    }
+
+
+def bench_course(weeks: int, repeat: int, work_dir: Path) -> Dict[str, object]:
+    course = f"基准课程{weeks}周"
+    template_text, data_template_text = load_templates(
+        BASE_DIR / "templates" / "syllabus_template.md", BASE_DIR / "templates" / "data_template.json"
+    )
+    syllabus_md = synthetic_syllabus(course, weeks)
+    stages: Dict[str, object] = {}
+
+    def build_prompts():
+        syllabus_messages = build_syllabus_messages(course, weeks, None, None, template_text, "高职学生")
+        plan_messages = build_plan_messages(course, weeks, syllabus_md, data_template_text)
+        return syllabus_messages, plan_messages
+
+    stages["prompt_build"] = time_stage(build_prompts, repeat)
+    syllabus_messages, plan_messages = build_prompts()
+
+    stages["llm_syllabus"] = time_stage(lambda: call_llm(syllabus_messages, MODEL, on_token=lambda _: None), repeat)
+    plan_text = call_llm(plan_messages, MODEL)
+    stages["llm_plan"] = time_stage(lambda: call_llm(plan_messages, MODEL), repeat)
+    stages["llm_plan_chunked"] = time_stage(
+        lambda: run_async(generate_plan_chunked(course, weeks, syllabus_md, MODEL, chunk_size=3, concurrency=4)),
+        repeat,
+    )
+
+    def parse_plan():
+        return normalize_plan(json.loads(ensure_pure_json(plan_text)), course, weeks)
+
+    stages["json_parse"] = time_stage(parse_plan, repeat)
+    stages["plan_local"] = time_stage(lambda: plan_from_syllabus(course, weeks, syllabus_md), repeat)
+
+    # 文档阶段：标记值取自独立运行包自带样例，科目与周数替换为合成课程
+    md_path, _json, _syllabus = bwt.find_input_files(IRP_DIR)
+    head_tpl, week_tpl = bwt.find_docx_templates(IRP_DIR)
+    mapping = bwt.parse_placeholder_md(str(md_path))
+    mapping.update({"授课科目": course, "总周数": str(weeks)})
+    json_path = work_dir / f"{course}-{weeks}-data.json"
+    json_path.write_text(json.dumps(parse_plan(), ensure_ascii=False, indent=2), encoding="utf-8")
+    data = bwt.load_weeks_data(json_path)
+    head_path = work_dir / f"{course}-教案头.docx"
+    weeks_path = work_dir / f"{course}-教师授课教案信息表集合.docx"
+    font_name = (mapping.get("统一字体名称") or "").strip() or None
+    font_size = bwt.parse_font_size_pt(mapping.get("统一字号"))
+
+    stages["docx_head"] = time_stage(lambda: bwt.build_head_doc(head_tpl, dict(mapping), work_dir, course), repeat)
+    stages["docx_weeks"] = time_stage(
+        lambda: bwt.build_weeks_doc(week_tpl, dict(mapping), json_path, work_dir, course), repeat
+    )
+    stages["docx_merge"] = time_stage(
+        lambda: bwt.merge_docs(head_path, weeks_path, work_dir / f"教案-{course}.docx", font_name, font_size), repeat
+    )
+    stages["docx_in_memory"] = time_stage(lambda: bwt.build_lesson_plan(mapping, data, head_tpl, week_tpl), repeat)
+
+    return {
+        "weeks": weeks,
+        "syllabus_chars": len(syllabus_md),
+        "plan_chars": len(plan_text),
+        "stages": stages,
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=str(BASE_DIR),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return ""
+
+
+def compare_results(current: dict, baseline: dict, threshold: float) -> List[str]:
+    """按 (周数, 阶段) 对比中位数，返回超过阈值的退步条目描述。"""
+    base = {(c["weeks"], name): st["median_ms"] for c in baseline.get("courses", []) for name, st in c["stages"].items()}
+    regressions = []
+    print(f"\n{'周数':>4}  {'阶段':<18}{'基线ms':>10}{'本次ms':>10}{'比值':>8}")
+    for course in current["courses"]:
+        for name, st in course["stages"].items():
+            old = base.get((course["weeks"], name))
+            if not old:
+                continue
+            ratio = st["median_ms"] / old
+            flag = ""
+            if ratio > 1 + threshold:
+                flag = "  ← 退步"
+                regressions.append(f"{course['weeks']}周 {name}: {old:.1f}ms → {st['median_ms']:.1f}ms（×{ratio:.2f}）")
+            print(f"{course['weeks']:>4}  {name:<18}{old:>10.1f}{st['median_ms']:>10.1f}{ratio:>8.2f}{flag}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="离线分阶段基准测试：合成课程 + 本地桩服务，结果写为 JSON。")
+    parser.add_argument("--weeks", default=DEFAULT_WEEKS, help=f"逗号分隔的周数列表，默认 {DEFAULT_WEEKS}")
+    parser.add_argument("--repeat", type=int, default=3, help="每个阶段重复次数，默认3")
+    parser.add_argument("--base-url", default="", help="使用已启动的桩服务（如 http://127.0.0.1:8765/v1）；缺省则进程内启动")
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="进程内桩服务的首字节延迟（秒）")
+    parser.add_argument("--stub-tokens-per-sec", type=float, default=0.0, help="进程内桩服务的生成速率，0 表示不限速")
+    parser.add_argument("--fence-json", action="store_true", help="桩服务用代码围栏包裹 JSON 响应")
+    parser.add_argument("--output", default="", help="结果 JSON 路径，缺省为 bench/results/bench-<时间>.json")
+    parser.add_argument("--compare", default="", help="与该基线结果对比各阶段中位数")
+    parser.add_argument("--threshold", type=float, default=0.2, help="对比时视为退步的增幅，默认 0.2（即慢 20%%）")
+    args = parser.parse_args()
+
+    weeks_list = [int(w) for w in args.weeks.split(",") if w.strip()]
+    stub_config = StubConfig(latency=args.stub_latency, tokens_per_sec=args.stub_tokens_per_sec, fence_json=args.fence_json)
+    server = None
+    base_url = args.base_url
+    if not base_url:
+        server = start_server(stub_config)
+        base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    # 基准测试只衡量流程本身：关闭响应缓存，凭据仅在本进程上下文内生效
+    set_cache_mode("off")
+    courses = []
+    try:
+        with use_credentials("stub", base_url), tempfile.TemporaryDirectory() as tmp:
+            for weeks in weeks_list:
+                print(f"[基准] {weeks} 周 ...", flush=True)
+                courses.append(bench_course(weeks, args.repeat, Path(tmp)))
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    result = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "base_url": args.base_url or "in-process stub",
+            "stub": {"latency": args.stub_latency, "tokens_per_sec": args.stub_tokens_per_sec, "fence_json": args.fence_json},
+        },
+        "courses": courses,
+    }
+    out_path = Path(args.output) if args.output else BENCH_DIR / "results" / f"bench-{datetime.now():%Y%m%d-%H%M%S}.json"
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out_path.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    print(f"\n{'周数':>4}  {'阶段':<18}{'中位数ms':>10}{'最小ms':>10}")
+    for course in courses:
+        for name, st in course["stages"].items():
+            print(f"{course['weeks']:>4}  {name:<18}{st['median_ms']:>10.1f}{st['min_ms']:>10.1f}")
+    print(f"\n结果已写入：{out_path}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare_results(result, baseline, args.threshold)
+        if regressions:
+            print("\n[退步] " + "\n[退步] ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
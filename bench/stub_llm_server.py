@@ -0,0 +1,318 @@
+"""
+离线的 OpenAI 兼容桩服务：不访问任何付费接口即可运行整条生成流程与基准测试。
+
+用法：
+    python bench/stub_llm_server.py --port 8765 --latency 0.3 --tokens-per-sec 300
+    set OPENAI_BASE_URL=http://127.0.0.1:8765/v1  （PowerShell: $env:OPENAI_BASE_URL=...）
+    set OPENAI_API_KEY=stub
+    python build_course_docs.py --course 软件测试 --weeks 18
+
+支持 POST /v1/chat/completions（含 stream=true 的 SSE 流式返回）与 GET /v1/models。
+按提示词识别请求类型并回放固定格式的响应：教学大纲（Markdown）、整体教案 JSON、
+分片教案 JSON（“本次只处理：第a-b周”或逐一列出的周次）、按周增量重写的大纲段落（“本次只重新生成”）、仅补写教学目标/作业的 JSON（“各周摘要”）；也可用 --syllabus-file / --plan-file 回放录制的真实响应。
+
+可配置：首字节延迟（含按比例出现的长尾延迟）、token 速率、截断比例、错误注入（如 429/500）、用代码围栏包裹 JSON、
+前 N 个教案 JSON 响应不合格（检验重试）。
+仅使用标准库。
+"""
+
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import List, Optional
+
+# 近似 token 切分：中文约 1-2 字/token，按固定字符数切分即可模拟流式节奏
+CHARS_PER_TOKEN = 2
+
+
+@dataclass
+class StubConfig:
+    latency: float = 0.0            # 首字节前的延迟（秒）
+    slow_rate: float = 0.0          # 以该概率额外增加 slow_latency 的延迟，模拟长尾
+    slow_latency: float = 0.0
+    tokens_per_sec: float = 0.0     # 流式/非流式的生成速率，0 表示不限速
+    truncate_rate: float = 0.0      # 以该概率在中途截断响应（finish_reason=length）
+    truncate_at: float = 0.6        # 截断位置（占全文比例）
+    error_rate: float = 0.0         # 以该概率直接返回错误状态码
+    error_statuses: List[int] = field(default_factory=lambda: [429, 500])
+    fence_json: bool = False        # 用 ```json 代码围栏包裹 JSON 响应（检验 ensure_pure_json）
+    bad_plan_responses: int = 0     # 前 N 个教案 JSON 请求返回残缺但正常结束（finish_reason=stop）的 JSON
+    syllabus_text: Optional[str] = None
+    plan_text: Optional[str] = None
+    seed: Optional[int] = None
+
+
+def synthetic_syllabus(course: str, weeks: int) -> str:
+    lines = [f"# {course} 教学大纲", ""]
+    for i in range(1, weeks + 1):
+        module = f"模块{(i - 1) // 3 + 1}"
+        lines += [
+            f"### 第{i}周：{module}",
+            f"- 教学模块：{module}",
+            "- 教学内容：",
+            f"  - {course}第{i}周知识要点一",
+            f"  - {course}第{i}周知识要点二",
+            f"  - 第{i}周实践任务",
+            f"- 重点：第{i}周重点",
+            f"- 难点：第{i}周难点；通过示例演示与分层练习化解",
+            f"- 职业技能要求：能独立完成第{i}周实践任务并撰写记录",
+            "- 教学方法建议：演示讲解 + 实训 + 协作学习",
+            "",
+        ]
+    return "\n".join(lines)
+
+
+def synthetic_plan(course: str, weeks: int, week_numbers: List[int]) -> dict:
+    return {
+        "授课科目": course,
+        "总周数": weeks,
+        "周次": [
+            {
+                "周": n,
+                "课题": f"模块{(n - 1) // 3 + 1}：第{n}周",
+                "教学目标": f"1. 理解第{n}周知识要点；2. 能完成第{n}周实践任务",
+                "教学重点": f"第{n}周重点",
+                "教学难点": f"第{n}周难点",
+                "授课内容1": f"{course}第{n}周知识要点一",
+                "授课内容2": f"{course}第{n}周知识要点二",
+                "授课内容3": f"第{n}周实践任务",
+                "授课内容4": "",
+                "作业": f"完成第{n}周实践任务并提交记录",
+            }
+            for n in week_numbers
+        ],
+    }
+
+
+def render_response(messages: List[dict], config: StubConfig) -> str:
+    """按提示词类型生成回放内容。"""
+    system = messages[0].get("content", "") if messages else ""
+    user = messages[-1].get("content", "") if messages else ""
+    m = re.search(r"课程名称：(.+)", user)
+    course = m.group(1).strip() if m else "示例课程"
+    m = re.search(r"总周数：(\d+)", user)
+    weeks = int(m.group(1)) if m else 18
+
+    if "JSON" not in system:
+        text = config.syllabus_text if config.syllabus_text is not None else synthetic_syllabus(course, weeks)
+        m = re.search(r"本次只重新生成：第([\d、]+)周", user)
+        if m:
+            # 按周增量重新生成（--regen）只回放所请求周次的段落
+            wanted = {int(n) for n in m.group(1).split("、")}
+            blocks = re.split(r"(?m)^(?=#{2,4}\s*第\d+周)", text)
+            heads = [re.match(r"#{2,4}\s*第(\d+)周", b) for b in blocks]
+            text = "".join(b for b, h in zip(blocks, heads) if h and int(h.group(1)) in wanted)
+        return text
+
+    if "各周摘要" in user:
+        # 规则转换模式（--local-plan）只补写教学目标与作业
+        plan = synthetic_plan(course, weeks, list(range(1, weeks + 1)))
+        text = json.dumps({"周次": [{k: item[k] for k in ("周", "教学目标", "作业")} for item in plan["周次"]]},
+                          ensure_ascii=False)
+        return f"```json\n{text}\n```" if config.fence_json else text
+
+    m = re.search(r"本次只处理：第(\d+)-(\d+)周", user)
+    listed = re.search(r"本次只处理：第(\d+(?:、\d+)*)周", user)
+    if m:
+        week_numbers = list(range(int(m.group(1)), int(m.group(2)) + 1))
+    elif listed:
+        week_numbers = [int(n) for n in listed.group(1).split("、")]
+        m = listed
+    else:
+        week_numbers = list(range(1, weeks + 1))
+    if config.plan_text is not None:
+        plan = json.loads(config.plan_text)
+        if m:
+            plan["周次"] = [item for item in plan.get("周次", []) if item.get("周") in week_numbers]
+        text = json.dumps(plan, ensure_ascii=False)
+    else:
+        text = json.dumps(synthetic_plan(course, weeks, week_numbers), ensure_ascii=False)
+    if config.fence_json:
+        text = f"```json\n{text}\n```"
+    return text
+
+
+def make_handler(config: StubConfig):
+    rng = random.Random(config.seed)
+    rng_lock = threading.Lock()
+    bad_left = [config.bad_plan_responses]
+
+    def take_bad(messages: List[dict]) -> bool:
+        if not messages or "JSON" not in messages[0].get("content", ""):
+            return False
+        with rng_lock:
+            if bad_left[0] <= 0:
+                return False
+            bad_left[0] -= 1
+            return True
+
+    def roll(rate: float) -> bool:
+        if rate <= 0:
+            return False
+        with rng_lock:
+            return rng.random() < rate
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send_json(self, status: int, payload: dict) -> None:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/models"):
+                self._send_json(200, {"object": "list", "data": [{"id": "stub", "object": "model", "owned_by": "stub"}]})
+            else:
+                self._send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+                return
+
+            if config.latency > 0:
+                time.sleep(config.latency)
+            if roll(config.slow_rate):
+                time.sleep(config.slow_latency)
+            if roll(config.error_rate):
+                with rng_lock:
+                    status = rng.choice(config.error_statuses)
+                self._send_json(status, {"error": {"message": f"stub injected error {status}", "type": "stub_error", "code": status}})
+                return
+
+            messages = body.get("messages") or []
+            text = render_response(messages, config)
+            finish_reason = "stop"
+            if take_bad(messages):
+                # 与截断不同，finish_reason 仍为 stop：只有调用方的解析/校验能发现
+                text = text[: len(text) // 2]
+            elif roll(config.truncate_rate):
+                text = text[: int(len(text) * config.truncate_at)]
+                finish_reason = "length"
+            model = body.get("model") or "stub"
+            prompt_tokens = sum(len(str(m.get("content", ""))) for m in messages) // CHARS_PER_TOKEN
+            completion_tokens = max(1, len(text) // CHARS_PER_TOKEN)
+
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                     "total_tokens": prompt_tokens + completion_tokens}
+            if body.get("stream"):
+                include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+                self._stream(text, model, finish_reason, usage if include_usage else None)
+                return
+            if config.tokens_per_sec > 0:
+                time.sleep(completion_tokens / config.tokens_per_sec)
+            self._send_json(200, {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": finish_reason}],
+                "usage": usage,
+            })
+
+        def _stream(self, text: str, model: str, finish_reason: str, usage: Optional[dict]) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            delay = 1 / config.tokens_per_sec if config.tokens_per_sec > 0 else 0
+
+            def chunk(delta: dict, reason: Optional[str] = None) -> bytes:
+                payload = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()),
+                           "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": reason}]}
+                return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8")
+
+            try:
+                self.wfile.write(chunk({"role": "assistant", "content": ""}))
+                for i in range(0, len(text), CHARS_PER_TOKEN):
+                    if delay:
+                        time.sleep(delay)
+                    self.wfile.write(chunk({"content": text[i:i + CHARS_PER_TOKEN]}))
+                    self.wfile.flush()
+                self.wfile.write(chunk({}, finish_reason))
+                if usage is not None:
+                    # 与 OpenAI 一致：stream_options.include_usage 时末尾追加一个 choices 为空、携带 usage 的块
+                    payload = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()),
+                               "model": model, "choices": [], "usage": usage}
+                    self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                # 客户端中途断开（如 UI 任务被取消），静默结束
+                pass
+
+    return StubHandler
+
+
+def start_server(config: StubConfig, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """在后台线程启动桩服务并返回 server；port=0 时自动选择空闲端口（见 server.server_address）。"""
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="stub-llm", daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="离线 OpenAI 兼容桩服务（通过 OPENAI_BASE_URL 指向它）。")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="首字节前的延迟（秒）")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="出现长尾延迟的概率（0-1）")
+    parser.add_argument("--slow-latency", type=float, default=5.0, help="长尾请求额外增加的首字节延迟（秒）")
+    parser.add_argument("--tokens-per-sec", type=float, default=0.0, help="生成速率（token/秒），0 表示不限速")
+    parser.add_argument("--truncate-rate", type=float, default=0.0, help="响应被截断的概率（0-1）")
+    parser.add_argument("--truncate-at", type=float, default=0.6, help="截断位置占全文的比例")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="直接返回错误的概率（0-1）")
+    parser.add_argument("--error-statuses", default="429,500", help="注入的错误状态码，逗号分隔")
+    parser.add_argument("--fence-json", action="store_true", help="用 ```json 代码围栏包裹 JSON 响应")
+    parser.add_argument("--bad-plan-responses", type=int, default=0, help="前 N 个教案 JSON 请求返回残缺的 JSON（正常结束）")
+    parser.add_argument("--syllabus-file", default="", help="回放该 Markdown 文件作为教学大纲响应")
+    parser.add_argument("--plan-file", default="", help="回放该 JSON 文件作为教案响应（分片请求时按周筛选）")
+    parser.add_argument("--seed", type=int, default=None, help="截断/错误注入的随机种子")
+    args = parser.parse_args()
+
+    config = StubConfig(
+        latency=args.latency,
+        slow_rate=args.slow_rate,
+        slow_latency=args.slow_latency,
+        tokens_per_sec=args.tokens_per_sec,
+        truncate_rate=args.truncate_rate,
+        truncate_at=args.truncate_at,
+        error_rate=args.error_rate,
+        error_statuses=[int(s) for s in args.error_statuses.split(",") if s.strip()],
+        fence_json=args.fence_json,
+        bad_plan_responses=args.bad_plan_responses,
+        syllabus_text=Path(args.syllabus_file).read_text(encoding="utf-8") if args.syllabus_file else None,
+        plan_text=Path(args.plan_file).read_text(encoding="utf-8") if args.plan_file else None,
+        seed=args.seed,
+    )
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(config))
+    server.daemon_threads = True
+    print(f"桩服务已启动：http://{args.host}:{args.port}/v1  （Ctrl+C 退出）", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,41 @@
 import os
+import re
 import argparse
 import json
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, Dict, List, Optional
 
 # 复用已有的 OpenAI 封装与部分默认模块（若存在）
-from generate_syllabus import call_llm
+from artifact_store import atomic_write_text
+from generate_syllabus import (
+    call_llm,
+    acall_llm,
+    astream_llm,
+    make_async_client,
+    run_async,
+    set_cache_mode,
+    get_cache,
+    discard_cached,
+    json_response_format,
+)
+from metrics import stage_timer
+from plan_validator import PlanStreamValidator
+from prompt_schema import (
+    WEEK_PLACEHOLDER,
+    plan_json_schema,
+    plan_week_fields,
+    render_plan_schema,
+    render_syllabus_template,
+    split_syllabus_template,
+)
+from regen_planner import RegenPlan, plan_regeneration, week_modules
+from syllabus_parser import DERIVED_FIELDS, parse_week_section, plan_from_syllabus, unsupported_fields, week_entry
+from startup_profile import profile_startup_requested, run_startup_profile
+
+# 每周条目除“周”以外的字段（顺序即输出顺序）只在教案 JSON 模板中定义：WEEK_FIELDS 取自默认模板，
+# generate_course_files 按实际使用的模板（plan_week_fields）取得字段，传给提示词、结构化输出、校验与修正
+DATA_TEMPLATE_PATH = Path(__file__).resolve().parent / "templates" / "data_template.json"
+WEEK_FIELDS = plan_week_fields(DATA_TEMPLATE_PATH.read_text(encoding="utf-8"))
 
 # 默认模块，可被 --parts 覆盖
 DEFAULT_PARTS = [
@@ -29,6 +59,7 @@ def build_syllabus_messages(
     level: str,
     features: Optional[str] = None,
 ) -> List[dict]:
+    """template_text 为单周结构的大纲模板，按 weeks 生成紧凑的 N 周模板后放入提示词。"""
     parts_text = "\n".join(f"- {i+1}. {m}" for i, m in enumerate(parts or DEFAULT_PARTS))
     exclude_text = "无" if not excludes else ", ".join(excludes)
     include_text = "无" if not features else features.strip()
@@ -61,8 +92,7 @@ def build_syllabus_messages(
 6) 只输出填充后的模板正文，不要任何多余文字。
 
 模板：
-{template_text}
-"""
+{render_syllabus_template(template_text, weeks)}"""
     return [
         {"role": "system", "content": system},
         {"role": "user", "content": user},
@@ -75,10 +105,12 @@ def build_plan_messages(
     syllabus_md: str,
     data_template_text: str,
 ) -> List[dict]:
+    """data_template_text 为教案 JSON 模板，提示词中只携带含一项“周次”的结构示例。"""
     system = (
         "你是一名一线教研人员，请根据给定的《教学大纲》内容，严格按指定 JSON 模板生成结构化教案数据。"
         "输出必须是严格合法的 JSON，键名与结构必须与模板完全一致。"
     )
+    keys = ["授课科目", "总周数", "周次", "周", *plan_week_fields(data_template_text)]
 
     user = f"""
 课程名称：{course}
@@ -87,8 +119,8 @@ def build_plan_messages(
 给定《教学大纲》（Markdown）：
 {syllabus_md}
 
-JSON 模板（务必保持相同的键与结构，仅填充具体内容）：
-{data_template_text}
+JSON 结构示例（务必保持相同的键与结构，仅填充具体内容；示例只含第1周一项，实际需输出第1-{weeks}周共 {weeks} 项）：
+{render_plan_schema(data_template_text, weeks)}
 
 生成要求：
 1) 严格输出 JSON，不能有 Markdown 代码块标记、注释或多余文本；
@@ -103,7 +135,7 @@ JSON 模板（务必保持相同的键与结构，仅填充具体内容）：
      - "授课内容1..4"：从该周“教学内容”中选取最多4条要点（不够则以空字符串补足到4项）；
      - "作业"：结合该周内容与方法给出1项可操作的实践作业（如：编写/执行/设计/分析类任务）；
 3) 确保“周次”数组长度为 {weeks}，每项的“周”字段从1顺序递增；
-4) 严格保持键名为："授课科目"、"总周数"、"周次"、"周"、"课题"、"教学目标"、"教学重点"、"教学难点"、"授课内容1"、"授课内容2"、"授课内容3"、"授课内容4"、"作业"；
+4) 严格保持键名为：{"、".join(f'"{k}"' for k in keys)}；
 5) 仅输出 JSON 原文。
 """
     return [
@@ -128,6 +160,860 @@ def ensure_pure_json(text: str) -> str:
     return t.strip()
 
 
+def generate_plan_structured(
+    messages: List[dict],
+    weeks: int,
+    model: str,
+    retries: int = 2,
+    on_token: Optional[Callable[[str], None]] = None,
+    on_retry: Optional[Callable[[Exception], None]] = None,
+    fields: Optional[List[str]] = None,
+    with_header: bool = True,
+) -> dict:
+    """结构化输出模式生成整体教案 JSON：请求 JSON 格式输出，边接收边按教案结构校验。
+
+    输出一旦偏离结构（键名、周序号、条目数等）即中止该次请求并重试，最多 retries 次。
+    fields 指定每周条目的字段（缺省为 WEEK_FIELDS）；只补写部分字段时 with_header=False，根对象仅含“周次”。
+    """
+    week_fields = fields or WEEK_FIELDS
+    response_format = json_response_format(model, plan_json_schema(week_fields, with_header=with_header))
+    last_error: Optional[Exception] = None
+    for _ in range(retries + 1):
+        validator = PlanStreamValidator(list(range(1, weeks + 1)), week_fields)
+
+        def sink(delta: str) -> None:
+            validator.feed(delta)
+            if on_token:
+                on_token(delta)
+
+        try:
+            text = call_llm(messages, model, on_token=sink, response_format=response_format)
+            validator.close()
+            return json.loads(ensure_pure_json(text))
+        except ValueError as e:  # 含 json.JSONDecodeError
+            last_error = e
+            # 流结束后才发现的不合格响应已写入缓存（中途中止的不会），删除后重试才会重新请求模型
+            discard_cached(messages, model, response_format)
+            if on_retry:
+                on_retry(e)
+    raise RuntimeError(f"教案 JSON 多次生成均不合格：{last_error}")
+
+
+def chunk_response_format(model: str, week_fields: Optional[List[str]] = None) -> Optional[dict]:
+    """分片结构化输出请求的 response_format（根对象仅含“周次”）。"""
+    return json_response_format(model, plan_json_schema(week_fields or WEEK_FIELDS, with_header=False))
+
+
+async def acall_plan_validated(
+    messages: List[dict], model: str, client, week_numbers: List[int], week_fields: Optional[List[str]] = None
+) -> str:
+    """分片的结构化输出：流式接收并增量校验，偏离结构时提前断开并抛出 ValueError。"""
+    validator = PlanStreamValidator(week_numbers, week_fields or WEEK_FIELDS)
+    response_format = chunk_response_format(model, week_fields)
+    pieces: List[str] = []
+    stream = astream_llm(messages, model, client=client, response_format=response_format)
+    try:
+        async for delta in stream:
+            validator.feed(delta)
+            pieces.append(delta)
+    finally:
+        await stream.aclose()
+    validator.close()
+    return "".join(pieces)
+
+
+def build_plan_extras_messages(course: str, weeks: int, parsed: Dict[int, Dict[str, List[str]]]) -> List[dict]:
+    """只请模型补写无法从大纲直接摘取的字段（教学目标、作业），每周仅携带压缩后的一行摘要。"""
+    lines = []
+    for n in range(1, weeks + 1):
+        fields = parsed.get(n, {})
+        title = (fields.get("教学模块") or fields.get("标题") or [""])[0]
+        lines.append(
+            f"第{n}周｜{title}｜内容：{'；'.join(fields.get('教学内容', []))}"
+            f"｜技能：{'；'.join(fields.get('职业技能要求', []))}"
+        )
+    example = json.dumps({"周次": [{"周": 1, **{k: "" for k in DERIVED_FIELDS}}]}, ensure_ascii=False)
+    system = (
+        "你是一名一线教研人员，请根据各周教学摘要补写教案字段。"
+        "输出必须是严格合法的 JSON，键名与结构必须与示例完全一致。"
+    )
+    summary = "\n".join(lines)
+    user = f"""
+课程名称：{course}
+总周数：{weeks}
+
+各周摘要（周次｜课题｜教学内容｜职业技能要求）：
+{summary}
+
+JSON 结构示例（仅含一项，实际需输出第1-{weeks}周共 {weeks} 项）：
+{example}
+
+生成要求：
+1) 严格输出 JSON，不能有 Markdown 代码块标记、注释或多余文本；
+2) "教学目标"：结合该周教学内容和职业技能要求，归纳成2-4条目标性表述，用“；”分隔；
+3) "作业"：结合该周内容给出1项可操作的实践作业（如：编写/执行/设计/分析类任务）；
+4) “周次”数组长度为 {weeks}，“周”字段从1顺序递增；
+5) 仅输出 JSON 原文。
+"""
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": user},
+    ]
+
+
+def build_plan_local(
+    course: str,
+    weeks: int,
+    syllabus_md: str,
+    model: str,
+    fast: bool = False,
+    on_log: Optional[Callable[[str], None]] = None,
+    on_token: Optional[Callable[[str], None]] = None,
+    on_retry: Optional[Callable[[Exception], None]] = None,
+    week_fields: Optional[List[str]] = None,
+) -> Optional[dict]:
+    """按规则把大纲转换为教案 JSON，只用一次小请求补写教学目标与作业；fast 时完全不调用模型。
+
+    week_fields 为教案模板的每周字段；其中有规则无法填写的字段，或大纲中有周次无法解析时返回 None，
+    由调用方退回整体的模型生成；补写请求失败时保留规则近似的结果。
+    """
+    unsupported = unsupported_fields(week_fields)
+    if unsupported:
+        if on_log:
+            on_log(f"教案模板含规则无法填写的字段（{'、'.join(unsupported)}），改由模型生成教案 JSON")
+        return None
+    with stage_timer("plan_local"):
+        plan_obj, parsed, missing = plan_from_syllabus(course, weeks, syllabus_md, week_fields)
+    if missing:
+        if on_log:
+            on_log(f"大纲中第{'、'.join(map(str, missing))}周无法按规则解析，改由模型生成教案 JSON")
+        return None
+    derived = [k for k in DERIVED_FIELDS if week_fields is None or k in week_fields]
+    if fast or not derived:
+        return plan_obj
+
+    try:
+        with stage_timer("llm_plan"):
+            extras = generate_plan_structured(
+                build_plan_extras_messages(course, weeks, parsed), weeks, model,
+                on_token=on_token, on_retry=on_retry, fields=DERIVED_FIELDS, with_header=False,
+            )
+    except RuntimeError as e:
+        if on_log:
+            on_log(f"教学目标/作业补写失败，保留按规则生成的内容：{e}")
+        return plan_obj
+    for item, extra in zip(plan_obj["周次"], extras["周次"]):
+        item.update({k: str(extra.get(k) or item[k]) for k in derived})
+    return plan_obj
+
+
+WEEK_HEADING_RE = re.compile(r"^#{2,4}\s*第\s*(\d+)\s*周", re.M)
+
+
+def split_syllabus_weeks(syllabus_md: str) -> Dict[int, str]:
+    """按 “### 第N周” 标题切分大纲，返回 {周次: 该周整段 Markdown}。"""
+    sections: Dict[int, str] = {}
+    matches = list(WEEK_HEADING_RE.finditer(syllabus_md))
+    for i, m in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(syllabus_md)
+        sections[int(m.group(1))] = syllabus_md[m.start():end].strip()
+    return sections
+
+
+class SyllabusSectionParser:
+    """增量解析流式输出的大纲：下一个 “### 第N周” 标题出现时，上一周的段落即告完成。
+
+    feed() 返回本次新完成的 [(周次, 段落)]，close() 在流结束时返回最后一段。
+    """
+
+    def __init__(self) -> None:
+        self._chunks: List[str] = []
+        self._pending = ""          # 尚未以换行结束的半行
+        self._current: Optional[int] = None
+        self._lines: List[str] = []
+
+    @property
+    def text(self) -> str:
+        return "".join(self._chunks)
+
+    def _take_line(self, line: str) -> List[tuple]:
+        done = []
+        m = WEEK_HEADING_RE.match(line)
+        if m:
+            if self._current is not None:
+                done.append((self._current, "".join(self._lines).strip()))
+            self._current = int(m.group(1))
+            self._lines = []
+        if self._current is not None:
+            self._lines.append(line)
+        return done
+
+    def feed(self, delta: str) -> List[tuple]:
+        self._chunks.append(delta)
+        buf = self._pending + delta
+        done: List[tuple] = []
+        while True:
+            nl = buf.find("\n")
+            if nl < 0:
+                break
+            done += self._take_line(buf[:nl + 1])
+            buf = buf[nl + 1:]
+        self._pending = buf
+        return done
+
+    def close(self) -> List[tuple]:
+        done = self._take_line(self._pending) if self._pending else []
+        self._pending = ""
+        if self._current is not None:
+            done.append((self._current, "".join(self._lines).strip()))
+            self._current, self._lines = None, []
+        return done
+
+
+def chunk_weeks(weeks: int, size: int) -> List[List[int]]:
+    size = max(1, size)
+    return [list(range(start, min(start + size, weeks + 1))) for start in range(1, weeks + 1, size)]
+
+
+def format_week_span(week_numbers: List[int]) -> str:
+    """连续周次写作“第a-b周”，否则逐一列出（“第2、5、9周”）。"""
+    first, last = week_numbers[0], week_numbers[-1]
+    if first == last:
+        return f"第{first}周"
+    if week_numbers == list(range(first, last + 1)):
+        return f"第{first}-{last}周"
+    return f"第{'、'.join(str(n) for n in week_numbers)}周"
+
+
+def build_plan_chunk_messages(
+    course: str, weeks: int, week_numbers: List[int], sections_md: str, week_fields: Optional[List[str]] = None
+) -> List[dict]:
+    first = week_numbers[0]
+    span = format_week_span(week_numbers)
+    example = json.dumps({"周次": [{"周": first, **{k: "" for k in week_fields or WEEK_FIELDS}}]}, ensure_ascii=False)
+    system = (
+        "你是一名一线教研人员，请根据给定的《教学大纲》片段，严格按指定 JSON 结构生成结构化教案数据。"
+        "输出必须是严格合法的 JSON，键名与结构必须与示例完全一致。"
+    )
+
+    user = f"""
+课程名称：{course}
+总周数：{weeks}
+本次只处理：{span}（共 {len(week_numbers)} 周）
+
+《教学大纲》相关片段（Markdown）：
+{sections_md}
+
+JSON 结构示例（仅含一项，实际需输出{span}共 {len(week_numbers)} 项）：
+{example}
+
+生成要求：
+1) 严格输出 JSON，不能有 Markdown 代码块标记、注释或多余文本；
+2) 对于每周：
+   - "课题"：以该周“教学模块”为题；
+   - "教学目标"：结合该周“教学内容”和“职业技能要求”，归纳成2-4条目标性表述；
+   - "教学重点"：来自该周“重点”；
+   - "教学难点"：来自该周“难点”；
+   - "授课内容1..4"：从该周“教学内容”中选取最多4条要点（不够则以空字符串补足到4项）；
+   - "作业"：结合该周内容与方法给出1项可操作的实践作业；
+3) “周次”数组长度为 {len(week_numbers)}，“周”字段依次为 {", ".join(str(n) for n in week_numbers)}；
+4) 仅输出 JSON 原文。
+"""
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": user},
+    ]
+
+
+def parse_plan_chunk(text: str, week_numbers: List[int], week_fields: Optional[List[str]] = None) -> List[dict]:
+    """解析并校验一个分片的返回；不合格时抛出 ValueError，由调用方单独重试该分片。"""
+    week_fields = week_fields or WEEK_FIELDS
+    obj = json.loads(ensure_pure_json(text))
+    items = obj.get("周次") if isinstance(obj, dict) else None
+    if not isinstance(items, list) or len(items) != len(week_numbers):
+        raise ValueError(f"“周次”应为长度 {len(week_numbers)} 的数组")
+    result = []
+    for n, item in zip(week_numbers, items):
+        if not isinstance(item, dict):
+            raise ValueError(f"第{n}周条目不是对象")
+        missing = [k for k in week_fields if k not in item]
+        if missing:
+            raise ValueError(f"第{n}周缺少字段：{', '.join(missing)}")
+        result.append({"周": n, **{k: item[k] for k in week_fields}})
+    return result
+
+
+async def generate_plan_chunked(
+    course: str,
+    weeks: int,
+    syllabus_md: str,
+    model: str,
+    chunk_size: int = 3,
+    concurrency: int = 4,
+    retries: int = 2,
+    on_chunk: Optional[Callable[[List[int]], None]] = None,
+    structured: bool = False,
+    week_fields: Optional[List[str]] = None,
+) -> dict:
+    """将周次分片，每片仅携带相关大纲段落并发请求（受 concurrency 限制），校验后按周拼装。
+
+    单个分片解析/校验失败时只重试该分片，最多 retries 次；structured 时各分片使用结构化输出与增量校验。
+    """
+    import asyncio  # 仅分片/流水线模式需要，按需导入以缩短命令行启动
+    sections = split_syllabus_weeks(syllabus_md)
+    client = make_async_client()
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def run_chunk(week_numbers: List[int]) -> List[dict]:
+        parts_md = [sections[n] for n in week_numbers if n in sections]
+        # 大纲无法按周切分时退回携带全文
+        sections_md = "\n\n".join(parts_md) if len(parts_md) == len(week_numbers) else syllabus_md
+        return await run_plan_chunk(
+            client, sem, course, weeks, week_numbers, sections_md, model, retries, on_chunk, structured, week_fields
+        )
+
+    chunks = await asyncio.gather(*(run_chunk(c) for c in chunk_weeks(weeks, chunk_size)))
+    return {"授课科目": course, "总周数": weeks, "周次": [item for chunk in chunks for item in chunk]}
+
+
+async def run_plan_chunk(
+    client,
+    sem: "asyncio.Semaphore",
+    course: str,
+    weeks: int,
+    week_numbers: List[int],
+    sections_md: str,
+    model: str,
+    retries: int = 2,
+    on_chunk: Optional[Callable[[List[int]], None]] = None,
+    structured: bool = False,
+    week_fields: Optional[List[str]] = None,
+) -> List[dict]:
+    messages = build_plan_chunk_messages(course, weeks, week_numbers, sections_md, week_fields)
+    last_error: Optional[Exception] = None
+    for _ in range(retries + 1):
+        try:
+            async with sem:
+                if structured:
+                    text = await acall_plan_validated(messages, model, client, week_numbers, week_fields)
+                else:
+                    text = await acall_llm(messages, model, client=client)
+            items = parse_plan_chunk(text, week_numbers, week_fields)
+        except ValueError as e:  # json.JSONDecodeError 亦为 ValueError
+            last_error = e
+            # 不合格的响应已写入缓存，删除后重试才会重新请求模型
+            discard_cached(messages, model, chunk_response_format(model, week_fields) if structured else None)
+            continue
+        if on_chunk:
+            on_chunk(week_numbers)
+        return items
+    raise RuntimeError(f"{format_week_span(week_numbers)}教案 JSON 多次生成均不合格：{last_error}")
+
+
+async def generate_pipelined(
+    course: str,
+    weeks: int,
+    syllabus_messages: List[dict],
+    model: str,
+    chunk_size: int = 1,
+    concurrency: int = 4,
+    retries: int = 2,
+    on_token: Optional[Callable[[str], None]] = None,
+    on_syllabus: Optional[Callable[[str], None]] = None,
+    on_dispatch: Optional[Callable[[List[int]], None]] = None,
+    on_chunk: Optional[Callable[[List[int]], None]] = None,
+    structured: bool = False,
+    week_fields: Optional[List[str]] = None,
+) -> tuple:
+    """第一、二阶段流水线执行：流式接收大纲，每凑齐 chunk_size 个已完成的周段落即并发转换为教案 JSON。
+
+    返回 (大纲 Markdown, 教案对象)。大纲中缺失标题的周次在流结束后携带大纲全文补发。
+    """
+    import asyncio
+    client = make_async_client()
+    sem = asyncio.Semaphore(max(1, concurrency))
+    parser = SyllabusSectionParser()
+    tasks: List[asyncio.Task] = []
+    pending: List[tuple] = []
+    seen: set = set()
+
+    def dispatch(sections: List[tuple]) -> None:
+        week_numbers = [n for n, _ in sections]
+        sections_md = "\n\n".join(md for _, md in sections)
+        if on_dispatch:
+            on_dispatch(week_numbers)
+        tasks.append(asyncio.create_task(
+            run_plan_chunk(
+                client, sem, course, weeks, week_numbers, sections_md, model, retries, on_chunk, structured, week_fields
+            )
+        ))
+
+    def accept(completed: List[tuple]) -> None:
+        for n, md in completed:
+            if 1 <= n <= weeks and n not in seen:
+                seen.add(n)
+                pending.append((n, md))
+            if len(pending) >= chunk_size:
+                dispatch(pending[:])
+                pending.clear()
+
+    try:
+        async for delta in astream_llm(syllabus_messages, model, client=client):
+            if on_token:
+                on_token(delta)
+            accept(parser.feed(delta))
+        accept(parser.close())
+        if pending:
+            dispatch(pending[:])
+            pending.clear()
+
+        syllabus_md = parser.text
+        if on_syllabus:
+            on_syllabus(syllabus_md)
+
+        missing = [n for n in range(1, weeks + 1) if n not in seen]
+        for group in [missing[i:i + max(1, chunk_size)] for i in range(0, len(missing), max(1, chunk_size))]:
+            if on_dispatch:
+                on_dispatch(group)
+            tasks.append(asyncio.create_task(
+                run_plan_chunk(
+                    client, sem, course, weeks, group, syllabus_md, model, retries, on_chunk, structured, week_fields
+                )
+            ))
+
+        chunks = await asyncio.gather(*tasks)
+    except BaseException:
+        for t in tasks:
+            t.cancel()
+        raise
+
+    by_week = {item["周"]: item for chunk in chunks for item in chunk}
+    plan_obj = {"授课科目": course, "总周数": weeks, "周次": [by_week[n] for n in range(1, weeks + 1)]}
+    return syllabus_md, plan_obj
+
+
+def course_inputs(
+    weeks: int,
+    parts: Optional[List[str]],
+    excludes: Optional[List[str]],
+    features: Optional[str],
+    level: str,
+    model: str,
+) -> dict:
+    """本次生成实际使用的输入（模块清单取生效值），随产物保存，供下次 --regen 判定受影响的周次。"""
+    return {
+        "weeks": weeks,
+        "parts": list(parts or DEFAULT_PARTS),
+        "excludes": list(excludes or []),
+        "features": (features or "").strip(),
+        "level": level,
+        "model": model,
+    }
+
+
+def inputs_record_path(out_dir: Path, course: str, weeks: int) -> Path:
+    return Path(out_dir) / f"{course}-{weeks}-inputs.json"
+
+
+def load_previous_outputs(out_dir: Path, course: str, weeks: int) -> Optional[tuple]:
+    """读取上次的 (大纲 Markdown, 教案对象, 输入记录或 None)；大纲或教案 JSON 缺失/损坏时返回 None。"""
+    syllabus_path = Path(out_dir) / f"{course}-教学大纲.md"
+    plan_path = Path(out_dir) / f"{course}-{weeks}-data.json"
+    if not syllabus_path.exists() or not plan_path.exists():
+        return None
+    try:
+        plan_obj = json.loads(plan_path.read_text(encoding="utf-8"))
+    except ValueError:
+        return None
+    record_path = inputs_record_path(out_dir, course, weeks)
+    old_inputs = None
+    if record_path.exists():
+        try:
+            old_inputs = json.loads(record_path.read_text(encoding="utf-8"))
+        except ValueError:
+            old_inputs = None
+    return syllabus_path.read_text(encoding="utf-8"), plan_obj, old_inputs
+
+
+def build_week_regen_messages(
+    course: str,
+    inputs: dict,
+    template_text: str,
+    sections: Dict[int, str],
+    regen: RegenPlan,
+) -> List[dict]:
+    """只重新生成受影响周次的大纲：其余周次压缩为一行摘要作为衔接上下文。"""
+    weeks = inputs["weeks"]
+    modules = week_modules(sections)
+    context = []
+    for n in range(1, weeks + 1):
+        if n in regen.affected:
+            continue
+        content = parse_week_section(sections[n]).get("教学内容", [])[:3]
+        context.append(f"第{n}周｜{modules.get(n, '')}｜{'；'.join(content)}")
+    tasks = []
+    for n in regen.weeks:
+        target = f"本周教学模块为“{regen.modules[n]}”" if n in regen.modules else "从当前大模块中选择与前后周衔接的模块"
+        tasks.append(f"- 第{n}周：{'；'.join(regen.affected[n])}；{target}")
+    _, block = split_syllabus_template(template_text)
+    parts_text = "\n".join(f"- {i+1}. {m}" for i, m in enumerate(inputs["parts"]))
+    exclude_text = ", ".join(inputs["excludes"]) or "无"
+    context_text = "\n".join(context)
+    tasks_text = "\n".join(tasks)
+    span = format_week_span(regen.weeks)
+
+    system = (
+        "你是一名资深职业教育课程负责人，擅长基于岗位能力培养目标设计教学大纲。"
+        "请严格按照用户提供的课程信息与模板格式输出内容，语言使用简体中文，表达专业、清晰、可落地。"
+    )
+    user = f"""
+课程名称：{course}
+学习者层级/对象：{inputs["level"]}
+总周数：{weeks}
+大模块（教学部分）：\n{parts_text}
+教学大纲的功能说明（不排除项/需重点涵盖的方向）：{inputs["features"] or "无"}
+禁止包含的内容（若出现将扣分并重写）：{exclude_text}
+
+现有大纲中其余周次保持不变，供衔接参考（周次｜教学模块｜教学内容要点）：
+{context_text}
+
+本次只重新生成：{span}（共 {len(regen.weeks)} 周），原因与要求：
+{tasks_text}
+
+生成要求：
+1) 每周按下方单周模板输出一个块（{WEEK_PLACEHOLDER} 替换为周次），按周次升序，不得增加或删除字段；
+2) 与前后周次保持难度递进与衔接，不与其余周次的内容重复；
+3) 不得包含“禁止包含的内容”中的条目与表达；
+4) 只输出上述周次的大纲正文，不要任何多余文字。
+
+单周模板：
+{block}
+"""
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": user},
+    ]
+
+
+async def _regenerate_plan_items(
+    course: str, weeks: int, week_numbers: List[int], sections_md: str, model: str, structured: bool,
+    week_fields: Optional[List[str]] = None,
+) -> List[dict]:
+    import asyncio
+
+    return await run_plan_chunk(
+        make_async_client(), asyncio.Semaphore(1), course, weeks, week_numbers, sections_md, model,
+        structured=structured, week_fields=week_fields,
+    )
+
+
+def regenerate_weeks(
+    course: str,
+    previous: tuple,
+    inputs: dict,
+    template_text: str,
+    model: str,
+    plan_mode: str = "llm",
+    structured: bool = False,
+    retries: int = 2,
+    on_log: Optional[Callable[[str], None]] = None,
+    on_token: Optional[Callable[[str], None]] = None,
+    week_fields: Optional[List[str]] = None,
+) -> Optional[tuple]:
+    """按周增量重新生成：只重写受输入变化影响的周次，再拼回上次的大纲与教案 JSON。
+
+    返回 (大纲 Markdown, 教案对象, 重新生成的周次)；需要完整重新生成时返回 None。
+    """
+    def log(msg: str) -> None:
+        if on_log:
+            on_log(msg)
+
+    weeks = inputs["weeks"]
+    syllabus_md, plan_obj, old_inputs = previous
+    sections = split_syllabus_weeks(syllabus_md)
+    items = {item.get("周"): item for item in plan_obj.get("周次") or [] if isinstance(item, dict)}
+    regen = plan_regeneration(sections, items, old_inputs, inputs)
+    if regen.full:
+        log(f"{regen.full}，改为完整重新生成")
+        return None
+    if not regen.affected:
+        log("输入变化未影响任何周次，沿用上次的大纲与教案 JSON")
+        return syllabus_md, plan_obj, []
+    week_numbers = regen.weeks
+    log(f"增量重新生成{format_week_span(week_numbers)}（{len(week_numbers)}/{weeks} 周），其余周次沿用上次结果")
+
+    messages = build_week_regen_messages(course, inputs, template_text, sections, regen)
+    new_sections: Optional[Dict[int, str]] = None
+    lacking: List[int] = []
+    for _ in range(retries + 1):
+        with stage_timer("llm_syllabus"):
+            text = call_llm(messages, model=model, on_token=on_token)
+        got = split_syllabus_weeks(text)
+        lacking = [n for n in week_numbers if n not in got]
+        if not lacking:
+            new_sections = got
+            break
+        # 缺周的响应已写入缓存，删除后重试才会重新请求模型
+        discard_cached(messages, model)
+        log(f"增量生成的大纲缺少第{'、'.join(map(str, lacking))}周，重试")
+    if new_sections is None:
+        raise RuntimeError(f"增量生成的大纲多次缺少第{'、'.join(map(str, lacking))}周")
+    for n in week_numbers:
+        syllabus_md = syllabus_md.replace(sections[n], new_sections[n], 1)
+
+    if plan_mode == "fast" and not unsupported_fields(week_fields):
+        with stage_timer("plan_local"):
+            new_items = [week_entry(n, parse_week_section(new_sections[n]), week_fields) for n in week_numbers]
+    else:
+        sections_md = "\n\n".join(new_sections[n] for n in week_numbers)
+        with stage_timer("llm_plan"):
+            new_items = run_async(_regenerate_plan_items(
+                course, weeks, week_numbers, sections_md, model, structured, week_fields
+            ))
+    by_week = {item["周"]: item for item in new_items}
+    plan_obj["周次"] = [by_week.get(item.get("周"), item) for item in plan_obj.get("周次") or []]
+    return syllabus_md, plan_obj, week_numbers
+
+
+def normalize_plan(plan_obj: dict, course: str, weeks: int, week_fields: Optional[List[str]] = None) -> dict:
+    # 基础校验
+    if plan_obj.get("授课科目") != course:
+        plan_obj["授课科目"] = course
+    if plan_obj.get("总周数") != weeks:
+        plan_obj["总周数"] = weeks
+    weeks_list = plan_obj.get("周次") or []
+    if not isinstance(weeks_list, list) or len(weeks_list) != weeks:
+        # 若长度不符，简单纠正长度（截断/补齐空项）
+        fixed = []
+        for i in range(weeks):
+            item = weeks_list[i] if i < len(weeks_list) else {}
+            fixed.append({"周": i + 1, **{k: item.get(k, "") for k in week_fields or WEEK_FIELDS}})
+        plan_obj["周次"] = fixed
+    return plan_obj
+
+
+def emit_event(event_type: str, **payload) -> None:
+    """--events 模式下向 stdout 输出一行 JSON 事件，供调用方逐行读取。"""
+    print(json.dumps({"type": event_type, **payload}, ensure_ascii=False), flush=True)
+
+
+def load_templates(template_path: Path, json_template_path: Path) -> tuple:
+    """读取大纲模板与教案 JSON 模板文本；常驻服务可在启动时调用一次并复用。"""
+    if not template_path.exists():
+        raise FileNotFoundError(f"找不到大纲模板文件: {template_path}")
+    if not json_template_path.exists():
+        raise FileNotFoundError(f"找不到教案 JSON 模板文件: {json_template_path}")
+    return template_path.read_text(encoding="utf-8"), json_template_path.read_text(encoding="utf-8")
+
+
+def render_marks(template_text: str, info: dict) -> str:
+    """填充“教案模板标记值”模板（templates/教案模板标记值.md）；info 的键与 UI 表单一致，缺省为空。"""
+    weekly_hours = str(info.get("weekly_hours") or "")
+    replacements = {
+        "{授课科目}": str(info.get("course") or ""),
+        "{总周数}": str(info.get("weeks") or ""),
+        "{授课老师}": str(info.get("teacher") or ""),
+        "{授课班级}": str(info.get("class_name") or ""),
+        "{班级人数}": str(info.get("class_size") or ""),
+        "{授课时间}": str(info.get("teaching_time") or ""),
+        "{周学时}": f"{weekly_hours} 学时/周" if weekly_hours else "",
+        "{考核方式}": str(info.get("assessment") or ""),
+        "{授课地点}": str(info.get("location") or ""),
+    }
+    for k, v in replacements.items():
+        template_text = template_text.replace(k, v)
+    return template_text
+
+
+def generate_course_files(
+    course: str,
+    weeks: int,
+    template_text: str,
+    data_template_text: str,
+    parts: Optional[List[str]] = None,
+    excludes: Optional[List[str]] = None,
+    features: Optional[str] = None,
+    level: str = "高职学生",
+    model: str = "deepseek-chat",
+    out_dir: Path = Path("output"),
+    chunk_weeks: int = 0,
+    concurrency: int = 4,
+    pipeline: bool = False,
+    structured_json: bool = False,
+    plan_mode: str = "llm",
+    incremental: bool = False,
+    on_event: Optional[Callable[..., None]] = None,
+) -> tuple:
+    """两阶段生成教学大纲与教案 JSON 并写入 out_dir，返回 (大纲路径, 教案 JSON 路径)。
+
+    on_event(type, **payload) 接收 stage / token / log 事件；提供时改为流式调用模型，
+    缺省时日志直接打印。structured_json 时第二阶段使用结构化输出并边接收边校验，偏离即中止重试。
+    plan_mode 为 local / fast 时教案 JSON 由大纲按规则转换（见 build_plan_local），不再整体调用模型。
+    incremental 时读取 out_dir 中上次的产物，只重新生成受输入变化影响的周次（见 regenerate_weeks），
+    无上次产物或变化过大时仍完整生成。
+    命令行与 UI 常驻服务共用此函数。
+    """
+
+    def log(msg: str) -> None:
+        if on_event is not None:
+            on_event("log", text=msg)
+        else:
+            print(msg)
+
+    def stage(name: str, status: str, **payload) -> None:
+        if on_event is not None:
+            on_event("stage", stage=name, status=status, **payload)
+
+    def token_sink(name: str):
+        if on_event is None:
+            return None
+        return lambda delta: on_event("token", stage=name, text=delta)
+
+    # 第一阶段：生成教学大纲（Markdown）
+    with stage_timer("prompt_build"):
+        syllabus_messages = build_syllabus_messages(
+            course=course,
+            weeks=weeks,
+            parts=parts,
+            excludes=excludes,
+            template_text=template_text,
+            level=level,
+            features=features,
+        )
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    syllabus_path = out_dir / f"{course}-教学大纲.md"
+
+    def save_syllabus(md: str) -> None:
+        with stage_timer("write_files"):
+            atomic_write_text(syllabus_path, md)
+        log(f"已生成：{syllabus_path}")
+        stage("syllabus", "done", file=syllabus_path.name)
+
+    plan_started = []
+
+    def start_plan_stage(*_) -> None:
+        if not plan_started:
+            stage("plan", "start")
+        plan_started.append(True)
+
+    def chunk_done(nums: List[int]) -> None:
+        log(f"教案 JSON：{format_week_span(nums)}已完成")
+
+    def plan_retry(error: Exception) -> None:
+        log(f"教案 JSON 不合格（{error}），已中止并重试")
+        stage("plan", "retry")
+
+    stage("syllabus", "start")
+
+    inputs = course_inputs(weeks, parts, excludes, features, level, model)
+    # 每周条目的字段以实际使用的教案 JSON 模板为准，提示词与校验/修正保持一致
+    week_fields = plan_week_fields(data_template_text)
+    regenerated = None
+    if incremental:
+        previous = load_previous_outputs(out_dir, course, weeks)
+        if previous is None:
+            log("未找到上次的大纲与教案 JSON，改为完整生成")
+        else:
+            regenerated = regenerate_weeks(
+                course, previous, inputs, template_text, model, plan_mode=plan_mode, structured=structured_json,
+                on_log=log, on_token=token_sink("syllabus"), week_fields=week_fields,
+            )
+
+    if regenerated is not None:
+        syllabus_md, plan_obj, _ = regenerated
+        save_syllabus(syllabus_md)
+        start_plan_stage()
+    elif pipeline and plan_mode == "llm":
+        # 第一、二阶段流水线：大纲每完成一周即分派该周的教案 JSON 生成
+        with stage_timer("llm_pipeline"):
+            syllabus_md, plan_obj = run_async(generate_pipelined(
+                course=course,
+                weeks=weeks,
+                syllabus_messages=syllabus_messages,
+                model=model,
+                chunk_size=chunk_weeks or 1,
+                concurrency=concurrency,
+                on_token=token_sink("syllabus"),
+                on_syllabus=save_syllabus,
+                on_dispatch=start_plan_stage,
+                on_chunk=chunk_done,
+                structured=structured_json,
+                week_fields=week_fields,
+            ))
+    else:
+        with stage_timer("llm_syllabus"):
+            syllabus_md = call_llm(syllabus_messages, model=model, on_token=token_sink("syllabus"))
+        save_syllabus(syllabus_md)
+
+        # 第二阶段：根据大纲生成教案 JSON（规则转换失败时退回模型生成）
+        start_plan_stage()
+        plan_obj = None
+        if plan_mode != "llm":
+            plan_obj = build_plan_local(
+                course, weeks, syllabus_md, model, fast=plan_mode == "fast",
+                on_log=log, on_token=token_sink("plan"), on_retry=plan_retry, week_fields=week_fields,
+            )
+        if plan_obj is not None:
+            pass
+        elif chunk_weeks > 0:
+            with stage_timer("llm_plan"):
+                plan_obj = run_async(generate_plan_chunked(
+                    course=course,
+                    weeks=weeks,
+                    syllabus_md=syllabus_md,
+                    model=model,
+                    chunk_size=chunk_weeks,
+                    concurrency=concurrency,
+                    on_chunk=chunk_done,
+                    structured=structured_json,
+                    week_fields=week_fields,
+                ))
+        else:
+            with stage_timer("prompt_build"):
+                plan_messages = build_plan_messages(
+                    course=course,
+                    weeks=weeks,
+                    syllabus_md=syllabus_md,
+                    data_template_text=data_template_text,
+                )
+            if structured_json:
+                with stage_timer("llm_plan"):
+                    plan_obj = generate_plan_structured(
+                        plan_messages, weeks, model, on_token=token_sink("plan"), on_retry=plan_retry,
+                        fields=week_fields,
+                    )
+            else:
+                with stage_timer("llm_plan"):
+                    plan_json_text = call_llm(plan_messages, model=model, on_token=token_sink("plan"))
+
+                with stage_timer("json_repair"):
+                    plan_json_text = ensure_pure_json(plan_json_text)
+                    try:
+                        plan_obj = json.loads(plan_json_text)
+                    except json.JSONDecodeError as e:
+                        discard_cached(plan_messages, model)
+                        raise RuntimeError(f"模型返回的教案 JSON 无法解析：{e}\n原文：\n{plan_json_text[:1000]}")
+
+    with stage_timer("json_repair"):
+        plan_obj = normalize_plan(plan_obj, course, weeks, week_fields)
+
+    plan_path = out_dir / f"{course}-{weeks}-data.json"
+    with stage_timer("write_files"):
+        atomic_write_text(plan_path, json.dumps(plan_obj, ensure_ascii=False, indent=2))
+        atomic_write_text(inputs_record_path(out_dir, course, weeks), json.dumps(inputs, ensure_ascii=False, indent=2))
+    log(f"已生成：{plan_path}")
+    stage("plan", "done", file=plan_path.name)
+    return syllabus_path, plan_path
+
+
+# --profile-startup 的分析阶段：(阶段名, 在干净解释器中依次执行的语句)
+STARTUP_PHASES = [
+    ("启动（--help / 参数校验）", "import build_course_docs"),
+    ("首次调用模型（openai 客户端）", "import generate_syllabus; generate_syllabus._openai(); generate_syllabus._httpx()"),
+]
+
+
 def main():
     parser = argparse.ArgumentParser(description="根据四项输入：课程名称/周数/大模块/排除项，生成《课程名称-教学大纲.md》与《课程名称-教案.json》。")
     parser.add_argument("--course", required=True, help="课程名称，例如：软件测试")
@@ -139,84 +1025,64 @@ def main():
     parser.add_argument("--template", default=str(Path("templates") / "syllabus_template.md"), help="大纲模板（Markdown）路径")
     parser.add_argument("--json_template", default=str(Path("templates") / "data_template.json"), help="教案 JSON 模板路径")
     parser.add_argument("--model", default="deepseek-chat", help="OpenAI/DeepSeek 模型名，如 deepseek-chat / gpt-4o-mini 等")
+    parser.add_argument("--events", action="store_true", help="流式调用模型，并以 JSON 行输出阶段切换与 token 事件（供 UI 转发）")
+    parser.add_argument("--chunk-weeks", type=int, default=0, help="第二阶段按每 N 周分片并发生成教案 JSON；0 表示整体一次生成")
+    parser.add_argument("--concurrency", type=int, default=4, help="分片模式下同时进行的模型请求上限，默认4")
+    parser.add_argument("--pipeline", action="store_true", help="流式生成大纲的同时，每完成一周（或 --chunk-weeks 周）即并发生成对应教案 JSON")
+    plan_group = parser.add_mutually_exclusive_group()
+    plan_group.add_argument("--local-plan", action="store_true", help="教案 JSON 由大纲按规则转换，仅用一次小请求补写教学目标与作业")
+    plan_group.add_argument("--fast", action="store_true", help="教案 JSON 完全由大纲按规则转换，不再调用模型（教学目标/作业为规则近似）")
+    parser.add_argument("--regen", action="store_true", help="基于 output 中上次的大纲与教案 JSON，只重新生成受 --parts/--exclude 变化影响的周次")
+    parser.add_argument("--structured-json", action="store_true", help="教案 JSON 使用结构化输出并边接收边校验，输出偏离结构时立即中止重试（LLM_JSON_MODE 控制 response_format）")
+    cache_group = parser.add_mutually_exclusive_group()
+    cache_group.add_argument("--no-cache", action="store_true", help="不读写本地大模型响应缓存")
+    cache_group.add_argument("--refresh", action="store_true", help="忽略已缓存的响应，重新调用模型并覆盖缓存")
+    parser.add_argument("--profile-startup", action="store_true", help="分析启动与按需加载依赖的导入耗时后退出")
 
+    if profile_startup_requested():
+        run_startup_profile(Path(__file__).resolve().parent, STARTUP_PHASES)
+        return
     args = parser.parse_args()
+    if args.no_cache:
+        set_cache_mode("off")
+    elif args.refresh:
+        set_cache_mode("refresh")
 
-    template_path = Path(args.template)
-    json_template_path = Path(args.json_template)
-    if not template_path.exists():
-        raise FileNotFoundError(f"找不到大纲模板文件: {template_path}")
-    if not json_template_path.exists():
-        raise FileNotFoundError(f"找不到教案 JSON 模板文件: {json_template_path}")
-
-    template_text = template_path.read_text(encoding="utf-8")
-    data_template_text = json_template_path.read_text(encoding="utf-8")
+    template_text, data_template_text = load_templates(Path(args.template), Path(args.json_template))
 
     parts = [s.strip() for s in args.parts.split(",") if s.strip()] if args.parts else None
     excludes = [s.strip() for s in args.exclude.split(",") if s.strip()] if args.exclude else None
     features = args.features.strip() if args.features else None
 
-    # 第一阶段：生成教学大纲（Markdown）
-    syllabus_messages = build_syllabus_messages(
+    generate_course_files(
         course=args.course,
         weeks=args.weeks,
+        template_text=template_text,
+        data_template_text=data_template_text,
         parts=parts,
         excludes=excludes,
-        template_text=template_text,
-        level=args.level,
         features=features,
+        level=args.level,
+        model=args.model,
+        out_dir=Path("output"),
+        chunk_weeks=args.chunk_weeks,
+        concurrency=args.concurrency,
+        pipeline=args.pipeline,
+        structured_json=args.structured_json,
+        plan_mode="fast" if args.fast else "local" if args.local_plan else "llm",
+        incremental=args.regen,
+        on_event=emit_event if args.events else None,
     )
-    syllabus_md = call_llm(syllabus_messages, model=args.model)
-
-    out_dir = Path("output")
-    out_dir.mkdir(parents=True, exist_ok=True)
-    syllabus_path = out_dir / f"{args.course}-教学大纲.md"
-    syllabus_path.write_text(syllabus_md, encoding="utf-8")
-    print(f"已生成：{syllabus_path}")
-
-    # 第二阶段：根据大纲生成教案 JSON
-    plan_messages = build_plan_messages(
-        course=args.course,
-        weeks=args.weeks,
-        syllabus_md=syllabus_md,
-        data_template_text=data_template_text,
-    )
-    plan_json_text = call_llm(plan_messages, model=args.model)
-    plan_json_text = ensure_pure_json(plan_json_text)
-
-    try:
-        plan_obj = json.loads(plan_json_text)
-    except json.JSONDecodeError as e:
-        raise RuntimeError(f"模型返回的教案 JSON 无法解析：{e}\n原文：\n{plan_json_text[:1000]}")
-
-    # 基础校验
-    if plan_obj.get("授课科目") != args.course:
-        plan_obj["授课科目"] = args.course
-    if plan_obj.get("总周数") != args.weeks:
-        plan_obj["总周数"] = args.weeks
-    weeks_list = plan_obj.get("周次") or []
-    if not isinstance(weeks_list, list) or len(weeks_list) != args.weeks:
-        # 若长度不符，简单纠正长度（截断/补齐空项）
-        fixed = []
-        for i in range(args.weeks):
-            item = weeks_list[i] if i < len(weeks_list) else {}
-            fixed.append({
-                "周": i + 1,
-                "课题": item.get("课题", ""),
-                "教学目标": item.get("教学目标", ""),
-                "教学重点": item.get("教学重点", ""),
-                "教学难点": item.get("教学难点", ""),
-                "授课内容1": item.get("授课内容1", ""),
-                "授课内容2": item.get("授课内容2", ""),
-                "授课内容3": item.get("授课内容3", ""),
-                "授课内容4": item.get("授课内容4", ""),
-                "作业": item.get("作业", ""),
-            })
-        plan_obj["周次"] = fixed
 
-    plan_path = out_dir / f"{args.course}-{args.weeks}-data.json"
-    plan_path.write_text(json.dumps(plan_obj, ensure_ascii=False, indent=2), encoding="utf-8")
-    print(f"已生成：{plan_path}")
+    cache = get_cache()
+    if cache is not None:
+        st = cache.stats()
+        msg = (f"LLM 缓存：本次命中 {st['session_hits']}、未命中 {st['session_misses']}；"
+               f"累计命中 {st['total_hits']}、未命中 {st['total_misses']}，现存 {st['entries']} 条")
+        if args.events:
+            emit_event("log", text=msg)
+        else:
+            print(msg)
 
 
 if __name__ == "__main__":
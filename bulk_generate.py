@@ -0,0 +1,301 @@
+"""
+按课程清单（CSV / JSON）批量生成教学大纲、教案 JSON 与 Word 教案，支持断点续跑。
+
+清单每行一门课程，列名与 UI 表单字段一致：
+    course（必填）, weeks, parts, exclude, features, level, model,
+    teacher, class_name, class_size, weekly_hours, teaching_time, assessment, location
+parts / exclude 以逗号分隔（JSON 清单中也可写成数组）。
+
+多门课程在线程池中并发执行（--jobs），实际同时进行的模型请求数由 generate_syllabus 的
+自适应并发上限按服务商限流情况调节。每门课程的阶段进度写入断点文件（默认 output/bulk-checkpoint.json），
+重跑时跳过清单行未变且产物仍在的阶段；结束后在输出目录写入汇总报告 bulk-report.json。
+
+用法：
+    python bulk_generate.py --manifest courses.csv --jobs 6
+"""
+
+import csv
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from artifact_store import atomic_write_text
+from build_course_docs import generate_course_files, load_templates, render_marks
+from generate_syllabus import get_cache, set_cache_mode
+from metrics import record_run, stage_timer
+
+BASE_DIR = Path(__file__).resolve().parent
+IRP_DIR = BASE_DIR / "IndependentRunningPackage"
+MARKS_TEMPLATE = BASE_DIR / "templates" / "教案模板标记值.md"
+
+MANIFEST_FIELDS = (
+    "course", "weeks", "parts", "exclude", "features", "level", "model",
+    "teacher", "class_name", "class_size", "weekly_hours", "teaching_time", "assessment", "location",
+)
+# 影响模型生成内容的字段；其余（授课信息）只影响标记值文件与 Word 教案
+GENERATION_FIELDS = ("course", "weeks", "parts", "exclude", "features", "level", "model", "plan_mode")
+
+
+def _as_list_text(value) -> str:
+    if isinstance(value, (list, tuple)):
+        return ",".join(str(v).strip() for v in value if str(v).strip())
+    return str(value or "").strip()
+
+
+def load_course_manifest(path: Path, default_model: str = "deepseek-chat", default_weeks: int = 18) -> List[dict]:
+    """读取 CSV（可带 BOM，便于 Excel 导出）或 JSON（对象数组）清单，返回规范化后的课程行。"""
+    if not path.exists():
+        raise FileNotFoundError(f"找不到课程清单: {path}")
+    if path.suffix.lower() == ".json":
+        entries = json.loads(path.read_text(encoding="utf-8"))
+        if not isinstance(entries, list):
+            raise ValueError("JSON 清单应为对象数组")
+    else:
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            entries = list(csv.DictReader(f))
+
+    rows: List[dict] = []
+    seen = set()
+    for line, entry in enumerate(entries, start=1):
+        if not isinstance(entry, dict):
+            raise ValueError(f"清单第 {line} 项不是对象")
+        unknown = [k for k in entry if k and k not in MANIFEST_FIELDS]
+        if unknown:
+            raise ValueError(f"清单第 {line} 项含未知字段：{', '.join(unknown)}")
+        row = {k: _as_list_text(entry.get(k)) for k in MANIFEST_FIELDS}
+        if not row["course"]:
+            raise ValueError(f"清单第 {line} 项缺少课程名称（course）")
+        try:
+            row["weeks"] = int(row["weeks"] or default_weeks)
+        except ValueError:
+            raise ValueError(f"清单第 {line} 项的周数不是整数：{row['weeks']}") from None
+        row["model"] = row["model"] or default_model
+        row["level"] = row["level"] or "高职学生"
+        # 与 UI 一致：班级人数仅允许 1..99 的整数，否则置空
+        row["class_size"] = row["class_size"] if row["class_size"].isdigit() and 1 <= int(row["class_size"]) < 100 else ""
+        key = course_key(row)
+        if key in seen:
+            raise ValueError(f"清单中重复的课程：{key}")
+        seen.add(key)
+        rows.append(row)
+    return rows
+
+
+def course_key(row: dict) -> str:
+    return f"{row['course']}-{row['weeks']}"
+
+
+def fingerprint(row: dict, fields) -> str:
+    payload = json.dumps({k: row.get(k) for k in fields}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class Checkpoint:
+    """断点文件：{课程键: {阶段: 完成时清单行的指纹, ...}}。每次更新都原子地整体写回。
+
+    阶段 generate（大纲 + 教案 JSON）按生成字段计指纹，word（标记值文件 + Word 教案）按全部字段
+    与教案 JSON 的内容哈希计指纹；清单行改动或教案 JSON 重新生成后对应阶段的指纹不再匹配，随之重跑。
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data: Dict[str, dict] = {}
+        if path.exists():
+            try:
+                self._data = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, json.JSONDecodeError):
+                self._data = {}
+
+    def done(self, key: str, stage: str, fp: str) -> bool:
+        with self._lock:
+            return self._data.get(key, {}).get(stage) == fp
+
+    def mark(self, key: str, stage: Optional[str], fp: Optional[str], **fields) -> None:
+        """记录阶段完成（fp 为指纹）或作废（fp 为 None）；stage 为 None 时只更新状态字段。"""
+        with self._lock:
+            entry = self._data.setdefault(key, {})
+            if stage is not None and fp is None:
+                entry.pop(stage, None)
+            elif stage is not None:
+                entry[stage] = fp
+            entry.update(fields, updated=time.strftime("%Y-%m-%d %H:%M:%S"))
+            atomic_write_text(self.path, json.dumps(self._data, ensure_ascii=False, indent=2))
+
+
+def _word_builder(with_word: bool):
+    """按需导入 Word 生成模块（python-docx 导入较慢），并预载模板；不生成 Word 时返回 None。"""
+    if not with_word:
+        return None
+    sys.path.insert(0, str(IRP_DIR))
+    from build_word_from_templates import build_course, find_docx_templates, preload_templates
+
+    head_tpl, week_tpl = find_docx_templates(IRP_DIR)
+    preload_templates(head_tpl, week_tpl)
+    return lambda md, js, out_dir, timings: build_course(md, js, head_tpl, week_tpl, out_dir, timings)
+
+
+def run_course(row: dict, options: dict, checkpoint: Checkpoint, build_word) -> dict:
+    """生成一门课程的全部产物，逐阶段写断点；返回该课程的结果（失败时不抛出）。"""
+    key = course_key(row)
+    out_dir, docs_dir = options["out_dir"], options["docs_dir"]
+    gen_fp = fingerprint(row, GENERATION_FIELDS)
+    syllabus_path = out_dir / f"{row['course']}-教学大纲.md"
+    plan_path = out_dir / f"{row['course']}-{row['weeks']}-data.json"
+    marks_path = out_dir / f"教案模板标记值-{row['course']}.md"
+    result = {"course": row["course"], "weeks": row["weeks"], "model": row["model"], "skipped": []}
+    started = time.perf_counter()
+
+    def log(event_type: str, **payload) -> None:
+        if event_type == "log":
+            print(f"[{key}] {payload['text']}", flush=True)
+
+    with record_run() as run:
+        try:
+            if checkpoint.done(key, "generate", gen_fp) and syllabus_path.exists() and plan_path.exists():
+                result["skipped"].append("generate")
+            else:
+                # 教案 JSON 将被重写，已完成的 Word 阶段随之作废（即使本次生成中途失败）
+                checkpoint.mark(key, "word", None)
+                checkpoint.mark(key, "generate", None, status="running")
+                generate_course_files(
+                    course=row["course"],
+                    weeks=row["weeks"],
+                    template_text=options["template_text"],
+                    data_template_text=options["data_template_text"],
+                    parts=[s.strip() for s in row["parts"].split(",") if s.strip()] or None,
+                    excludes=[s.strip() for s in row["exclude"].split(",") if s.strip()] or None,
+                    features=row["features"] or None,
+                    level=row["level"],
+                    model=row["model"],
+                    out_dir=out_dir,
+                    chunk_weeks=options["chunk_weeks"],
+                    concurrency=options["concurrency"],
+                    structured_json=options["structured_json"],
+                    plan_mode=row["plan_mode"],
+                    incremental=options["incremental"],
+                    on_event=log,
+                )
+                checkpoint.mark(key, "generate", gen_fp, status="generated")
+            artifacts = {"syllabus": str(syllabus_path), "plan": str(plan_path)}
+
+            if build_word is not None:
+                word_path = docs_dir / f"教案-{row['course']}.docx"
+                plan_sha = hashlib.sha256(plan_path.read_bytes()).hexdigest()
+                word_fp = fingerprint({**row, "plan_sha": plan_sha}, MANIFEST_FIELDS + ("plan_mode", "plan_sha"))
+                if checkpoint.done(key, "word", word_fp) and word_path.exists() and marks_path.exists():
+                    result["skipped"].append("word")
+                else:
+                    with stage_timer("marks_file"):
+                        atomic_write_text(marks_path, render_marks(options["marks_template"], row))
+                    docs_dir.mkdir(parents=True, exist_ok=True)
+                    timings: Dict[str, float] = {}
+                    word_path = build_word(marks_path, plan_path, docs_dir, timings)
+                    checkpoint.mark(key, "word", word_fp)
+                artifacts.update(marks=str(marks_path), word=str(word_path))
+            checkpoint.mark(key, None, None, status="done", error=None)
+            result.update(ok=True, artifacts=artifacts)
+        except Exception as e:
+            checkpoint.mark(key, None, None, status="failed", error=f"{type(e).__name__}: {e}")
+            result.update(ok=False, error=f"{type(e).__name__}: {e}")
+        summary = run.summary()
+    result.update(seconds=round(time.perf_counter() - started, 3), llm_requests=summary["llm_requests"],
+                  tokens=summary["tokens"])
+    return result
+
+
+def run_bulk(rows: List[dict], options: dict, checkpoint: Checkpoint, jobs: int, with_word: bool) -> List[dict]:
+    """并发处理清单中的课程，返回逐门结果（按清单顺序）。"""
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    build_word = _word_builder(with_word)
+    results: List[Optional[dict]] = [None] * len(rows)
+    with ThreadPoolExecutor(max_workers=max(1, min(jobs, len(rows) or 1)), thread_name_prefix="course") as pool:
+        futures = {pool.submit(run_course, row, options, checkpoint, build_word): i for i, row in enumerate(rows)}
+        for done_count, fut in enumerate(as_completed(futures), start=1):
+            res = fut.result()
+            results[futures[fut]] = res
+            tag = "完成" if res["ok"] else "失败"
+            skipped = f"（跳过：{'、'.join(res['skipped'])}）" if res["skipped"] else ""
+            detail = "" if res["ok"] else f"：{res['error']}"
+            print(f"[{tag} {done_count}/{len(rows)}] {res['seconds']:.2f}s  {res['course']}-{res['weeks']}{skipped}{detail}",
+                  flush=True)
+    return [r for r in results if r is not None]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按课程清单（CSV/JSON）批量生成教学大纲、教案 JSON 与 Word 教案，可断点续跑。")
+    parser.add_argument("--manifest", required=True, help="课程清单路径（.csv 或 .json），列名见脚本说明")
+    parser.add_argument("--jobs", type=int, default=4, help="同时处理的课程数，默认4（模型请求并发另由自适应上限控制）")
+    parser.add_argument("--model", default="deepseek-chat", help="清单未指定 model 时使用的模型")
+    parser.add_argument("--out-dir", default="output", help="大纲、教案 JSON 与标记值文件的输出目录，默认 output")
+    parser.add_argument("--docs-dir", default="docs", help="Word 教案输出目录，默认 docs")
+    parser.add_argument("--checkpoint", default="", help="断点文件路径，缺省为 <out-dir>/bulk-checkpoint.json")
+    parser.add_argument("--restart", action="store_true", help="忽略已有断点，全部重新生成")
+    parser.add_argument("--no-word", action="store_true", help="只生成大纲与教案 JSON，不生成 Word 教案")
+    parser.add_argument("--chunk-weeks", type=int, default=0, help="第二阶段按每 N 周分片并发生成教案 JSON；0 表示整体一次生成")
+    parser.add_argument("--concurrency", type=int, default=4, help="单门课程分片模式下同时进行的模型请求上限，默认4")
+    parser.add_argument("--structured-json", action="store_true", help="教案 JSON 使用结构化输出并边接收边校验")
+    parser.add_argument("--regen", action="store_true", help="清单行的 parts/exclude 改动后，只重新生成受影响的周次（见 build_course_docs.py --regen）")
+    plan_group = parser.add_mutually_exclusive_group()
+    plan_group.add_argument("--local-plan", action="store_true", help="教案 JSON 由大纲按规则转换，仅用一次小请求补写教学目标与作业")
+    plan_group.add_argument("--fast", action="store_true", help="教案 JSON 完全由大纲按规则转换，不再调用模型")
+    parser.add_argument("--no-cache", action="store_true", help="不读写本地大模型响应缓存")
+    args = parser.parse_args()
+    if args.no_cache:
+        set_cache_mode("off")
+
+    rows = load_course_manifest(Path(args.manifest), default_model=args.model)
+    if not rows:
+        raise ValueError("课程清单为空")
+    plan_mode = "fast" if args.fast else "local" if args.local_plan else "llm"
+    for row in rows:
+        row["plan_mode"] = plan_mode
+
+    out_dir = Path(args.out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    checkpoint_path = Path(args.checkpoint) if args.checkpoint else out_dir / "bulk-checkpoint.json"
+    if args.restart and checkpoint_path.exists():
+        checkpoint_path.unlink()
+    template_text, data_template_text = load_templates(
+        BASE_DIR / "templates" / "syllabus_template.md", BASE_DIR / "templates" / "data_template.json"
+    )
+    options = {
+        "out_dir": out_dir,
+        "docs_dir": Path(args.docs_dir),
+        "template_text": template_text,
+        "data_template_text": data_template_text,
+        "marks_template": MARKS_TEMPLATE.read_text(encoding="utf-8"),
+        "chunk_weeks": args.chunk_weeks,
+        "concurrency": args.concurrency,
+        "structured_json": args.structured_json,
+        "incremental": args.regen,
+    }
+
+    started = time.perf_counter()
+    results = run_bulk(rows, options, Checkpoint(checkpoint_path), args.jobs, with_word=not args.no_word)
+    elapsed = round(time.perf_counter() - started, 3)
+    failed = [r for r in results if not r["ok"]]
+    resumed = [r for r in results if r["ok"] and r["skipped"]]
+    tokens = {k: sum(r["tokens"][k] for r in results) for k in ("prompt", "completion", "cached")}
+    report = {"total": len(results), "succeeded": len(results) - len(failed), "failed": len(failed),
+              "resumed": len(resumed), "seconds": elapsed, "tokens": tokens, "courses": results}
+    report_path = out_dir / "bulk-report.json"
+    report_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"[汇总] 共 {len(results)} 门，成功 {report['succeeded']}（其中续跑跳过 {len(resumed)}），失败 {len(failed)}，"
+          f"耗时 {elapsed:.2f}s；报告：{report_path}")
+    cache = get_cache()
+    if cache is not None:
+        st = cache.stats()
+        print(f"LLM 缓存：本次命中 {st['session_hits']}、未命中 {st['session_misses']}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
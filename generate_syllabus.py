@@ -1,13 +1,35 @@
 import os
+import time
 import argparse
+import threading
+import weakref
+import contextvars
+import importlib.util
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Optional
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional
 
-try:
-    from openai import OpenAI
-except ImportError:
-    OpenAI = None  # type: ignore
+from llm_cache import LLMCache, cache_key
+from prompt_schema import render_syllabus_template
+from metrics import record_llm_call, record_llm_hedge, record_llm_retry
+from llm_control import MAX_RETRIES, AdaptiveLimiter, LatencyTracker, backoff_delay, retry_reason
+from startup_profile import profile_startup_requested, run_startup_profile
 
+TEMPERATURE = 0.7
+
+# 响应缓存模式：on（默认，读写缓存）/ off（不使用）/ refresh（跳过读取、重新调用并覆盖写入）
+CACHE_MODES = ("on", "off", "refresh")
+_cache_mode = (os.getenv("LLM_CACHE") or "on").strip().lower()
+_cache: Optional[LLMCache] = None
+
+# 进程内调用方（如 UI 常驻服务）按请求指定的 (api_key, base_url)，优先于环境变量；
+# 使用 contextvars 使并发的线程/协程互不干扰
+_credentials: "contextvars.ContextVar[Optional[tuple]]" = contextvars.ContextVar("llm_credentials", default=None)
+
+# openai（及其 httpx/pydantic 依赖）导入耗时以秒计，仅在首次创建客户端时加载；
+# --help、参数校验失败与缓存命中的调用都不会触发
+_openai_module = None
+_httpx_module = None
 
 DEFAULT_MODULES = [
     "软件测试概论与职业素养",
@@ -25,7 +47,7 @@ def build_prompt(course: str, weeks: int, level: str, modules: Optional[List[str
     modules_text = "\n".join(f"- {i+1}. {m}" for i, m in enumerate(modules or DEFAULT_MODULES))
 
     system = (
-        "你是一名资深职业教育课程负责人，擅长基于岗位能力培养目标设计18周教学大纲。"
+        "你是一名资深职业教育课程负责人，擅长基于岗位能力培养目标设计教学大纲。"
         "请严格按照用户提供的课程信息与模板格式输出内容，语言使用简体中文，表达专业、清晰、可落地。"
     )
 
@@ -37,7 +59,7 @@ def build_prompt(course: str, weeks: int, level: str, modules: Optional[List[str
 
 要求：
 1) 必须严格使用下方模板的结构与标题级别，不得增加或删除字段，不得添加额外说明或前后缀；
-2) 第1-18周按周填充：
+2) 第1-{weeks}周按周填充：
    - 教学模块：填写本周所属的模块名称（模块可跨多周，需在周次之间形成梯度与连贯性）；
    - 教学内容：列出3-6个可操作要点（尽量涵盖“知识+技能+实践”）；
    - 重点：1-3条；
@@ -49,8 +71,7 @@ def build_prompt(course: str, weeks: int, level: str, modules: Optional[List[str
 5) 只输出填充后的模板正文，不要任何多余文字。
 
 模板：
-{template_text}
-"""
+{render_syllabus_template(template_text, weeks)}"""
     return [
         {"role": "system", "content": system},
         {"role": "user", "content": user},
@@ -66,32 +87,683 @@ def render_output_path(course: str, output: Optional[str]) -> Path:
     return out_dir / f"syllabus_{safe_name}.md"
 
 
-def call_llm(messages: List[dict], model: str) -> str:
-    if OpenAI is None:
-        raise RuntimeError("未安装 openai 库。请先运行: pip install -r requirements.txt")
+def _openai():
+    global _openai_module
+    if _openai_module is None:
+        try:
+            import openai
+        except ImportError:
+            raise RuntimeError("未安装 openai 库。请先运行: pip install -r requirements.txt")
+        _openai_module = openai
+    return _openai_module
+
+
+def _httpx():
+    """返回 httpx 模块；未安装时返回 None（此时客户端使用 SDK 默认传输层）。"""
+    global _httpx_module
+    if _httpx_module is None:
+        try:
+            import httpx
+        except ImportError:
+            return None
+        _httpx_module = httpx
+    return _httpx_module
+
+
+def _client_config() -> tuple:
+    _openai()
 
+    override = _credentials.get()
+    if override is not None:
+        return override
     api_key = os.getenv("OPENAI_API_KEY") or os.getenv("DEEPSEEK_API_KEY")
     if not api_key:
         raise RuntimeError("未检测到 OPENAI_API_KEY 或 DEEPSEEK_API_KEY 环境变量，请先配置 API Key。")
+    return api_key, _base_url()
 
+
+def _base_url() -> Optional[str]:
+    override = _credentials.get()
+    if override is not None:
+        return override[1]
     base_url = os.getenv("OPENAI_BASE_URL") or os.getenv("LLM_BASE_URL")
     if not base_url and os.getenv("DEEPSEEK_API_KEY"):
         base_url = "https://api.deepseek.com"
+    return base_url
+
+
+@contextmanager
+def use_credentials(api_key: str, base_url: Optional[str] = None):
+    """在当前上下文内改用给定的 API Key 与 base_url（None 表示 SDK 默认地址），退出后恢复。"""
+    token = _credentials.set((api_key, base_url))
+    try:
+        yield
+    finally:
+        _credentials.reset(token)
+
+
+def set_cache_mode(mode: str) -> None:
+    global _cache_mode
+    if mode not in CACHE_MODES:
+        raise ValueError(f"未知缓存模式: {mode}")
+    _cache_mode = mode
+
+
+def get_cache() -> Optional[LLMCache]:
+    """返回进程内共享的响应缓存；缓存关闭或不可用（如目录只读）时返回 None。"""
+    global _cache
+    if _cache_mode == "off":
+        return None
+    if _cache is None:
+        try:
+            _cache = LLMCache.from_env()
+        except Exception:
+            return None
+    return _cache
 
-    client = OpenAI(api_key=api_key, base_url=base_url) if base_url else OpenAI(api_key=api_key)
-    resp = client.chat.completions.create(
-        model=model,
-        temperature=0.7,
-        messages=messages,
+
+def _cache_lookup(messages: List[dict], model: str, response_format: Optional[dict] = None) -> tuple:
+    """返回 (缓存键, 命中的内容或 None)；缓存关闭时键为 None。"""
+    cache = get_cache()
+    if cache is None:
+        return None, None
+    key = cache_key(model, TEMPERATURE, messages, _base_url(), response_format)
+    if _cache_mode == "refresh":
+        return key, None
+    return key, cache.get(key)
+
+
+def _cache_store(key: Optional[str], model: str, content: str, finish_reason: Optional[str] = None) -> None:
+    # 因长度上限被截断的响应不缓存，否则重试会一直命中同一份残缺内容
+    cache = get_cache()
+    if key and cache is not None and content and finish_reason != "length":
+        cache.put(key, model, content)
+
+
+def discard_cached(messages: List[dict], model: str, response_format: Optional[dict] = None) -> None:
+    """调用方校验响应不合格（JSON 无法解析、结构不符等）时删除其缓存条目。
+
+    重试与之后的运行发送相同的消息，不删除会一直命中同一份不合格的内容。
+    """
+    cache = get_cache()
+    if cache is not None:
+        cache.delete(cache_key(model, TEMPERATURE, messages, _base_url(), response_format))
+
+
+# 按 (base_url, api_key) 复用客户端及其连接池；异步客户端与事件循环绑定，按循环分别缓存
+_CLIENTS: Dict[tuple, "openai.OpenAI"] = {}
+_ASYNC_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[tuple, openai.AsyncOpenAI]]" = weakref.WeakKeyDictionary()
+_CLIENTS_LOCK = threading.Lock()
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def _http_client_kwargs(is_async: bool) -> dict:
+    """连接池、keep-alive、超时与 HTTP/2（安装了 h2 时默认启用）设置，均可由环境变量覆盖。"""
+    read_timeout = _env_float("LLM_TIMEOUT", 600.0)
+    httpx = _httpx()
+    # 重试由本模块的退避与并发控制负责（见 _with_retries），关闭 SDK 自带的重试
+    if httpx is None:
+        return {"timeout": read_timeout, "max_retries": 0}
+    http2_env = (os.getenv("LLM_HTTP2") or "auto").strip().lower()
+    http2 = importlib.util.find_spec("h2") is not None if http2_env == "auto" else http2_env in ("1", "true", "on")
+    limits = httpx.Limits(
+        max_connections=int(_env_float("LLM_MAX_CONNECTIONS", 20)),
+        max_keepalive_connections=int(_env_float("LLM_MAX_KEEPALIVE", 10)),
+        keepalive_expiry=_env_float("LLM_KEEPALIVE_EXPIRY", 120.0),
     )
-    content = resp.choices[0].message.content if resp.choices else ""
-    if not content:
-        raise RuntimeError("模型未返回内容，请稍后重试或调整提示词。")
+    timeout = httpx.Timeout(read_timeout, connect=_env_float("LLM_CONNECT_TIMEOUT", 10.0))
+    http_client_cls = _openai().DefaultAsyncHttpxClient if is_async else _openai().DefaultHttpxClient
+    return {"http_client": http_client_cls(limits=limits, timeout=timeout, http2=http2), "max_retries": 0}
+
+
+def make_client():
+    """返回按 (base_url, api_key) 缓存的同步客户端，连接在多次调用间保持复用。"""
+    api_key, base_url = _client_config()
+    key = (base_url, api_key)
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(key)
+        if client is None:
+            kwargs = _http_client_kwargs(is_async=False)
+            OpenAI = _openai().OpenAI
+            client = OpenAI(api_key=api_key, base_url=base_url, **kwargs) if base_url else OpenAI(api_key=api_key, **kwargs)
+            _CLIENTS[key] = client
+    return client
+
+
+def make_async_client():
+    """返回当前事件循环内按 (base_url, api_key) 缓存的异步客户端；无运行中的循环时创建独立客户端。"""
+    api_key, base_url = _client_config()
+
+    def create():
+        kw = _http_client_kwargs(is_async=True)
+        AsyncOpenAI = _openai().AsyncOpenAI
+        return AsyncOpenAI(api_key=api_key, base_url=base_url, **kw) if base_url else AsyncOpenAI(api_key=api_key, **kw)
+
+    import asyncio
+
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return create()
+    key = (base_url, api_key)
+    with _CLIENTS_LOCK:
+        per_loop = _ASYNC_CLIENTS.setdefault(loop, {})
+        client = per_loop.get(key)
+        if client is None:
+            client = per_loop[key] = create()
+    return client
+
+
+async def aclose_async_clients() -> None:
+    """关闭当前事件循环缓存的异步客户端及其连接池；须在循环结束前调用（见 run_async）。"""
+    import asyncio
+
+    with _CLIENTS_LOCK:
+        clients = list((_ASYNC_CLIENTS.pop(asyncio.get_running_loop(), None) or {}).values())
+    for client in clients:
+        await client.close()
+
+
+def run_async(coro: Awaitable):
+    """代替 asyncio.run：协程结束（含异常）后在同一循环内关闭该循环创建的异步客户端，避免连接随循环泄漏。"""
+    import asyncio
+
+    async def main():
+        try:
+            return await coro
+        finally:
+            await aclose_async_clients()
+
+    return asyncio.run(main())
+
+
+# 结构化输出（response_format）：auto 时按模型选择，json_schema 仅 OpenAI 新模型支持，DeepSeek 支持 json_object
+JSON_MODES = ("auto", "json_schema", "json_object", "off")
+_JSON_SCHEMA_MODEL_PREFIXES = ("gpt-4o", "gpt-4.1", "gpt-5", "o1", "o3", "o4")
+
+
+def json_response_format(model: str, schema: Optional[dict] = None) -> Optional[dict]:
+    """返回要求模型输出 JSON 的 response_format；LLM_JSON_MODE 可强制指定，未知模型在 auto 下不启用。"""
+    mode = (os.getenv("LLM_JSON_MODE") or "auto").strip().lower()
+    if mode == "auto":
+        if schema is not None and model.startswith(_JSON_SCHEMA_MODEL_PREFIXES):
+            mode = "json_schema"
+        elif model.startswith(("deepseek", "gpt") + _JSON_SCHEMA_MODEL_PREFIXES):
+            mode = "json_object"
+        else:
+            return None
+    if mode == "json_schema" and schema is not None:
+        return {"type": "json_schema", "json_schema": schema}
+    if mode in ("json_schema", "json_object"):
+        return {"type": "json_object"}
+    return None
+
+
+def _format_kwargs(response_format: Optional[dict]) -> dict:
+    return {"response_format": response_format} if response_format else {}
+
+
+def _stream_kwargs() -> dict:
+    # 流式响应末尾附带 usage（OpenAI / DeepSeek 均支持）；个别兼容网关不识别时可设 LLM_STREAM_USAGE=0 关闭
+    if (os.getenv("LLM_STREAM_USAGE") or "1").strip().lower() in ("0", "off", "false"):
+        return {}
+    return {"stream_options": {"include_usage": True}}
+
+
+# ---------- 请求控制：退避重试、AIMD 并发上限与对冲请求 ----------
+# 同一账号（base_url + key）共用一个并发上限；延迟分位按模型统计，
+# 流式请求以首个数据块到达为准（首块之后再换请求会重复输出），非流式请求以完整返回为准
+_LATENCY = LatencyTracker()
+_LIMITERS: Dict[tuple, AdaptiveLimiter] = {}
+_hedge_pool = None
+
+
+def _limiter() -> AdaptiveLimiter:
+    api_key, base_url = _client_config()
+    with _CLIENTS_LOCK:
+        limiter = _LIMITERS.get((base_url, api_key))
+        if limiter is None:
+            limiter = _LIMITERS[(base_url, api_key)] = AdaptiveLimiter()
+    return limiter
+
+
+def _hedge_executor():
+    global _hedge_pool
+    with _CLIENTS_LOCK:
+        if _hedge_pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            _hedge_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-hedge")
+    return _hedge_pool
+
+
+class _OpenedStream:
+    """已收到首个数据块的流式响应；close()/aclose() 断开连接并归还并发槽位，可重复调用。"""
+
+    def __init__(self, stream, rest, first, limiter: AdaptiveLimiter):
+        self.stream = stream
+        self._rest = rest
+        self._first = first
+        self._limiter = limiter
+        self._closed = False
+
+    def __iter__(self):
+        if self._first is not None:
+            yield self._first
+        yield from self._rest
+
+    async def __aiter__(self):
+        if self._first is not None:
+            yield self._first
+        async for chunk in self._rest:
+            yield chunk
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self.stream.close()
+        finally:
+            self._limiter.release()
+
+    async def aclose(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            await self.stream.close()
+        finally:
+            self._limiter.release()
+
+
+def _with_retries(call: Callable[[], object], model: str, limiter: AdaptiveLimiter, hold: bool, acquired: bool = False):
+    """占用一个并发槽位执行 call，429/5xx/连接错误按抖动退避重试（最多 LLM_MAX_RETRIES 次）。
+
+    hold=True 时成功后槽位保持占用（流式响应读完后由 _OpenedStream 归还），否则立即归还。
+    """
+    attempt = 0
+    while True:
+        if not acquired:
+            limiter.acquire()
+        acquired = False
+        try:
+            result = call()
+        except Exception as e:
+            limiter.release()
+            reason = retry_reason(e)
+            if reason == "rate_limit":
+                limiter.on_rate_limited()
+            if reason is None or attempt >= MAX_RETRIES:
+                raise
+            record_llm_retry(model, reason)
+            time.sleep(backoff_delay(attempt, e))
+            attempt += 1
+            continue
+        except BaseException:
+            limiter.release()
+            raise
+        limiter.on_success()
+        if not hold:
+            limiter.release()
+        return result
+
+
+def _run_controlled(call: Callable[[], object], model: str, kind: str, limiter: AdaptiveLimiter,
+                    hold: bool, discard: Optional[Callable[[object], None]] = None):
+    """带重试地执行 call；给出 discard（能释放落后者）时，超过 p95 仍未返回且有空闲槽位则发对冲请求。
+
+    两者先成功者胜出，落后者完成后立即交给 discard（关闭流、归还槽位）。同步非流式请求无法中途取消，不做对冲。
+    """
+    from concurrent.futures import FIRST_COMPLETED, wait
+
+    started = time.perf_counter()
+    delay = _LATENCY.hedge_delay(model, kind) if discard is not None else None
+    if delay is None:
+        result = _with_retries(call, model, limiter, hold)
+        _LATENCY.observe(model, kind, time.perf_counter() - started)
+        return result
+
+    pool = _hedge_executor()
+    primary = pool.submit(_with_retries, call, model, limiter, hold)
+    done, _ = wait([primary], timeout=delay)
+    if done or not limiter.try_acquire():
+        result = primary.result()
+        _LATENCY.observe(model, kind, time.perf_counter() - started)
+        return result
+    hedge = pool.submit(_with_retries, call, model, limiter, hold, True)
+    roles = {primary: "primary", hedge: "hedge"}
+    pending, error = set(roles), None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        winners = [f for f in done if f.exception() is None]
+        error = next((f.exception() for f in done if f.exception() is not None), error)
+        if winners:
+            for extra in winners[1:]:
+                discard(extra.result())
+            for loser in pending:
+                loser.add_done_callback(lambda f: discard(f.result()) if f.exception() is None else None)
+            record_llm_hedge(model, roles[winners[0]])
+            _LATENCY.observe(model, kind, time.perf_counter() - started)
+            return winners[0].result()
+    raise error
+
+
+async def _awith_retries(call: Callable[[], Awaitable], model: str, limiter: AdaptiveLimiter,
+                         hold: bool, acquired: bool = False):
+    """_with_retries 的异步版本；任务被取消时同样归还槽位。"""
+    import asyncio
+
+    attempt = 0
+    while True:
+        if not acquired:
+            await limiter.aacquire()
+        acquired = False
+        try:
+            result = await call()
+        except Exception as e:
+            limiter.release()
+            reason = retry_reason(e)
+            if reason == "rate_limit":
+                limiter.on_rate_limited()
+            if reason is None or attempt >= MAX_RETRIES:
+                raise
+            record_llm_retry(model, reason)
+            await asyncio.sleep(backoff_delay(attempt, e))
+            attempt += 1
+            continue
+        except BaseException:
+            limiter.release()
+            raise
+        limiter.on_success()
+        if not hold:
+            limiter.release()
+        return result
+
+
+async def _arun_controlled(call: Callable[[], Awaitable], model: str, kind: str, limiter: AdaptiveLimiter,
+                           hold: bool, discard: Callable[[object], Awaitable]):
+    """_run_controlled 的异步版本：对冲时落后的任务直接取消（断开其连接）。"""
+    import asyncio
+
+    started = time.perf_counter()
+    delay = _LATENCY.hedge_delay(model, kind)
+    if delay is None:
+        result = await _awith_retries(call, model, limiter, hold)
+        _LATENCY.observe(model, kind, time.perf_counter() - started)
+        return result
+
+    primary = asyncio.ensure_future(_awith_retries(call, model, limiter, hold))
+    roles = {primary: "primary"}
+    claimed = set()
+    try:
+        done, _ = await asyncio.wait([primary], timeout=delay)
+        if done or not limiter.try_acquire():
+            claimed.add(primary)
+            result = await primary
+            _LATENCY.observe(model, kind, time.perf_counter() - started)
+            return result
+        hedge = asyncio.ensure_future(_awith_retries(call, model, limiter, hold, acquired=True))
+        roles[hedge] = "hedge"
+        pending, error = set(roles), None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            winners = [t for t in done if t.exception() is None]
+            error = next((t.exception() for t in done if t.exception() is not None), error)
+            if winners:
+                claimed.add(winners[0])
+                record_llm_hedge(model, roles[winners[0]])
+                _LATENCY.observe(model, kind, time.perf_counter() - started)
+                return winners[0].result()
+        raise error
+    finally:
+        for task in roles:
+            if not task.done():
+                task.cancel()
+            elif task not in claimed and not task.cancelled() and task.exception() is None:
+                await discard(task.result())
+
+
+async def _anoop(_result) -> None:
+    return None
+
+
+
+def _open_stream(client, model: str, kwargs: dict) -> _OpenedStream:
+    """发起流式请求并读到首个数据块；首块迟迟未到时按 p95 对冲，落后的流拿到后立即关闭。"""
+    limiter = _limiter()
+
+    def attempt() -> _OpenedStream:
+        stream = client.chat.completions.create(**kwargs)
+        rest = iter(stream)
+        try:
+            first = next(rest, None)
+        except BaseException:
+            stream.close()
+            raise
+        return _OpenedStream(stream, rest, first, limiter)
+
+    return _run_controlled(attempt, model, "first_token", limiter, hold=True, discard=lambda opened: opened.close())
+
+
+async def _aopen_stream(client, model: str, kwargs: dict) -> _OpenedStream:
+    """_open_stream 的异步版本，落后的请求任务直接取消。"""
+    limiter = _limiter()
+
+    async def attempt() -> _OpenedStream:
+        stream = await client.chat.completions.create(**kwargs)
+        rest = stream.__aiter__()
+        try:
+            first = await rest.__anext__()
+        except StopAsyncIteration:
+            first = None
+        except BaseException:
+            await stream.close()
+            raise
+        return _OpenedStream(stream, rest, first, limiter)
+
+    async def discard(opened: _OpenedStream) -> None:
+        await opened.aclose()
+
+    return await _arun_controlled(attempt, model, "first_token", limiter, hold=True, discard=discard)
+
+
+def stream_llm(messages: List[dict], model: str, response_format: Optional[dict] = None) -> Iterator[str]:
+    """流式调用（stream=True），逐段产出模型返回的文本增量；缓存命中时一次性产出全文。
+
+    调用方提前关闭生成器（如增量校验发现输出偏离）时随即断开连接，本次调用记为 aborted，且不写入缓存。
+    """
+    key, cached = _cache_lookup(messages, model, response_format)
+    if cached is not None:
+        record_llm_call(model, 0, "cache_hit")
+        yield cached
+        return
+
+    started = time.perf_counter()
+    usage = None
+    finish_reason = None
+    pieces = []
+    opened = None
+    try:
+        opened = _open_stream(make_client(), model, {
+            "model": model,
+            "temperature": TEMPERATURE,
+            "messages": messages,
+            "stream": True,
+            **_format_kwargs(response_format),
+            **_stream_kwargs(),
+        })
+        for chunk in opened:
+            if getattr(chunk, "usage", None) is not None:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            finish_reason = chunk.choices[0].finish_reason or finish_reason
+            delta = chunk.choices[0].delta.content
+            if delta:
+                pieces.append(delta)
+                yield delta
+        if not pieces:
+            raise RuntimeError("模型未返回内容，请稍后重试或调整提示词。")
+    except GeneratorExit:
+        record_llm_call(model, time.perf_counter() - started, "aborted", usage)
+        raise
+    except Exception:
+        record_llm_call(model, time.perf_counter() - started, "error")
+        raise
+    finally:
+        if opened is not None:
+            opened.close()
+    record_llm_call(model, time.perf_counter() - started, "ok", usage)
+    _cache_store(key, model, "".join(pieces), finish_reason)
+
+
+def call_llm(
+    messages: List[dict],
+    model: str,
+    on_token: Optional[Callable[[str], None]] = None,
+    response_format: Optional[dict] = None,
+) -> str:
+    """调用模型并返回完整文本；传入 on_token 时改用流式调用，每收到一段增量即回调一次。
+
+    on_token 抛出异常时中止本次流式请求（断开连接）并向上抛出。
+    """
+    if on_token is not None:
+        pieces = []
+        stream = stream_llm(messages, model, response_format)
+        try:
+            for delta in stream:
+                pieces.append(delta)
+                on_token(delta)
+        finally:
+            stream.close()
+        return "".join(pieces)
+
+    key, cached = _cache_lookup(messages, model, response_format)
+    if cached is not None:
+        record_llm_call(model, 0, "cache_hit")
+        return cached
+
+    started = time.perf_counter()
+    try:
+        client = make_client()
+        resp = _run_controlled(
+            lambda: client.chat.completions.create(
+                model=model,
+                temperature=TEMPERATURE,
+                messages=messages,
+                **_format_kwargs(response_format),
+            ),
+            model, "complete", _limiter(), hold=False,
+        )
+        content = resp.choices[0].message.content if resp.choices else ""
+        if not content:
+            raise RuntimeError("模型未返回内容，请稍后重试或调整提示词。")
+    except Exception:
+        record_llm_call(model, time.perf_counter() - started, "error")
+        raise
+    record_llm_call(model, time.perf_counter() - started, "ok", resp.usage)
+    _cache_store(key, model, content, resp.choices[0].finish_reason)
     return content
 
 
+async def acall_llm(messages: List[dict], model: str, client=None, response_format: Optional[dict] = None) -> str:
+    """call_llm 的异步版本，便于并发发起多个请求；可传入共享的 AsyncOpenAI 客户端。"""
+    key, cached = _cache_lookup(messages, model, response_format)
+    if cached is not None:
+        record_llm_call(model, 0, "cache_hit")
+        return cached
+
+    started = time.perf_counter()
+    try:
+        client = client or make_async_client()
+        resp = await _arun_controlled(
+            lambda: client.chat.completions.create(
+                model=model,
+                temperature=TEMPERATURE,
+                messages=messages,
+                **_format_kwargs(response_format),
+            ),
+            model, "complete", _limiter(), hold=False, discard=_anoop,
+        )
+        content = resp.choices[0].message.content if resp.choices else ""
+        if not content:
+            raise RuntimeError("模型未返回内容，请稍后重试或调整提示词。")
+    except Exception:
+        record_llm_call(model, time.perf_counter() - started, "error")
+        raise
+    record_llm_call(model, time.perf_counter() - started, "ok", resp.usage)
+    _cache_store(key, model, content, resp.choices[0].finish_reason)
+    return content
+
+
+async def astream_llm(
+    messages: List[dict], model: str, client=None, response_format: Optional[dict] = None
+) -> AsyncIterator[str]:
+    """stream_llm 的异步版本：逐段产出文本增量，期间事件循环可并发处理其它请求。
+
+    与 stream_llm 相同，调用方 aclose() 提前结束时断开连接并记为 aborted。
+    """
+    key, cached = _cache_lookup(messages, model, response_format)
+    if cached is not None:
+        record_llm_call(model, 0, "cache_hit")
+        yield cached
+        return
+
+    started = time.perf_counter()
+    usage = None
+    finish_reason = None
+    pieces = []
+    opened = None
+    try:
+        opened = await _aopen_stream(client or make_async_client(), model, {
+            "model": model,
+            "temperature": TEMPERATURE,
+            "messages": messages,
+            "stream": True,
+            **_format_kwargs(response_format),
+            **_stream_kwargs(),
+        })
+        async for chunk in opened:
+            if getattr(chunk, "usage", None) is not None:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            finish_reason = chunk.choices[0].finish_reason or finish_reason
+            delta = chunk.choices[0].delta.content
+            if delta:
+                pieces.append(delta)
+                yield delta
+        if not pieces:
+            raise RuntimeError("模型未返回内容，请稍后重试或调整提示词。")
+    except GeneratorExit:
+        record_llm_call(model, time.perf_counter() - started, "aborted", usage)
+        raise
+    except Exception:
+        record_llm_call(model, time.perf_counter() - started, "error")
+        raise
+    finally:
+        if opened is not None:
+            await opened.aclose()
+    record_llm_call(model, time.perf_counter() - started, "ok", usage)
+    _cache_store(key, model, "".join(pieces), finish_reason)
+
+
+# --profile-startup 的分析阶段：(阶段名, 在干净解释器中依次执行的语句)
+STARTUP_PHASES = [
+    ("启动（--help / 参数校验）", "import generate_syllabus"),
+    ("首次调用模型（openai 客户端）", "generate_syllabus._openai(); generate_syllabus._httpx()"),
+]
+
+
 def main():
-    parser = argparse.ArgumentParser(description="根据模板与课程信息，调用大模型生成18周教学大纲并输出为Markdown。")
+    parser = argparse.ArgumentParser(description="根据模板与课程信息，调用大模型按周生成教学大纲并输出为Markdown。")
     parser.add_argument("--course", required=True, help="课程名称，例如：软件测试")
     parser.add_argument("--weeks", type=int, default=18, help="总周数，默认18")
     parser.add_argument("--level", default="高职学生", help="学习者层级/对象，默认：高职学生")
@@ -103,7 +775,7 @@ def main():
     parser.add_argument(
         "--template",
         default=str(Path("templates") / "syllabus_template.md"),
-        help="模板文件路径（Markdown）",
+        help="模板文件路径（Markdown，描述单周结构）",
     )
     parser.add_argument(
         "--model", default="deepseek-chat", help="OpenAI/DeepSeek 模型名，如 deepseek-chat / gpt-4o-mini 等"
@@ -111,7 +783,11 @@ def main():
     parser.add_argument(
         "--output", default="", help="输出Markdown文件路径，缺省为 output/syllabus_<课程名>.md"
     )
+    parser.add_argument("--profile-startup", action="store_true", help="分析启动与按需加载依赖的导入耗时后退出")
 
+    if profile_startup_requested():
+        run_startup_profile(Path(__file__).resolve().parent, STARTUP_PHASES)
+        return
     args = parser.parse_args()
 
     template_path = Path(args.template)
@@ -139,4 +815,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,158 @@
+"""
+大模型响应的本地持久缓存（SQLite）。
+
+以 (模型, 温度, base_url, 消息, 输出格式) 的哈希作为内容地址；按最近访问时间做 LRU 淘汰，
+同时受条目数、总字节数与最大存活时间约束；记录命中/未命中统计。
+仅使用标准库，多进程/多线程下每次操作独立连接（用完即关闭），依赖 SQLite 自身的锁。
+"""
+
+import os
+import json
+import time
+import hashlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+DEFAULT_CACHE_PATH = Path(__file__).parent / ".cache" / "llm_cache.sqlite"
+DEFAULT_MAX_ENTRIES = 500
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+DEFAULT_MAX_AGE_SECONDS = 30 * 24 * 3600
+
+
+def cache_key(
+    model: str,
+    temperature: float,
+    messages: List[dict],
+    base_url: Optional[str] = None,
+    response_format: Optional[dict] = None,
+) -> str:
+    fields = {"model": model, "temperature": temperature, "base_url": base_url or "", "messages": messages}
+    # 结构化输出与普通请求即使消息相同也是不同的响应；未指定时不加入，已有条目的键保持不变
+    if response_format:
+        fields["response_format"] = response_format
+    payload = json.dumps(fields, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_age_seconds: float = DEFAULT_MAX_AGE_SECONDS,
+    ):
+        self.path = Path(path or DEFAULT_CACHE_PATH)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        # 本进程内的统计；累计统计持久化在 stats 表中
+        self.hits = 0
+        self.misses = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, model TEXT, content TEXT, size INTEGER,"
+                " created REAL, last_access REAL, hits INTEGER DEFAULT 0)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_access ON responses(last_access)")
+            conn.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER)")
+
+    @classmethod
+    def from_env(cls) -> "LLMCache":
+        """按环境变量 LLM_CACHE_PATH / LLM_CACHE_MAX_ENTRIES / LLM_CACHE_MAX_MB / LLM_CACHE_MAX_AGE_DAYS 构造。"""
+        return cls(
+            path=Path(os.getenv("LLM_CACHE_PATH") or DEFAULT_CACHE_PATH),
+            max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES") or DEFAULT_MAX_ENTRIES),
+            max_bytes=int(float(os.getenv("LLM_CACHE_MAX_MB") or DEFAULT_MAX_BYTES / 1024 / 1024) * 1024 * 1024),
+            max_age_seconds=float(os.getenv("LLM_CACHE_MAX_AGE_DAYS") or DEFAULT_MAX_AGE_SECONDS / 86400) * 86400,
+        )
+
+    @contextmanager
+    def _connect(self) -> Iterator["sqlite3.Connection"]:
+        """打开一个连接：正常退出时提交、异常时回滚，随后关闭（sqlite3 连接自身的 with 只提交不关闭）。"""
+        # 首次读写缓存时才导入 sqlite3，--help 等不访问缓存的路径不承担其导入耗时
+        import sqlite3
+
+        conn = sqlite3.connect(str(self.path), timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _bump(self, conn: "sqlite3.Connection", name: str) -> None:
+        conn.execute(
+            "INSERT INTO stats(name, value) VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT content, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > self.max_age_seconds:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self.misses += 1
+                self._bump(conn, "misses")
+                return None
+            conn.execute(
+                "UPDATE responses SET last_access = ?, hits = hits + 1 WHERE key = ?", (now, key)
+            )
+            self.hits += 1
+            self._bump(conn, "hits")
+            return row[0]
+
+    def put(self, key: str, model: str, content: str) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses(key, model, content, size, created, last_access, hits)"
+                " VALUES (?, ?, ?, ?, ?, ?, 0)",
+                (key, model, content, len(content.encode("utf-8")), now, now),
+            )
+            self._evict(conn, now)
+
+    def delete(self, key: str) -> None:
+        """删除一个条目（调用方判定响应不合格时），之后的同一请求会重新调用模型。"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def _evict(self, conn: "sqlite3.Connection", now: float) -> None:
+        conn.execute("DELETE FROM responses WHERE created < ?", (now - self.max_age_seconds,))
+        total_entries = total_bytes = 0
+        stale: List[str] = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_access DESC"):
+            total_entries += 1
+            total_bytes += size
+            if total_entries > self.max_entries or total_bytes > self.max_bytes:
+                stale.append(key)
+        if stale:
+            conn.executemany("DELETE FROM responses WHERE key = ?", [(k,) for k in stale])
+            conn.execute(
+                "INSERT INTO stats(name, value) VALUES ('evictions', ?)"
+                " ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                (len(stale),),
+            )
+
+    def stats(self) -> dict:
+        with self._connect() as conn:
+            totals = dict(conn.execute("SELECT name, value FROM stats").fetchall())
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {
+            "session_hits": self.hits,
+            "session_misses": self.misses,
+            "total_hits": totals.get("hits", 0),
+            "total_misses": totals.get("misses", 0),
+            "evictions": totals.get("evictions", 0),
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def clear(self) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM responses")
@@ -0,0 +1,155 @@
+"""
+大模型请求控制：延迟分位统计、对冲请求的触发时机、带抖动的退避重试与 AIMD 自适应并发。
+
+- LatencyTracker：按 (模型, 类型) 保存最近的成功请求耗时，给出 p95 等分位；
+  样本足够时，超过该分位仍未返回的请求会追加一个对冲副本，先返回者胜出、另一个随即取消；
+- AdaptiveLimiter：限制同一账号（base_url + key）同时进行的请求数，成功时缓慢增加上限，
+  遇到 429 时减半（加性增、乘性减），使批量运行贴着服务商的限流阈值而不反复触发；
+- retry_reason / backoff_delay：429、5xx 与连接类错误按“全抖动”指数退避重试，优先遵循 Retry-After。
+不依赖 openai，仅使用标准库。
+"""
+
+import os
+import time
+import random
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+HEDGE_ENABLED = (os.getenv("LLM_HEDGE") or "on").strip().lower() not in ("0", "off", "false")
+HEDGE_QUANTILE = _env_float("LLM_HEDGE_QUANTILE", 0.95)
+# 分位估计所需的最少样本数；不足时不发对冲请求
+HEDGE_MIN_SAMPLES = int(_env_float("LLM_HEDGE_MIN_SAMPLES", 20))
+MAX_RETRIES = int(_env_float("LLM_MAX_RETRIES", 4))
+BACKOFF_BASE = _env_float("LLM_BACKOFF_BASE", 1.0)
+BACKOFF_CAP = _env_float("LLM_BACKOFF_CAP", 60.0)
+CONCURRENCY_INITIAL = _env_float("LLM_CONCURRENCY_INITIAL", 4)
+CONCURRENCY_MAX = _env_float("LLM_CONCURRENCY_MAX", 16)
+# 一次限流后在该时间内的其它 429 视为同一次拥塞，只减半一次
+DECREASE_COOLDOWN = 2.0
+
+
+class LatencyTracker:
+    """按 (模型, 类型) 记录最近 window 次成功请求的耗时（秒）；类型如 first_token / complete。"""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[Tuple[str, str], Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, model: str, kind: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault((model, kind), deque(maxlen=self.window)).append(seconds)
+
+    def quantile(self, model: str, kind: str, q: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get((model, kind), ()))
+        if len(samples) < max(1, HEDGE_MIN_SAMPLES):
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def hedge_delay(self, model: str, kind: str) -> Optional[float]:
+        """超过该时长仍未返回即发对冲请求；未启用或样本不足时返回 None。"""
+        if not HEDGE_ENABLED:
+            return None
+        return self.quantile(model, kind, HEDGE_QUANTILE)
+
+
+class AdaptiveLimiter:
+    """AIMD 并发上限：成功一次 limit += 1/limit（约每轮满并发 +1），遇到限流 limit 减半。
+
+    同时支持线程（acquire）与协程（aacquire）等待；try_acquire 不等待，供对冲请求使用，
+    保证对冲副本也不突破当前上限。
+    """
+
+    def __init__(self, initial: float = CONCURRENCY_INITIAL, maximum: float = CONCURRENCY_MAX, minimum: float = 1):
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.limit = min(self.maximum, max(minimum, initial))
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def try_acquire(self) -> bool:
+        with self._cond:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    async def aacquire(self) -> None:
+        import asyncio
+
+        # 与线程共用同一计数，协程侧以短间隔轮询，避免阻塞事件循环
+        while not self.try_acquire():
+            await asyncio.sleep(0.05)
+
+    def release(self) -> None:
+        with self._cond:
+            self.in_flight = max(0, self.in_flight - 1)
+            self._cond.notify_all()
+
+    def on_success(self) -> None:
+        with self._cond:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def on_rate_limited(self) -> None:
+        with self._cond:
+            now = time.monotonic()
+            if now - self._last_decrease >= DECREASE_COOLDOWN:
+                self.limit = max(self.minimum, self.limit / 2)
+                self._last_decrease = now
+
+
+def retry_reason(exc: BaseException) -> Optional[str]:
+    """值得重试的错误返回原因 rate_limit（429）/ server（5xx）/ connection（连接或超时），否则返回 None。
+
+    按状态码与异常类名判断，不导入 openai。
+    """
+    status = getattr(exc, "status_code", None)
+    if status == 429:
+        return "rate_limit"
+    if isinstance(status, int) and status >= 500:
+        return "server"
+    names = {cls.__name__ for cls in type(exc).__mro__}
+    if names & {"APIConnectionError", "APITimeoutError"}:
+        return "connection"
+    return None
+
+
+def _retry_after(exc: Optional[BaseException]) -> Optional[float]:
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+def backoff_delay(attempt: int, exc: Optional[BaseException] = None) -> float:
+    """第 attempt 次重试（从 0 计）前的等待秒数：全抖动指数退避，服务端给出 Retry-After 时不短于它。"""
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+    retry_after = _retry_after(exc)
+    if retry_after is not None:
+        delay = max(delay, min(BACKOFF_CAP, retry_after))
+    return delay
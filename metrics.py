@@ -0,0 +1,211 @@
+"""
+生成流程的运行指标：阶段耗时、大模型调用耗时与 token 用量。
+
+- 进程级累计指标（计数器 / 直方图），可按 Prometheus 文本格式导出（UI 的 /metrics）；
+- 单次运行记录（RunRecorder），通过 contextvars 与当前任务绑定，供结果页展示本次运行摘要。
+仅使用标准库。
+"""
+
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# 秒级直方图分桶：覆盖从毫秒级的文档处理到数分钟的大模型调用
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+INF_LABEL = 'le="+Inf"'
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels_text(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{k}="{_escape(v)}"' for k, v in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels_text(self.labelnames, key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # 每组标签：[各桶计数..., 总和, 总数]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            state = self._values.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                labels = _labels_text(self.labelnames, key)
+                for bound, count in zip(self.buckets, state):
+                    le = 'le="%g"' % bound
+                    lines.append(f"{self.name}_bucket{_labels_text(self.labelnames, key, le)} {count:g}")
+                inf_labels = _labels_text(self.labelnames, key, INF_LABEL)
+                lines.append(f"{self.name}_bucket{inf_labels} {state[-1]:g}")
+                lines.append(f"{self.name}_sum{labels} {state[-2]:.6f}")
+                lines.append(f"{self.name}_count{labels} {state[-1]:g}")
+        return lines
+
+
+REGISTRY: List[object] = []
+
+STAGE_SECONDS = Histogram("course_stage_seconds", "各生成阶段耗时（秒）", ("stage",))
+LLM_REQUEST_SECONDS = Histogram("course_llm_request_seconds", "单次大模型请求耗时（秒）", ("model", "outcome"))
+LLM_REQUESTS = Counter("course_llm_requests_total", "大模型请求次数（outcome: ok/error/aborted/cache_hit）", ("model", "outcome"))
+LLM_RETRIES = Counter("course_llm_retries_total", "大模型请求退避重试次数（reason: rate_limit/server/connection）", ("model", "reason"))
+LLM_HEDGES = Counter("course_llm_hedges_total", "对冲请求次数（winner: primary/hedge，先返回的一方）", ("model", "winner"))
+LLM_TOKENS = Counter("course_llm_tokens_total", "大模型 token 用量（kind: prompt/completion/cached）", ("model", "kind"))
+RUNS = Counter("course_runs_total", "生成任务次数（outcome: done/failed）", ("outcome",))
+RUN_SECONDS = Histogram("course_run_seconds", "单个生成任务总耗时（秒）", ("outcome",))
+
+
+def render_prometheus() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class RunRecorder:
+    """单次运行的阶段耗时与大模型调用明细。"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.stages: List[dict] = []
+        self.llm_calls: List[dict] = []
+        self._lock = threading.Lock()
+
+    def add_stage(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.stages.append({"stage": stage, "seconds": round(seconds, 3)})
+
+    def add_llm_call(self, call: dict) -> None:
+        with self._lock:
+            self.llm_calls.append(call)
+
+    def summary(self) -> dict:
+        with self._lock:
+            stages: Dict[str, float] = {}
+            for item in self.stages:
+                stages[item["stage"]] = round(stages.get(item["stage"], 0) + item["seconds"], 3)
+            tokens = {"prompt": 0, "completion": 0, "cached": 0}
+            outcomes: Dict[str, int] = {}
+            for call in self.llm_calls:
+                for kind in tokens:
+                    tokens[kind] += call.get(f"{kind}_tokens") or 0
+                outcomes[call["outcome"]] = outcomes.get(call["outcome"], 0) + 1
+            return {
+                "seconds": round(time.time() - self.started, 3),
+                "stages": stages,
+                "llm_requests": outcomes,
+                "llm_seconds": round(sum(c["seconds"] for c in self.llm_calls), 3),
+                "tokens": tokens,
+                "models": sorted({c["model"] for c in self.llm_calls}),
+            }
+
+
+_current_run: "contextvars.ContextVar[Optional[RunRecorder]]" = contextvars.ContextVar("run_recorder", default=None)
+
+
+@contextmanager
+def record_run() -> Iterator[RunRecorder]:
+    """在当前上下文（线程 / 协程）内收集本次运行的指标。"""
+    recorder = RunRecorder()
+    token = _current_run.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current_run.reset(token)
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    recorder = _current_run.get()
+    if recorder is not None:
+        recorder.add_stage(stage, seconds)
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
+
+
+def usage_tokens(usage) -> Dict[str, int]:
+    """从 SDK 的 usage 对象中取 prompt/completion/cached token 数（兼容 OpenAI 与 DeepSeek 的字段）。"""
+    if usage is None:
+        return {"prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None) if details is not None else None
+    if cached is None:
+        cached = getattr(usage, "prompt_cache_hit_tokens", None)
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        "cached_tokens": cached or 0,
+    }
+
+
+def record_llm_call(model: str, seconds: float, outcome: str, usage=None) -> None:
+    """记录一次大模型调用；outcome 为 ok / error / aborted（调用方中途中止）/ cache_hit（本地响应缓存命中）。"""
+    tokens = usage_tokens(usage)
+    LLM_REQUESTS.inc(model=model, outcome=outcome)
+    if outcome != "cache_hit":
+        LLM_REQUEST_SECONDS.observe(seconds, model=model, outcome=outcome)
+    for kind in ("prompt", "completion", "cached"):
+        if tokens[f"{kind}_tokens"]:
+            LLM_TOKENS.inc(tokens[f"{kind}_tokens"], model=model, kind=kind)
+    recorder = _current_run.get()
+    if recorder is not None:
+        recorder.add_llm_call({"model": model, "seconds": round(seconds, 3), "outcome": outcome, **tokens})
+
+
+def record_llm_retry(model: str, reason: str) -> None:
+    LLM_RETRIES.inc(model=model, reason=reason)
+
+
+def record_llm_hedge(model: str, winner: str) -> None:
+    LLM_HEDGES.inc(model=model, winner=winner)
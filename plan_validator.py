@@ -0,0 +1,217 @@
+"""
+教案 JSON 的流式增量校验。
+
+边接收模型输出边做词法切分与结构检查（“周次”数组、每周条目的键、“周”的序号与数量），
+一旦输出偏离教案结构即抛出 ValueError，调用方可立刻中止该次请求并重试，
+不必等完整（也是最慢的）一次生成结束后才发现 JSON 不合格。
+允许前置的代码围栏或少量说明文字，根对象结束后的内容忽略（与 ensure_pure_json 一致）。仅使用标准库。
+"""
+
+import json
+from typing import List, Optional
+
+# 根对象之前最多容忍的前置字符（如 ```json 围栏或一句说明）
+MAX_PREAMBLE_CHARS = 200
+
+_SCALAR_CHARS = set("+-0123456789.eEtruefalsn")
+_DELIMITERS = set(",:{}[] \t\r\n")
+
+
+def _decode_string(raw: str) -> str:
+    """解码 JSON 字符串内容（不含两侧引号）中的转义：\\uXXXX（含代理对）与 \\n \\t \\" 等。"""
+    try:
+        return json.loads(f'"{raw}"')
+    except ValueError:
+        raise ValueError(f"非法 JSON 字符串：{raw[:40]}") from None
+
+
+class PlanStreamValidator:
+    """按增量喂入文本，校验其是否仍可能成为合格的教案 JSON。
+
+    week_numbers 为本次应输出的周序号（整体生成为 1..N，分片为其中一段）；
+    week_fields 为每周条目除“周”以外的字段。根对象允许“授课科目”“总周数”“周次”，只要求“周次”
+    （分片请求的返回常常也带上表头字段，由调用方忽略即可）。
+    """
+
+    ROOT_KEYS = ("授课科目", "总周数", "周次")
+
+    def __init__(self, week_numbers: List[int], week_fields: List[str]):
+        self.week_numbers = list(week_numbers)
+        self.week_fields = list(week_fields)
+        self.done = False
+        self._started = False
+        self._preamble = 0
+        self._stack: List[dict] = []
+        self._string: Optional[List[str]] = None
+        self._escape = False
+        self._scalar: Optional[List[str]] = None
+
+    # ---------- 词法 ----------
+
+    def feed(self, delta: str) -> None:
+        for ch in delta:
+            if self.done:
+                return
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._token("{")
+                    continue
+                self._preamble += 1
+                if self._preamble > MAX_PREAMBLE_CHARS:
+                    raise ValueError("输出开头不是 JSON 对象")
+                continue
+            if self._string is not None:
+                # 字符串原样（含转义序列）缓存到闭合引号，再整体解码，转义被分片切开也无妨
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    raw, self._string = "".join(self._string), None
+                    self._token("str", _decode_string(raw))
+                    continue
+                self._string.append(ch)
+                continue
+            if self._scalar is not None:
+                if ch not in _DELIMITERS:
+                    if ch not in _SCALAR_CHARS:
+                        raise ValueError(f"非法 JSON 字面量：{''.join(self._scalar) + ch}")
+                    self._scalar.append(ch)
+                    continue
+                self._end_scalar()
+            if ch in " \t\r\n":
+                continue
+            if ch == '"':
+                self._string = []
+            elif ch in "{}[]:,":
+                self._token(ch)
+            elif ch in _SCALAR_CHARS:
+                self._scalar = [ch]
+            else:
+                raise ValueError(f"非法 JSON 字符：{ch!r}")
+
+    def close(self) -> None:
+        """流结束时调用：JSON 未闭合或内容不足时抛出 ValueError。"""
+        if self._scalar is not None and not self.done:
+            self._end_scalar()
+        if not self.done:
+            raise ValueError("JSON 不完整（输出被截断）")
+
+    def _end_scalar(self) -> None:
+        raw, self._scalar = "".join(self._scalar), None
+        if raw not in ("true", "false", "null"):
+            try:
+                float(raw)
+            except ValueError:
+                raise ValueError(f"非法 JSON 字面量：{raw}") from None
+        self._token("scalar", raw)
+
+    # ---------- 结构 ----------
+
+    def _token(self, kind: str, value: str = "") -> None:
+        if not self._stack:
+            if kind != "{":
+                raise ValueError("根节点应为 JSON 对象")
+            self._stack.append({"kind": "obj", "role": "root", "state": "key_or_end", "keys": set(), "key": None})
+            return
+        frame = self._stack[-1]
+        if frame["kind"] == "obj":
+            self._object_token(frame, kind, value)
+        else:
+            self._array_token(frame, kind, value)
+
+    def _object_token(self, frame: dict, kind: str, value: str) -> None:
+        state = frame["state"]
+        if state in ("key", "key_or_end"):
+            if kind == "}" and state == "key_or_end":
+                self._close_object(frame)
+            elif kind == "str":
+                self._check_key(frame, value)
+                frame["keys"].add(value)
+                frame["key"] = value
+                frame["state"] = "colon"
+            else:
+                raise ValueError("对象中应为键名")
+        elif state == "colon":
+            if kind != ":":
+                raise ValueError(f"键 “{frame['key']}” 后应为冒号")
+            frame["state"] = "value"
+        elif state == "value":
+            self._value(frame, frame["key"], kind, value)
+        elif state == "comma_or_end":
+            if kind == ",":
+                frame["state"] = "key"
+            elif kind == "}":
+                self._close_object(frame)
+            else:
+                raise ValueError("对象成员之间应为逗号")
+
+    def _array_token(self, frame: dict, kind: str, value: str) -> None:
+        state = frame["state"]
+        if state == "value_or_end" and kind == "]":
+            self._close_array(frame)
+        elif state in ("value", "value_or_end"):
+            self._value(frame, None, kind, value)
+        elif kind == ",":
+            frame["state"] = "value"
+        elif kind == "]":
+            self._close_array(frame)
+        else:
+            raise ValueError("数组元素之间应为逗号")
+
+    def _check_key(self, frame: dict, key: str) -> None:
+        if key in frame["keys"]:
+            raise ValueError(f"重复的键：{key}")
+        if frame["role"] == "root" and key not in self.ROOT_KEYS:
+            raise ValueError(f"根对象中出现未知键：{key}")
+        if frame["role"] == "week" and key != "周" and key not in self.week_fields:
+            raise ValueError(f"第{frame['week']}周条目中出现未知键：{key}")
+
+    def _value(self, frame: dict, key: Optional[str], kind: str, value: str) -> None:
+        """校验一个值的开始（容器）或整体（标量），并推进所在容器的状态。"""
+        role = frame["role"]
+        if role == "root" and key == "周次":
+            if kind != "[":
+                raise ValueError("“周次”应为数组")
+            frame["state"] = "comma_or_end"
+            self._stack.append({"kind": "arr", "role": "weeks", "state": "value_or_end", "count": 0})
+            return
+        if role == "weeks":
+            if kind != "{":
+                raise ValueError("“周次”数组的元素应为对象")
+            index = frame["count"]
+            if index >= len(self.week_numbers):
+                raise ValueError(f"“周次”超过应有的 {len(self.week_numbers)} 项")
+            frame["count"] += 1
+            frame["state"] = "comma_or_end"
+            self._stack.append({"kind": "obj", "role": "week", "state": "key_or_end", "keys": set(), "key": None,
+                                "week": self.week_numbers[index]})
+            return
+        if kind not in ("str", "scalar"):
+            where = f"第{frame['week']}周的 “{key}”" if role == "week" else f"“{key}”"
+            raise ValueError(f"{where} 应为字符串或数字")
+        if role == "week" and key == "周":
+            try:
+                number = int(float(value))
+            except ValueError:
+                raise ValueError(f"“周”应为数字：{value}") from None
+            if number != frame["week"]:
+                raise ValueError(f"周序号不符：应为 {frame['week']}，实际为 {number}")
+        frame["state"] = "comma_or_end"
+
+    def _close_object(self, frame: dict) -> None:
+        self._stack.pop()
+        if frame["role"] == "week":
+            missing = [k for k in self.week_fields if k not in frame["keys"]]
+            if missing:
+                raise ValueError(f"第{frame['week']}周缺少字段：{', '.join(missing)}")
+        elif frame["role"] == "root":
+            if "周次" not in frame["keys"]:
+                raise ValueError("缺少 “周次” 数组")
+            self.done = True
+
+    def _close_array(self, frame: dict) -> None:
+        self._stack.pop()
+        if frame["count"] != len(self.week_numbers):
+            raise ValueError(f"“周次”应为 {len(self.week_numbers)} 项，实际为 {frame['count']} 项")
@@ -0,0 +1,80 @@
+"""
+由单周结构生成任意周数的紧凑提示词模板。
+
+templates/syllabus_template.md 与 templates/data_template.json 只描述一周的结构（字段一处定义）：
+- 大纲：模板头 + 一个“### 第{周}周”示例块，按总周数 N 生成“一个完整示例块 + 其余周次的标题约定”；
+- 教案 JSON：只给出含一项的“周次”示例与长度/周序说明，不再携带 N 个空对象；
+  另提供对应的 JSON Schema，供支持 json_schema 的模型约束输出。
+兼容旧版按 18 周展开的模板：只取其中第一周的结构。仅使用标准库。
+"""
+
+import re
+import json
+from typing import List, Tuple
+
+WEEK_PLACEHOLDER = "{周}"
+WEEKS_PLACEHOLDER = "{总周数}"
+
+# 匹配 “### 第1周” 或 “### 第{周}周” 形式的周标题
+_WEEK_BLOCK_RE = re.compile(r"^#{2,4}\s*第\s*(?:\d+|\{周\})\s*周.*$", re.M)
+# 旧版模板头中写死的周数，如 “教学内容规划（18周）”
+_HEAD_WEEKS_RE = re.compile(r"（\s*\d+\s*周\s*）")
+
+
+def split_syllabus_template(template_text: str) -> Tuple[str, str]:
+    """拆出 (模板头, 单周示例块)；示例块中的周次统一替换为 {周}。"""
+    matches = list(_WEEK_BLOCK_RE.finditer(template_text))
+    if not matches:
+        raise ValueError("大纲模板中没有 “### 第N周” 形式的周标题")
+    head = template_text[:matches[0].start()].rstrip()
+    end = matches[1].start() if len(matches) > 1 else len(template_text)
+    block = template_text[matches[0].start():end].strip()
+    heading, _, body = block.partition("\n")
+    heading = re.sub(r"第\s*(?:\d+|\{周\})\s*周", f"第{WEEK_PLACEHOLDER}周", heading, count=1)
+    head = _HEAD_WEEKS_RE.sub(f"（{WEEKS_PLACEHOLDER}周）", head)
+    return head, f"{heading}\n{body}".rstrip()
+
+
+def render_syllabus_template(template_text: str, weeks: int) -> str:
+    """生成 N 周的紧凑大纲模板：第1周给出完整字段，其余周次只说明标题与结构相同。"""
+    head, block = split_syllabus_template(template_text)
+    heading = block.split("\n", 1)[0]
+    parts = [head.replace(WEEKS_PLACEHOLDER, str(weeks)), block.replace(WEEK_PLACEHOLDER, "1")]
+    if weeks > 1:
+        first = heading.replace(WEEK_PLACEHOLDER, "2")
+        last = heading.replace(WEEK_PLACEHOLDER, str(weeks))
+        parts.append(
+            f"（第2周至第{weeks}周依次重复上述结构，标题从 “{first}” 到 “{last}”，"
+            f"共 {weeks} 个周次块，字段与顺序同第1周）"
+        )
+    return "\n\n".join(p for p in parts if p) + "\n"
+
+
+def plan_week_fields(data_template_text: str) -> List[str]:
+    """教案 JSON 模板中每周条目的字段（不含“周”），顺序即输出顺序。"""
+    data = json.loads(data_template_text)
+    items = data.get("周次") if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items or not isinstance(items[0], dict):
+        raise ValueError("教案 JSON 模板中缺少 “周次” 示例条目")
+    return [k for k in items[0] if k != "周"]
+
+
+def render_plan_schema(data_template_text: str, weeks: int, first_week: int = 1) -> str:
+    """生成只含一项“周次”示例的教案 JSON 结构说明。"""
+    example = {"授课科目": "", "总周数": weeks, "周次": [{"周": first_week, **{k: "" for k in plan_week_fields(data_template_text)}}]}
+    return json.dumps(example, ensure_ascii=False)
+
+
+def plan_json_schema(week_fields: List[str], with_header: bool = True) -> dict:
+    """教案 JSON 的 JSON Schema（OpenAI response_format=json_schema 的 strict 形式）；分片请求不含表头字段。"""
+    week = {
+        "type": "object",
+        "properties": {"周": {"type": "integer"}, **{k: {"type": "string"} for k in week_fields}},
+        "required": ["周", *week_fields],
+        "additionalProperties": False,
+    }
+    properties = {"周次": {"type": "array", "items": week}}
+    if with_header:
+        properties = {"授课科目": {"type": "string"}, "总周数": {"type": "integer"}, **properties}
+    schema = {"type": "object", "properties": properties, "required": list(properties), "additionalProperties": False}
+    return {"name": "lesson_plan" if with_header else "lesson_plan_weeks", "strict": True, "schema": schema}
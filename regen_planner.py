@@ -0,0 +1,148 @@
+"""
+按周增量重新生成的范围判定：比较上次与本次的课程输入，找出受影响的周次。
+
+- 排除项：大纲段落或教案条目中出现（本次的）排除关键词的周次；
+- 教学模块：上次模块清单中被删除/改名的模块所覆盖的周次；改名按位置与新增模块一一对应，
+  作为这些周的新模块；只删除时由模型在现有模块中就近归属；
+- 周数、开课对象或功能说明（整体导向）改变、新增模块多于删除模块（需重新分配周次）、
+  或受影响周次过多时，判定为需要完整重新生成。
+上次的输入记录缺失时，以大纲中各周“教学模块”出现的顺序作为上次的模块清单。仅使用标准库。
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from syllabus_parser import parse_week_section
+
+# 受影响周次超过该比例时完整重新生成更划算（上下文与拼接的开销不再值得）
+MAX_AFFECTED_RATIO = 0.6
+# 比较整体输入时关注的字段；parts / excludes 另行按周判定
+GLOBAL_FIELDS = ("weeks", "level", "features")
+
+_MODULE_PREFIX_RE = re.compile(r"^(?:模块\s*[0-9一二三四五六七八九十]+\s*[：:、.\s]*|[0-9]+\s*[.、）)]\s*)")
+_PUNCT_RE = re.compile(r"[\s，,。.;；：:、（）()“”\"'《》]+")
+
+
+@dataclass
+class RegenPlan:
+    """affected：{周次: [原因...]}；modules：{周次: 该周应归属的模块}（模块已删除的周次不在其中，由模型选择）；
+    full：需完整重新生成时的原因。
+    """
+
+    affected: Dict[int, List[str]] = field(default_factory=dict)
+    modules: Dict[int, str] = field(default_factory=dict)
+    full: Optional[str] = None
+
+    def add(self, week: int, reason: str) -> None:
+        reasons = self.affected.setdefault(week, [])
+        if reason not in reasons:
+            reasons.append(reason)
+
+    @property
+    def weeks(self) -> List[int]:
+        return sorted(self.affected)
+
+
+def normalize_module(name: str) -> str:
+    """去掉“模块1：”“1.”等编号与标点后比较模块名；只有编号（如“模块1”）时保留编号。"""
+    stripped = _PUNCT_RE.sub("", _MODULE_PREFIX_RE.sub("", name.strip()))
+    return (stripped or _PUNCT_RE.sub("", name)).lower()
+
+
+def match_module(text: str, modules: List[str]) -> Optional[int]:
+    """返回 text 对应的模块下标：先比较规范化后的全名，再按包含关系取最长的匹配。"""
+    norm = normalize_module(text)
+    if not norm:
+        return None
+    names = [normalize_module(m) for m in modules]
+    for i, name in enumerate(names):
+        if name == norm:
+            return i
+    candidates = [(len(name), i) for i, name in enumerate(names) if name and (name in norm or norm in name)]
+    return max(candidates)[1] if candidates else None
+
+
+def week_modules(sections: Dict[int, str]) -> Dict[int, str]:
+    """各周大纲段落中的“教学模块”（缺省取标题名称）。"""
+    result = {}
+    for n, md in sections.items():
+        fields = parse_week_section(md)
+        title = (fields.get("教学模块") or fields.get("标题") or [""])[0]
+        if title:
+            result[n] = title
+    return result
+
+
+def plan_regeneration(
+    sections: Dict[int, str],
+    plan_items: Dict[int, dict],
+    old_inputs: Optional[dict],
+    new_inputs: dict,
+) -> RegenPlan:
+    """sections 为上次大纲的 {周次: 段落}，plan_items 为上次教案 JSON 的 {周次: 条目}；
+
+    new_inputs / old_inputs 含 weeks、level、features、parts（实际使用的模块清单）、excludes。
+    """
+    plan = RegenPlan()
+    weeks = int(new_inputs["weeks"])
+    missing = [n for n in range(1, weeks + 1) if n not in sections or n not in plan_items]
+    if missing:
+        plan.full = f"上次的大纲或教案 JSON 缺少第{'、'.join(map(str, missing[:5]))}周"
+        return plan
+    if old_inputs is not None:
+        changed = [k for k in GLOBAL_FIELDS if (old_inputs.get(k) or None) != (new_inputs.get(k) or None)]
+        if changed:
+            plan.full = f"整体输入（{'、'.join(changed)}）已改变"
+            return plan
+
+    # 排除项命中：本次的每个排除词都检查，旧输出可能早于该排除词
+    for keyword in new_inputs.get("excludes") or []:
+        needle = keyword.lower()
+        for n in range(1, weeks + 1):
+            text = (sections[n] + "\n" + "\n".join(str(v) for v in plan_items[n].values())).lower()
+            if needle and needle in text:
+                plan.add(n, f"包含排除项“{keyword}”")
+
+    # 教学模块：删除/改名的旧模块所覆盖的周次
+    assigned = week_modules(sections)
+    if old_inputs is not None and old_inputs.get("parts"):
+        old_parts = list(old_inputs["parts"])
+    else:
+        old_parts = []
+        for n in sorted(assigned):
+            if match_module(assigned[n], old_parts) is None:
+                old_parts.append(assigned[n])
+    new_parts = list(new_inputs.get("parts") or [])
+    removed = [p for p in old_parts if match_module(p, new_parts) is None]
+    added = [p for p in new_parts if match_module(p, old_parts) is None]
+    if len(added) > len(removed):
+        plan.full = f"新增模块（{'、'.join(added)}）需要重新分配周次"
+        return plan
+    if removed or added:
+        # 模块清单有变动时，无法对应到旧模块的周次也可能属于被删除/改名的模块，只能整体重来
+        unmatched = [n for n in range(1, weeks + 1) if n not in assigned or match_module(assigned[n], old_parts) is None]
+        if unmatched:
+            plan.full = f"第{'、'.join(map(str, unmatched[:5]))}周的教学模块无法对应到原模块"
+            return plan
+    renames = dict(zip(removed, added))
+    orphaned = set()
+    for n, title in assigned.items():
+        idx = match_module(title, old_parts)
+        if idx is None or old_parts[idx] not in removed:
+            continue
+        target = renames.get(old_parts[idx])
+        if target:
+            plan.modules[n] = target
+            plan.add(n, f"模块“{old_parts[idx]}”改为“{target}”")
+        else:
+            plan.add(n, f"模块“{old_parts[idx]}”已删除")
+            orphaned.add(n)
+    # 仅因排除项重写的周次保持原模块
+    for n in plan.affected:
+        if n not in plan.modules and n not in orphaned and n in assigned:
+            plan.modules[n] = assigned[n]
+
+    if len(plan.affected) > weeks * MAX_AFFECTED_RATIO:
+        plan.full = f"受影响周次过多（{len(plan.affected)}/{weeks}）"
+    return plan
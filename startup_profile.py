@@ -0,0 +1,80 @@
+"""
+命令行启动耗时分析（--profile-startup）。
+
+在干净的子解释器中以 `python -X importtime` 依次执行各阶段语句（先导入脚本模块，
+再触发按需加载的重依赖），按阶段汇总导入总耗时、各顶层包耗时与最慢的模块。
+仅使用标准库。
+"""
+
+import re
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import List, Optional
+
+# -X importtime 的输出行：import time: <self us> | <cumulative us> | <缩进><模块名>
+_IMPORT_LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+_PHASE_MARK = "--startup-profile-phase--"
+
+
+def profile_startup_requested(argv: Optional[List[str]] = None) -> bool:
+    # 在 argparse 校验必填参数之前判断，使 --profile-startup 可单独使用
+    return "--profile-startup" in (sys.argv[1:] if argv is None else argv)
+
+
+def profile_imports(phases: List[tuple], cwd: Path) -> List[dict]:
+    """phases 为 [(阶段名, 语句)]，在同一子进程中按序执行；返回每阶段的导入耗时汇总（毫秒）。"""
+    import subprocess
+
+    lines = ["import sys"]
+    for _, stmt in phases:
+        lines.append(stmt)
+        lines.append(f"sys.stderr.write({_PHASE_MARK!r} + '\\n')")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "\n".join(lines)],
+        cwd=str(cwd), capture_output=True, text=True, encoding="utf-8",
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"启动耗时分析失败：\n{proc.stderr[-2000:]}")
+
+    results = []
+    modules: List[tuple] = []
+    for line in proc.stderr.splitlines():
+        if line.strip() == _PHASE_MARK:
+            name = phases[len(results)][0]
+            packages = defaultdict(float)
+            for mod, self_ms in modules:
+                packages[mod.split(".")[0]] += self_ms
+            results.append({
+                "phase": name,
+                "total_ms": round(sum(ms for _, ms in modules), 1),
+                "modules": len(modules),
+                "packages": sorted(((p, round(ms, 1)) for p, ms in packages.items()), key=lambda x: -x[1]),
+                "slowest": sorted(((m, round(ms, 1)) for m, ms in modules), key=lambda x: -x[1]),
+            })
+            modules = []
+            continue
+        m = _IMPORT_LINE_RE.match(line)
+        if m:
+            modules.append((m.group(4), int(m.group(1)) / 1000))
+    return results
+
+
+def print_import_profile(results: List[dict], top: int = 8) -> None:
+    print("启动耗时分析（python -X importtime，单位 ms，按阶段增量统计）：")
+    for r in results:
+        print(f"\n[{r['phase']}] 新导入 {r['modules']} 个模块，合计 {r['total_ms']:.1f} ms")
+        if not r["modules"]:
+            continue
+        print("  按顶层包：")
+        for name, ms in r["packages"][:top]:
+            print(f"    {name:<32}{ms:>9.1f}")
+        print("  最慢模块（自身耗时）：")
+        for name, ms in r["slowest"][:top]:
+            print(f"    {name:<32}{ms:>9.1f}")
+    print(f"\n合计：{sum(r['total_ms'] for r in results):.1f} ms")
+
+
+def run_startup_profile(script_dir: Path, phases: List[tuple]) -> None:
+    """在 script_dir 下执行各阶段并打印汇总。"""
+    print_import_profile(profile_imports(phases, script_dir))
@@ -0,0 +1,142 @@
+"""
+教学大纲 Markdown → 教案 JSON 的规则转换（不调用模型）。
+
+第一阶段生成的大纲已按 “### 第N周” 给出各字段，教案 JSON 的大部分字段只是对其的摘取：
+教学模块 → 课题，重点 → 教学重点，难点 → 教学难点，教学内容前 4 条 → 授课内容1..4。
+“教学目标”“作业”需要归纳，可交由一次小的模型请求补写，或直接用本模块的规则近似（快速模式）。
+仅使用标准库。
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+SYLLABUS_FIELDS = ("教学模块", "教学内容", "重点", "难点", "职业技能要求", "教学方法建议")
+# 需要归纳、无法直接摘取的教案字段
+DERIVED_FIELDS = ["教学目标", "作业"]
+
+_HEADING_RE = re.compile(r"^#{2,4}\s*第\s*(\d+)\s*周\s*[：:]?\s*(.*)$")
+# 字段行：“- 教学模块：xxx”（允许 **加粗**）
+_FIELD_RE = re.compile(r"^[-*]\s*\**\s*(" + "|".join(SYLLABUS_FIELDS) + r")\s*\**\s*[：:]\s*\**\s*(.*)$")
+# 字段下的子条目：缩进的 “- xxx” / “1. xxx” / “1）xxx”
+_ITEM_RE = re.compile(r"^\s+(?:[-*+]|\d+[.、)）])\s*(.+)$")
+_INLINE_SPLIT_RE = re.compile(r"\s*[；;]\s*")
+_PRACTICE_RE = re.compile(r"^(?:实操|实践|实训|实验|项目|任务)\s*[：:]\s*(.+)$")
+# 职业技能要求常以“能/会”开头，作为目标表述时去掉
+_ABILITY_PREFIX_RE = re.compile(r"^(?:能够|能|会)")
+
+
+def _clean(text: str) -> str:
+    return text.strip().strip("*").strip()
+
+
+def parse_week_section(section_md: str) -> Dict[str, List[str]]:
+    """解析一周的大纲段落，返回 {字段: [条目...]}；标题中的名称记在 “标题” 下。"""
+    result: Dict[str, List[str]] = {}
+    current = None
+    for line in section_md.splitlines():
+        if not line.strip():
+            continue
+        m = _HEADING_RE.match(line.strip())
+        if m:
+            result["标题"] = [_clean(m.group(2))] if _clean(m.group(2)) else []
+            continue
+        if not line.startswith((" ", "\t")):
+            m = _FIELD_RE.match(line.strip())
+            if m:
+                current = m.group(1)
+                inline = _clean(m.group(2))
+                result[current] = [s for s in _INLINE_SPLIT_RE.split(inline) if s] if inline else []
+                continue
+        m = _ITEM_RE.match(line)
+        if m and current is not None:
+            item = _clean(m.group(1))
+            if item:
+                result[current].append(item)
+    return result
+
+
+def parse_syllabus(syllabus_md: str) -> Dict[int, Dict[str, List[str]]]:
+    """按 “### 第N周” 切分并解析整份大纲，返回 {周次: 字段条目}。"""
+    weeks: Dict[int, Dict[str, List[str]]] = {}
+    lines = syllabus_md.splitlines()
+    heading_lines = [i for i, line in enumerate(lines) if _HEADING_RE.match(line.strip())]
+    for k, start in enumerate(heading_lines):
+        end = heading_lines[k + 1] if k + 1 < len(heading_lines) else len(lines)
+        number = int(_HEADING_RE.match(lines[start].strip()).group(1))
+        weeks.setdefault(number, parse_week_section("\n".join(lines[start:end])))
+    return weeks
+
+
+def derive_goal(fields: Dict[str, List[str]]) -> str:
+    """快速模式的“教学目标”：取职业技能要求（缺省时取重点）的前 4 条。"""
+    items = fields.get("职业技能要求") or fields.get("重点") or []
+    return "；".join(_ABILITY_PREFIX_RE.sub("", item) for item in items[:4])
+
+
+def derive_homework(fields: Dict[str, List[str]]) -> str:
+    """快速模式的“作业”：优先取教学内容中的实操/实践类条目，否则以首条职业技能要求布置练习。"""
+    for item in fields.get("教学内容", []):
+        m = _PRACTICE_RE.match(item)
+        if m:
+            return f"完成{m.group(1)}，并提交实践记录"
+    skills = fields.get("职业技能要求") or []
+    title = (fields.get("教学模块") or fields.get("标题") or ["本周内容"])[0]
+    if skills:
+        return f"完成“{title}”相关练习：{_ABILITY_PREFIX_RE.sub('', skills[0])}"
+    content = fields.get("教学内容") or []
+    return f"整理本周“{content[0]}”相关要点并完成练习" if content else ""
+
+
+def _content(index: int):
+    return lambda fields: ((fields.get("教学内容") or [])[index:index + 1] or [""])[0]
+
+
+# 规则转换能填写的教案字段（按默认模板的顺序）；模板含其它字段时只能交由模型生成
+_RULE_FIELDS = {
+    "课题": lambda fields: (fields.get("教学模块") or fields.get("标题") or [""])[0],
+    "教学目标": derive_goal,
+    "教学重点": lambda fields: "；".join(fields.get("重点") or []),
+    "教学难点": lambda fields: "；".join(fields.get("难点") or []),
+    "授课内容1": _content(0),
+    "授课内容2": _content(1),
+    "授课内容3": _content(2),
+    "授课内容4": _content(3),
+    "作业": derive_homework,
+}
+PLAN_FIELDS = list(_RULE_FIELDS)
+
+
+def unsupported_fields(week_fields: Optional[List[str]]) -> List[str]:
+    """week_fields 中规则转换无法填写的字段。"""
+    return [k for k in week_fields or () if k not in _RULE_FIELDS]
+
+
+def week_entry(number: int, fields: Dict[str, List[str]], week_fields: Optional[List[str]] = None) -> Optional[dict]:
+    """由一周的大纲字段按 week_fields（缺省为 PLAN_FIELDS）生成教案条目；教学目标/作业先按规则近似，可再由模型覆盖。
+
+    week_fields 含规则无法填写的字段时返回 None。
+    """
+    week_fields = PLAN_FIELDS if week_fields is None else week_fields
+    if unsupported_fields(week_fields):
+        return None
+    return {"周": number, **{k: _RULE_FIELDS[k](fields) for k in week_fields}}
+
+
+def plan_from_syllabus(
+    course: str, weeks: int, syllabus_md: str, week_fields: Optional[List[str]] = None
+) -> Optional[Tuple[dict, Dict[int, Dict[str, List[str]]], List[int]]]:
+    """返回 (教案对象, 各周解析结果, 无法解析的周次)；week_fields 含规则无法填写的字段时返回 None。
+
+    某周缺少标题段落，或既无教学模块也无教学内容时记为无法解析，该周条目留空由调用方处理。
+    """
+    if unsupported_fields(week_fields):
+        return None
+    parsed = parse_syllabus(syllabus_md)
+    items, missing = [], []
+    for n in range(1, weeks + 1):
+        fields = parsed.get(n)
+        if not fields or not (fields.get("教学模块") or fields.get("标题")) or not fields.get("教学内容"):
+            missing.append(n)
+            fields = {}
+        items.append(week_entry(n, fields, week_fields))
+    return {"授课科目": course, "总周数": weeks, "周次": items}, parsed, missing
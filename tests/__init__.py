@@ -0,0 +1,16 @@
+"""
+单元测试（仅使用标准库 unittest，不访问网络；需要模型的用例在进程内启动 bench/stub_llm_server.py 的桩服务）。
+
+用法（仓库根目录）：
+    python -m unittest discover -s tests -t .
+    python -m unittest tests.test_plan_validator
+"""
+
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+# 根目录的脚本模块、UI/job_store.py 与桩服务都以顶层模块导入
+for _path in (BASE_DIR, BASE_DIR / "UI", BASE_DIR / "bench"):
+    if str(_path) not in sys.path:
+        sys.path.insert(0, str(_path))
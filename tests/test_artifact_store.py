@@ -0,0 +1,111 @@
+import io
+import os
+import time
+import zipfile
+import tempfile
+import unittest
+from pathlib import Path
+
+import artifact_store
+from artifact_store import ArtifactStore, atomic_write_text
+
+DAY = 86400
+
+
+class ArtifactStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.store = ArtifactStore(self.root / "store")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def age(self, path: Path, seconds: float) -> None:
+        past = time.time() - seconds
+        os.utime(path, (past, past))
+
+    def test_put_deduplicates_and_resolves(self):
+        a = self.store.put_bytes(b"same")
+        src = self.root / "work.txt"
+        src.write_bytes(b"same")
+        self.assertEqual(self.store.put_file(src, move=True), a)
+        self.assertFalse(src.exists())
+        self.store.record_run("r1", {"大纲.md": a})
+        self.assertEqual(self.store.resolve("r1", "大纲.md").read_bytes(), b"same")
+        self.assertIsNone(self.store.resolve("r1", "其它.md"))
+        self.assertIsNone(self.store.load_run("../r1"))
+
+    def test_publish_replaces_destination(self):
+        digest = self.store.put_bytes(b"new")
+        dest = self.root / "out" / "a.docx"
+        dest.parent.mkdir()
+        dest.write_bytes(b"old")
+        self.store.publish(digest, dest)
+        self.assertEqual(dest.read_bytes(), b"new")
+        # 目标被替换后库中的对象不受影响
+        atomic_write_text(dest, "overwritten")
+        self.assertEqual(self.store.object_path(digest).read_bytes(), b"new")
+
+    def test_iter_run_zip_is_deterministic_and_complete(self):
+        files = {"a.md": self.store.put_bytes("大纲".encode("utf-8")), "b.docx": self.store.put_bytes(b"PK" * 5000)}
+        self.store.record_run("r1", files)
+        first = b"".join(self.store.iter_run_zip("r1", chunk_size=1024))
+        second = b"".join(self.store.iter_run_zip("r1"))
+        self.assertEqual(first, second)
+        with zipfile.ZipFile(io.BytesIO(first)) as zf:
+            self.assertEqual(zf.namelist(), ["a.md", "b.docx"])
+            self.assertEqual(zf.read("a.md").decode("utf-8"), "大纲")
+            self.assertEqual(zf.getinfo("b.docx").compress_type, zipfile.ZIP_STORED)
+            self.assertEqual(zf.getinfo("a.md").compress_type, zipfile.ZIP_DEFLATED)
+        with zipfile.ZipFile(io.BytesIO(b"".join(self.store.iter_run_zip("r1", names=["b.docx"])))) as zf:
+            self.assertEqual(zf.namelist(), ["b.docx"])
+
+    def test_run_digest_changes_with_contents(self):
+        self.store.record_run("r1", {"a.md": self.store.put_bytes(b"1")})
+        self.store.record_run("r2", {"a.md": self.store.put_bytes(b"2")})
+        self.assertNotEqual(self.store.run_digest("r1"), self.store.run_digest("r2"))
+        self.assertIsNone(self.store.run_digest("missing"))
+
+    def test_gc_removes_expired_runs_and_unreferenced_objects(self):
+        old = self.store.put_bytes(b"old")
+        kept = self.store.put_bytes(b"kept")
+        fresh = self.store.put_bytes(b"fresh")  # 未被引用但仍在宽限期内
+        self.store.record_run("old", {"a": old}, created=time.time() - 40 * DAY)
+        self.store.record_run("new", {"a": kept})
+        for digest in (old, kept):
+            self.age(self.store.object_path(digest), 2 * artifact_store.GC_GRACE_SECONDS)
+
+        result = self.store.gc(max_age_days=30, max_mb=1024)
+        self.assertEqual(result["runs"], 1)
+        self.assertEqual(result["objects"], 1)
+        self.assertFalse(self.store.object_path(old).exists())
+        self.assertTrue(self.store.object_path(kept).exists())
+        self.assertTrue(self.store.object_path(fresh).exists())
+        self.assertIsNone(self.store.load_run("old"))
+
+    def test_gc_size_limit_drops_oldest_runs_first(self):
+        digests = []
+        for i, created in enumerate((3 * DAY, 2 * DAY, DAY)):
+            digest = self.store.put_bytes(bytes([i]) * 400_000)
+            self.age(self.store.object_path(digest), 2 * artifact_store.GC_GRACE_SECONDS)
+            self.store.record_run(f"r{i}", {"a": digest}, created=time.time() - created)
+            digests.append(digest)
+
+        self.store.gc(max_age_days=30, max_mb=1)
+        self.assertEqual([self.store.load_run(f"r{i}") is not None for i in range(3)], [False, True, True])
+        self.assertFalse(self.store.object_path(digests[0]).exists())
+
+    def test_gc_removes_stale_workspaces(self):
+        with self.store.workspace() as live:
+            stale = self.store.work_dir / "run-stale"
+            stale.mkdir()
+            self.age(stale, 2 * artifact_store.GC_GRACE_SECONDS)
+            self.store.gc()
+            self.assertFalse(stale.exists())
+            self.assertTrue(live.exists())
+        self.assertFalse(live.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
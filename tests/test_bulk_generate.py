@@ -0,0 +1,77 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import bulk_generate
+from bulk_generate import Checkpoint, run_course
+
+
+class RunCourseCheckpointTest(unittest.TestCase):
+    """断点续跑：清单行与产物不变时跳过，教案 JSON 重新生成后 Word 阶段随之重跑。"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = Path(self.tmp.name)
+        self.options = {
+            "out_dir": root / "out", "docs_dir": root / "docs", "template_text": "", "data_template_text": "",
+            "chunk_weeks": 0, "concurrency": 1, "structured_json": False, "incremental": False,
+            "marks_template": "{授课科目}",
+        }
+        self.options["out_dir"].mkdir()
+        self.checkpoint = Checkpoint(root / "checkpoint.json")
+        self.row = {k: "" for k in bulk_generate.MANIFEST_FIELDS}
+        self.row.update(course="软件测试", weeks=2, model="m", level="高职学生", plan_mode="llm")
+        self.plan_text = json.dumps({"周次": [1]})
+        self.word_builds = 0
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def fake_generate(self, course, weeks, out_dir, **kwargs):
+        (out_dir / f"{course}-教学大纲.md").write_text("大纲", encoding="utf-8")
+        (out_dir / f"{course}-{weeks}-data.json").write_text(self.plan_text, encoding="utf-8")
+
+    def fake_word(self, marks_path, plan_path, docs_dir, timings):
+        self.word_builds += 1
+        path = docs_dir / "教案-软件测试.docx"
+        path.write_bytes(b"docx")
+        return path
+
+    def run_once(self, generate=True):
+        if not generate:
+            self.checkpoint.mark("软件测试-2", "generate", None)
+        with mock.patch.object(bulk_generate, "generate_course_files", side_effect=self.fake_generate):
+            result = run_course(self.row, self.options, self.checkpoint, self.fake_word)
+        self.assertTrue(result["ok"], result.get("error"))
+        return result["skipped"]
+
+    def test_rerun_skips_unchanged_stages(self):
+        self.assertEqual(self.run_once(), [])
+        self.assertEqual(self.run_once(), ["generate", "word"])
+        self.assertEqual(self.word_builds, 1)
+
+    def test_regenerated_plan_rebuilds_word(self):
+        self.run_once()
+        self.plan_text = json.dumps({"周次": [2]})
+        self.assertEqual(self.run_once(generate=False), [])
+        self.assertEqual(self.word_builds, 2)
+
+    def test_missing_marks_file_rebuilds_word(self):
+        self.run_once()
+        (self.options["out_dir"] / "教案模板标记值-软件测试.md").unlink()
+        self.assertEqual(self.run_once(), ["generate"])
+        self.assertEqual(self.word_builds, 2)
+
+    def test_failed_generation_drops_word_checkpoint(self):
+        self.run_once()
+        self.checkpoint.mark("软件测试-2", "generate", None)
+        with mock.patch.object(bulk_generate, "generate_course_files", side_effect=RuntimeError("boom")):
+            result = run_course(self.row, self.options, self.checkpoint, self.fake_word)
+        self.assertFalse(result["ok"])
+        self.assertNotIn("word", self.checkpoint._data["软件测试-2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+
+import generate_syllabus
+from generate_syllabus import make_async_client, run_async, use_credentials
+
+
+class AsyncClientLifecycleTest(unittest.TestCase):
+    """每个事件循环缓存的异步客户端在该循环结束前关闭。"""
+
+    def run_with_clients(self, clients, fail=False):
+        async def work():
+            clients.extend([make_async_client(), make_async_client()])
+            self.assertFalse(clients[0].is_closed())
+            if fail:
+                raise RuntimeError("boom")
+
+        with use_credentials("test-key", "http://127.0.0.1:9/v1"):
+            run_async(work())
+
+    def test_clients_are_reused_and_closed(self):
+        clients = []
+        self.run_with_clients(clients)
+        self.assertIs(clients[0], clients[1])
+        self.assertTrue(clients[0].is_closed())
+        self.assertEqual(len(generate_syllabus._ASYNC_CLIENTS), 0)
+
+    def test_clients_are_closed_when_coroutine_fails(self):
+        clients = []
+        with self.assertRaises(RuntimeError):
+            self.run_with_clients(clients, fail=True)
+        self.assertTrue(clients[0].is_closed())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+from job_store import JobStore
+
+
+class JobStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "jobs.sqlite3"
+        self.store = JobStore(self.path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_create_update_and_json_fields(self):
+        self.store.create("j1", "大数据基础", 16)
+        self.store.update("j1", status="done", artifacts={"大纲": "a.md"}, notices=["提示"], metrics={"llm": 3})
+        job = self.store.get("j1")
+        self.assertEqual(job["course"], "大数据基础")
+        self.assertEqual(job["status"], "done")
+        self.assertEqual(job["artifacts"], {"大纲": "a.md"})
+        self.assertEqual(job["notices"], ["提示"])
+        self.assertEqual(job["metrics"], {"llm": 3})
+        self.assertIsNone(self.store.get("missing"))
+
+    def test_mark_stage_records_timestamps(self):
+        self.store.create("j1", "课程", 4)
+        self.store.mark_stage("j1", "syllabus", "started")
+        self.store.mark_stage("j1", "syllabus", "finished")
+        self.store.mark_stage("missing", "syllabus", "started")
+        job = self.store.get("j1")
+        self.assertEqual(job["stage"], "syllabus")
+        self.assertEqual(set(job["stages"]["syllabus"]), {"started", "finished"})
+
+    def test_queue_position_and_active_count(self):
+        for job_id in ("j1", "j2", "j3"):
+            self.store.create(job_id, "课程", 4)
+        self.store.update("j1", status="running")
+        self.assertEqual(self.store.get("j3")["queue_position"], 1)
+        self.assertNotIn("queue_position", self.store.get("j1"))
+        self.assertEqual(self.store.count_active(), 3)
+
+    def test_fail_interrupted(self):
+        for job_id in ("j1", "j2", "j3"):
+            self.store.create(job_id, "课程", 4)
+        self.store.update("j1", status="running")
+        self.store.update("j3", status="done")
+        self.assertEqual(sorted(self.store.fail_interrupted()), ["j1", "j2"])
+        self.assertEqual(self.store.get("j2")["status"], "failed")
+        self.assertTrue(self.store.get("j2")["error"])
+        self.assertEqual(self.store.get("j3")["status"], "done")
+        self.assertEqual(self.store.count_active(), 0)
+
+    def test_adds_metrics_column_to_old_table(self):
+        old = Path(self.tmp.name) / "old.sqlite3"
+        conn = sqlite3.connect(str(old))
+        conn.execute(
+            "CREATE TABLE jobs (id TEXT PRIMARY KEY, course TEXT, weeks INTEGER, status TEXT, stage TEXT,"
+            " created REAL, started REAL, finished REAL, stages TEXT DEFAULT '{}', artifacts TEXT DEFAULT '{}',"
+            " notices TEXT DEFAULT '[]', error TEXT)"
+        )
+        conn.commit()
+        conn.close()
+        store = JobStore(old)
+        store.create("j1", "课程", 4)
+        self.assertEqual(store.get("j1")["metrics"], {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import llm_control
+from llm_control import AdaptiveLimiter, LatencyTracker, backoff_delay, retry_reason
+
+
+class APIConnectionError(Exception):
+    pass
+
+
+class StatusError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(status_code)
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+class LatencyTrackerTest(unittest.TestCase):
+    def test_quantile_needs_min_samples(self):
+        tracker = LatencyTracker(window=50)
+        with mock.patch.object(llm_control, "HEDGE_MIN_SAMPLES", 5):
+            for i in range(4):
+                tracker.observe("m", "complete", float(i))
+            self.assertIsNone(tracker.quantile("m", "complete", 0.95))
+            tracker.observe("m", "complete", 10.0)
+            self.assertEqual(tracker.quantile("m", "complete", 0.95), 10.0)
+            self.assertEqual(tracker.quantile("m", "complete", 0.0), 0.0)
+            self.assertIsNone(tracker.quantile("m", "first_token", 0.95))
+
+    def test_window_drops_old_samples(self):
+        tracker = LatencyTracker(window=3)
+        with mock.patch.object(llm_control, "HEDGE_MIN_SAMPLES", 1):
+            for value in (100.0, 1.0, 2.0, 3.0):
+                tracker.observe("m", "complete", value)
+            self.assertEqual(tracker.quantile("m", "complete", 0.99), 3.0)
+
+    def test_hedge_disabled(self):
+        tracker = LatencyTracker()
+        with mock.patch.object(llm_control, "HEDGE_MIN_SAMPLES", 1), mock.patch.object(llm_control, "HEDGE_ENABLED", False):
+            tracker.observe("m", "complete", 1.0)
+            self.assertIsNone(tracker.hedge_delay("m", "complete"))
+
+
+class AdaptiveLimiterTest(unittest.TestCase):
+    def test_try_acquire_respects_limit(self):
+        limiter = AdaptiveLimiter(initial=2, maximum=4)
+        self.assertTrue(limiter.try_acquire())
+        self.assertTrue(limiter.try_acquire())
+        self.assertFalse(limiter.try_acquire())
+        limiter.release()
+        self.assertTrue(limiter.try_acquire())
+
+    def test_additive_increase_is_capped(self):
+        limiter = AdaptiveLimiter(initial=2, maximum=3)
+        for _ in range(20):
+            limiter.on_success()
+        self.assertEqual(limiter.limit, 3)
+
+    def test_rate_limit_halves_once_per_cooldown(self):
+        limiter = AdaptiveLimiter(initial=8, maximum=16)
+        limiter.on_rate_limited()
+        limiter.on_rate_limited()
+        self.assertEqual(limiter.limit, 4)
+        limiter._last_decrease -= llm_control.DECREASE_COOLDOWN
+        limiter.on_rate_limited()
+        self.assertEqual(limiter.limit, 2)
+        for _ in range(5):
+            limiter._last_decrease -= llm_control.DECREASE_COOLDOWN
+            limiter.on_rate_limited()
+        self.assertEqual(limiter.limit, 1)
+
+
+class RetryTest(unittest.TestCase):
+    def test_retry_reason(self):
+        self.assertEqual(retry_reason(StatusError(429)), "rate_limit")
+        self.assertEqual(retry_reason(StatusError(503)), "server")
+        self.assertEqual(retry_reason(APIConnectionError()), "connection")
+        self.assertIsNone(retry_reason(StatusError(400)))
+        self.assertIsNone(retry_reason(ValueError()))
+
+    def test_backoff_is_bounded_and_honours_retry_after(self):
+        with mock.patch.object(llm_control, "BACKOFF_BASE", 1.0), mock.patch.object(llm_control, "BACKOFF_CAP", 10.0):
+            for attempt in range(8):
+                self.assertLessEqual(backoff_delay(attempt), 10.0)
+            self.assertGreaterEqual(backoff_delay(0, StatusError(429, {"retry-after": "5"})), 5.0)
+            self.assertGreaterEqual(backoff_delay(0, StatusError(429, {"retry-after-ms": "3000"})), 3.0)
+            self.assertLessEqual(backoff_delay(0, StatusError(429, {"retry-after": "600"})), 10.0)
+            self.assertLessEqual(backoff_delay(0, StatusError(429, {"retry-after": "soon"})), 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+"""
+分片教案 JSON 的重试与本地响应缓存（离线，使用进程内桩服务）。
+
+桩服务让第一个教案 JSON 响应残缺但正常结束：该分片的重试必须重新请求模型，
+而不是命中缓存中同一份不合格的内容；不合格的响应也不应留在缓存里。
+
+用法：
+    python -m unittest tests.test_plan_retry
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+import generate_syllabus
+from build_course_docs import generate_plan_chunked
+from generate_syllabus import run_async, set_cache_mode, use_credentials
+from llm_cache import LLMCache
+from metrics import record_run
+from stub_llm_server import StubConfig, start_server, synthetic_syllabus
+
+MODEL = "stub"
+COURSE = "软件测试"
+WEEKS = 6
+
+
+class PlanChunkRetryTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.server = start_server(StubConfig(bad_plan_responses=1))
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+        self.cache = LLMCache(Path(self.tmp.name) / "llm_cache.sqlite")
+        generate_syllabus._cache = self.cache
+        set_cache_mode("on")
+
+    def tearDown(self):
+        generate_syllabus._cache = None
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def generate(self) -> dict:
+        with use_credentials("stub", self.base_url):
+            return run_async(generate_plan_chunked(
+                COURSE, WEEKS, synthetic_syllabus(COURSE, WEEKS), MODEL, chunk_size=WEEKS, retries=2,
+            ))
+
+    def test_bad_chunk_is_retried_against_the_model(self):
+        with record_run() as run:
+            plan = self.generate()
+        self.assertEqual([item["周"] for item in plan["周次"]], list(range(1, WEEKS + 1)))
+        # 第一次残缺、第二次合格：两次都真正请求了模型
+        self.assertEqual(run.summary()["llm_requests"], {"ok": 2})
+
+        # 缓存中只留下合格的响应，再次运行直接命中
+        self.assertEqual(self.cache.stats()["entries"], 1)
+        with record_run() as run:
+            self.generate()
+        self.assertEqual(run.summary()["llm_requests"], {"cache_hit": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import json
+import unittest
+
+from plan_validator import PlanStreamValidator
+from prompt_schema import plan_week_fields
+from tests import BASE_DIR
+
+WEEK_FIELDS = plan_week_fields((BASE_DIR / "templates" / "data_template.json").read_text(encoding="utf-8"))
+
+
+def make_plan(week_numbers, header=True):
+    items = [{"周": n, **{k: f"第{n}周{k}" for k in WEEK_FIELDS}} for n in week_numbers]
+    plan = {"周次": items}
+    if header:
+        plan = {"授课科目": "软件测试", "总周数": len(week_numbers), **plan}
+    return plan
+
+
+def feed_in_chunks(validator, text, size):
+    for i in range(0, len(text), size):
+        validator.feed(text[i:i + size])
+
+
+class PlanStreamValidatorTest(unittest.TestCase):
+    def test_accepts_valid_plan_in_small_chunks(self):
+        text = json.dumps(make_plan([1, 2, 3]), ensure_ascii=False, indent=2)
+        for size in (1, 3, 7):
+            validator = PlanStreamValidator([1, 2, 3], WEEK_FIELDS)
+            feed_in_chunks(validator, text, size)
+            validator.close()
+            self.assertTrue(validator.done)
+
+    def test_allows_code_fence_and_ignores_trailing_text(self):
+        text = "```json\n" + json.dumps(make_plan([4, 5], header=False), ensure_ascii=False) + "\n```\n说明"
+        validator = PlanStreamValidator([4, 5], WEEK_FIELDS)
+        validator.feed(text)
+        validator.close()
+
+    def test_decodes_escaped_keys_and_values_across_chunks(self):
+        plan = make_plan([1, 2])
+        plan["周次"][0]["作业"] = '引号"反斜杠\\斜杠/\n换行\t制表\r\b\f 表情\U0001F600'
+        # ensure_ascii=True 时中文键全部写成 \\uXXXX，表情写成代理对
+        text = json.dumps(plan, ensure_ascii=True).replace("/", "\\/")
+        for size in (1, 2, 5):
+            validator = PlanStreamValidator([1, 2], WEEK_FIELDS)
+            feed_in_chunks(validator, text, size)
+            validator.close()
+            self.assertTrue(validator.done)
+
+    def test_escaped_key_still_checked(self):
+        plan = make_plan([1])
+        plan["周次"][0]["备注"] = plan["周次"][0].pop("作业")
+        validator = PlanStreamValidator([1], WEEK_FIELDS)
+        with self.assertRaisesRegex(ValueError, "备注"):
+            feed_in_chunks(validator, json.dumps(plan, ensure_ascii=True), 3)
+
+    def test_rejects_invalid_escape(self):
+        validator = PlanStreamValidator([1], WEEK_FIELDS)
+        with self.assertRaisesRegex(ValueError, "非法 JSON 字符串"):
+            validator.feed('{"\\u12G4": 1}')
+
+    def test_rejects_unknown_root_key(self):
+        validator = PlanStreamValidator([1], WEEK_FIELDS)
+        with self.assertRaisesRegex(ValueError, "未知键"):
+            validator.feed('{"课程": "x"')
+
+    def test_rejects_wrong_week_number(self):
+        plan = make_plan([1, 2])
+        plan["周次"][1]["周"] = 3
+        validator = PlanStreamValidator([1, 2], WEEK_FIELDS)
+        with self.assertRaisesRegex(ValueError, "周序号不符"):
+            validator.feed(json.dumps(plan, ensure_ascii=False))
+
+    def test_rejects_missing_field(self):
+        plan = make_plan([1])
+        del plan["周次"][0]["作业"]
+        validator = PlanStreamValidator([1], WEEK_FIELDS)
+        with self.assertRaisesRegex(ValueError, "缺少字段：作业"):
+            validator.feed(json.dumps(plan, ensure_ascii=False))
+
+    def test_rejects_too_many_weeks(self):
+        validator = PlanStreamValidator([1], WEEK_FIELDS)
+        with self.assertRaisesRegex(ValueError, "超过"):
+            validator.feed(json.dumps(make_plan([1, 2]), ensure_ascii=False))
+
+    def test_close_reports_truncated_output(self):
+        text = json.dumps(make_plan([1, 2]), ensure_ascii=False)
+        validator = PlanStreamValidator([1, 2], WEEK_FIELDS)
+        validator.feed(text[: len(text) // 2])
+        with self.assertRaisesRegex(ValueError, "不完整"):
+            validator.close()
+
+    def test_rejects_long_preamble(self):
+        validator = PlanStreamValidator([1], WEEK_FIELDS)
+        with self.assertRaisesRegex(ValueError, "开头不是 JSON 对象"):
+            validator.feed("好" * 300)
+
+
+if __name__ == "__main__":
+    unittest.main()
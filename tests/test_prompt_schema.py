@@ -0,0 +1,78 @@
+import json
+import unittest
+
+from prompt_schema import (
+    plan_json_schema,
+    plan_week_fields,
+    render_plan_schema,
+    render_syllabus_template,
+    split_syllabus_template,
+)
+from tests import BASE_DIR
+
+TEMPLATE = """# 课程教学大纲
+## 教学内容规划（18周）
+### 第1周：{模块名称}
+- 教学模块：
+- 教学内容：
+### 第2周：{模块名称}
+- 教学模块：
+"""
+
+DATA_TEMPLATE = json.dumps({"授课科目": "", "总周数": 0, "周次": [{"周": 1, "课题": "", "作业": ""}]})
+
+
+class SyllabusTemplateTest(unittest.TestCase):
+    def test_split_keeps_first_week_block_and_placeholders(self):
+        head, block = split_syllabus_template(TEMPLATE)
+        self.assertEqual(head, "# 课程教学大纲\n## 教学内容规划（{总周数}周）")
+        self.assertTrue(block.startswith("### 第{周}周：{模块名称}\n- 教学模块："))
+        self.assertNotIn("第2周", block)
+
+    def test_render_describes_remaining_weeks_once(self):
+        text = render_syllabus_template(TEMPLATE, 20)
+        self.assertIn("（20周）", text)
+        self.assertIn("### 第1周：", text)
+        self.assertIn("“### 第2周：{模块名称}” 到 “### 第20周：{模块名称}”", text)
+        self.assertEqual(text.count("- 教学模块："), 1)
+
+    def test_single_week_has_no_repeat_note(self):
+        self.assertNotIn("依次重复", render_syllabus_template(TEMPLATE, 1))
+
+    def test_template_without_week_heading_is_rejected(self):
+        with self.assertRaises(ValueError):
+            split_syllabus_template("# 只有标题\n")
+
+    def test_repository_template_splits(self):
+        text = (BASE_DIR / "templates" / "syllabus_template.md").read_text(encoding="utf-8")
+        self.assertIn("{周}", split_syllabus_template(text)[1])
+
+
+class PlanSchemaTest(unittest.TestCase):
+    def test_week_fields_follow_template_order(self):
+        self.assertEqual(plan_week_fields(DATA_TEMPLATE), ["课题", "作业"])
+        with self.assertRaises(ValueError):
+            plan_week_fields('{"周次": []}')
+
+    def test_render_plan_schema_has_one_example_week(self):
+        example = json.loads(render_plan_schema(DATA_TEMPLATE, 18, first_week=4))
+        self.assertEqual(example["总周数"], 18)
+        self.assertEqual(example["周次"], [{"周": 4, "课题": "", "作业": ""}])
+
+    def test_json_schema_is_strict(self):
+        schema = plan_json_schema(["课题", "作业"])
+        self.assertEqual(schema["name"], "lesson_plan")
+        root = schema["schema"]
+        self.assertEqual(root["required"], ["授课科目", "总周数", "周次"])
+        week = root["properties"]["周次"]["items"]
+        self.assertEqual(week["required"], ["周", "课题", "作业"])
+        self.assertFalse(week["additionalProperties"])
+
+    def test_json_schema_without_header(self):
+        schema = plan_json_schema(["课题"], with_header=False)
+        self.assertEqual(schema["name"], "lesson_plan_weeks")
+        self.assertEqual(schema["schema"]["required"], ["周次"])
+
+
+if __name__ == "__main__":
+    unittest.main()
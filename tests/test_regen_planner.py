@@ -0,0 +1,105 @@
+import unittest
+
+from regen_planner import match_module, normalize_module, plan_regeneration
+
+PARTS = ["Linux 基础", "HDFS 存储", "MapReduce 编程"]
+
+
+def section(n, module, extra=""):
+    return f"### 第{n}周：{module}\n- 教学模块：{module}\n- 教学内容：\n  - 第{n}周内容{extra}\n"
+
+
+def previous(modules, extra=None):
+    """modules 为各周的模块名（从第 1 周起）；返回 (sections, plan_items)。"""
+    extra = extra or {}
+    sections = {n: section(n, m, extra.get(n, "")) for n, m in enumerate(modules, start=1)}
+    items = {n: {"周": n, "课题": m} for n, m in enumerate(modules, start=1)}
+    return sections, items
+
+
+def inputs(parts, excludes=(), weeks=6, **overrides):
+    return {"weeks": weeks, "level": "高职学生", "features": "", "parts": list(parts), "excludes": list(excludes),
+            **overrides}
+
+
+MODULES = ["Linux 基础", "Linux 基础", "HDFS 存储", "HDFS 存储", "MapReduce 编程", "MapReduce 编程"]
+
+
+class ModuleMatchTest(unittest.TestCase):
+    def test_normalize_strips_numbering_and_punctuation(self):
+        self.assertEqual(normalize_module("模块2：HDFS 存储"), normalize_module("HDFS存储"))
+        self.assertEqual(normalize_module("模块1"), "模块1")
+
+    def test_match_prefers_exact_then_longest_containment(self):
+        self.assertEqual(match_module("模块3：MapReduce 编程", PARTS), 2)
+        self.assertEqual(match_module("HDFS", PARTS), 1)
+        self.assertIsNone(match_module("Spark", PARTS))
+
+
+class PlanRegenerationTest(unittest.TestCase):
+    def test_unchanged_inputs_affect_nothing(self):
+        plan = plan_regeneration(*previous(MODULES), inputs(PARTS), inputs(PARTS))
+        self.assertIsNone(plan.full)
+        self.assertEqual(plan.weeks, [])
+
+    def test_rename_maps_weeks_to_new_module(self):
+        new = ["Linux 基础", "HDFS 分布式存储与管理实践", "MapReduce 编程"]
+        plan = plan_regeneration(*previous(MODULES), inputs(PARTS), inputs(new))
+        self.assertIsNone(plan.full)
+        self.assertEqual(plan.weeks, [3, 4])
+        self.assertEqual(plan.modules, {3: new[1], 4: new[1]})
+
+    def test_delete_leaves_module_choice_to_model(self):
+        plan = plan_regeneration(*previous(MODULES), inputs(PARTS), inputs([PARTS[0], PARTS[2]]))
+        self.assertIsNone(plan.full)
+        self.assertEqual(plan.weeks, [3, 4])
+        self.assertEqual(plan.modules, {})
+
+    def test_added_module_requires_full_regeneration(self):
+        plan = plan_regeneration(*previous(MODULES), inputs(PARTS), inputs(PARTS + ["Spark 入门"]))
+        self.assertIn("新增模块", plan.full)
+
+    def test_unmatched_module_with_changed_parts_requires_full_regeneration(self):
+        modules = ["Linux 基础", "Hadoop 生态概览"] + MODULES[2:]
+        for new in ([PARTS[0], "HDFS 分布式存储与管理实践", PARTS[2]], [PARTS[0], PARTS[2]]):
+            plan = plan_regeneration(*previous(modules), inputs(PARTS), inputs(new))
+            self.assertIn("第2周的教学模块无法对应", plan.full)
+
+    def test_unmatched_module_with_unchanged_parts_is_kept(self):
+        modules = ["Linux 基础", "Hadoop 生态概览"] + MODULES[2:]
+        plan = plan_regeneration(*previous(modules), inputs(PARTS), inputs(PARTS))
+        self.assertIsNone(plan.full)
+        self.assertEqual(plan.weeks, [])
+
+    def test_week_without_module_with_changed_parts_requires_full_regeneration(self):
+        sections, items = previous(MODULES)
+        sections[6] = "### 第6周\n- 教学内容：\n  - 复习\n"
+        plan = plan_regeneration(sections, items, inputs(PARTS), inputs([PARTS[0], PARTS[2]]))
+        self.assertIn("第6周", plan.full)
+
+    def test_exclude_keyword_keeps_module(self):
+        sections, items = previous(MODULES, extra={5: "：Hive 示例"})
+        plan = plan_regeneration(sections, items, inputs(PARTS), inputs(PARTS, excludes=["hive"]))
+        self.assertEqual(plan.weeks, [5])
+        self.assertEqual(plan.modules, {5: "MapReduce 编程"})
+
+    def test_global_change_requires_full_regeneration(self):
+        plan = plan_regeneration(*previous(MODULES), inputs(PARTS), inputs(PARTS, level="本科学生"))
+        self.assertIn("level", plan.full)
+
+    def test_missing_previous_week_requires_full_regeneration(self):
+        sections, items = previous(MODULES[:5])
+        plan = plan_regeneration(sections, items, None, inputs(PARTS))
+        self.assertIn("第6", plan.full)
+
+    def test_too_many_affected_weeks_requires_full_regeneration(self):
+        plan = plan_regeneration(*previous(MODULES), inputs(PARTS), inputs(PARTS, excludes=["内容"]))
+        self.assertIn("受影响周次过多", plan.full)
+
+    def test_old_parts_inferred_from_syllabus_without_record(self):
+        plan = plan_regeneration(*previous(MODULES), None, inputs([PARTS[0], PARTS[1]]))
+        self.assertEqual(plan.weeks, [5, 6])
+
+
+if __name__ == "__main__":
+    unittest.main()
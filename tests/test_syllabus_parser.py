@@ -0,0 +1,92 @@
+import unittest
+
+from prompt_schema import plan_week_fields
+from syllabus_parser import PLAN_FIELDS, parse_syllabus, parse_week_section, plan_from_syllabus, week_entry
+from tests import BASE_DIR
+
+WEEK_FIELDS = plan_week_fields((BASE_DIR / "templates" / "data_template.json").read_text(encoding="utf-8"))
+
+WEEK_1 = """### 第1周：Linux 基础
+- 教学模块：模块1：Linux 操作
+- 教学内容：
+  - 常用命令
+  - 文件权限
+  - 实操：编写 Shell 脚本
+- **重点**：常用命令；文件权限
+- 难点：权限位
+- 职业技能要求：
+  1. 能使用常用命令管理文件
+  2. 会配置环境变量
+- 教学方法建议：演示 + 实训
+"""
+
+WEEK_2 = """### 第2周：Hadoop 安装
+- 教学模块：模块2：集群部署
+- 教学内容：集群规划；伪分布式安装
+- 重点：配置文件
+- 难点：排查启动失败
+"""
+
+
+class ParseWeekSectionTest(unittest.TestCase):
+    def test_fields_items_and_title(self):
+        fields = parse_week_section(WEEK_1)
+        self.assertEqual(fields["标题"], ["Linux 基础"])
+        self.assertEqual(fields["教学模块"], ["模块1：Linux 操作"])
+        self.assertEqual(fields["教学内容"], ["常用命令", "文件权限", "实操：编写 Shell 脚本"])
+        self.assertEqual(fields["重点"], ["常用命令", "文件权限"])
+        self.assertEqual(fields["职业技能要求"], ["能使用常用命令管理文件", "会配置环境变量"])
+
+    def test_inline_items_split_on_semicolons(self):
+        self.assertEqual(parse_week_section(WEEK_2)["教学内容"], ["集群规划", "伪分布式安装"])
+
+    def test_parse_syllabus_keeps_first_of_duplicate_weeks(self):
+        weeks = parse_syllabus("# 大纲\n\n" + WEEK_1 + "\n" + WEEK_2 + "\n" + WEEK_2.replace("Hadoop", "重复"))
+        self.assertEqual(sorted(weeks), [1, 2])
+        self.assertEqual(weeks[2]["标题"], ["Hadoop 安装"])
+
+
+class PlanFromSyllabusTest(unittest.TestCase):
+    def test_entries_follow_syllabus(self):
+        plan, parsed, missing = plan_from_syllabus("大数据", 2, WEEK_1 + "\n" + WEEK_2)
+        self.assertEqual(missing, [])
+        first, second = plan["周次"]
+        self.assertEqual(first["课题"], "模块1：Linux 操作")
+        self.assertEqual(first["教学重点"], "常用命令；文件权限")
+        self.assertEqual(first["授课内容3"], "实操：编写 Shell 脚本")
+        self.assertEqual(first["授课内容4"], "")
+        self.assertEqual(first["教学目标"], "使用常用命令管理文件；配置环境变量")
+        self.assertEqual(first["作业"], "完成编写 Shell 脚本，并提交实践记录")
+        self.assertEqual(second["作业"], "整理本周“集群规划”相关要点并完成练习")
+        self.assertEqual(plan["总周数"], 2)
+
+    def test_reports_weeks_without_content(self):
+        plan, _, missing = plan_from_syllabus("大数据", 3, WEEK_1)
+        self.assertEqual(missing, [2, 3])
+        self.assertEqual(plan["周次"][2]["课题"], "")
+
+    def test_entries_follow_template_fields(self):
+        self.assertEqual(PLAN_FIELDS, WEEK_FIELDS)
+        fields = ["授课内容1", "课题", "作业"]
+        plan, _, _ = plan_from_syllabus("大数据", 1, WEEK_1, fields)
+        self.assertEqual(list(plan["周次"][0]), ["周"] + fields)
+
+    def test_unsupported_template_field_returns_none(self):
+        fields = WEEK_FIELDS + ["备注"]
+        self.assertIsNone(plan_from_syllabus("大数据", 1, WEEK_1, fields))
+        self.assertIsNone(week_entry(1, parse_week_section(WEEK_1), fields))
+
+    def test_build_plan_local_falls_back_for_unsupported_fields(self):
+        from build_course_docs import build_plan_local
+
+        logs = []
+        plan = build_plan_local("大数据", 1, WEEK_1, "m", fast=True, on_log=logs.append,
+                                week_fields=WEEK_FIELDS + ["备注"])
+        self.assertIsNone(plan)
+        self.assertIn("备注", logs[0])
+        plan = build_plan_local("大数据", 1, WEEK_1, "m", fast=True, week_fields=["课题", "教学重点"])
+        self.assertEqual(plan["周次"][0], {"周": 1, "课题": "模块1：Linux 操作", "教学重点": "常用命令；文件权限"})
+
+
+if __name__ == "__main__":
+    unittest.main()